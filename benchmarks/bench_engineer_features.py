@@ -0,0 +1,81 @@
+"""
+Benchmark engineer_features against the previous merge/concat implementation.
+
+Both versions run on the same synthetic joint dataset; the script checks that
+they produce the same columns and values, then reports the best wall time and
+the peak traced memory (numpy/pandas allocations) of each.
+
+    python benchmarks/bench_engineer_features.py --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from measure import measure
+
+from pipeline.create_aggregate_data import engineer_features
+
+
+def legacy_engineer_features(df):
+    """engineer_features as it was before the single-pass rewrite (reference)."""
+    df = df.copy()
+    df['log_price'] = np.log(df['price'])
+    df['price_category'] = pd.cut(df['price'],
+                                 bins=[50, 100, 150, 200, 500, 1000, np.inf],
+                                 labels=['Budget', 'Moderate', 'Comfort',
+                                        'Expensive', 'Premium', 'Luxury'])
+    df['availability_rate'] = df['availability_365'] / 365
+    df['is_highly_available'] = df['availability_365'] > 180
+    df['quarter_num'] = df['quarter'].str.replace('Q', '').astype(int)
+    df['is_peak_season'] = df['quarter_num'].isin([2, 3])
+    neighborhood_stats = df.groupby('neighbourhood', observed=True).agg({
+        'price': ['mean', 'median', 'count']
+    }).round(2)
+    neighborhood_stats.columns = ['neighborhood_avg_price', 'neighborhood_median_price', 'neighborhood_count']
+    df = df.merge(neighborhood_stats, on='neighbourhood', how='left')
+    df['price_premium_pct'] = ((df['price'] - df['neighborhood_avg_price']) / df['neighborhood_avg_price']) * 100
+    room_type_dummies = pd.get_dummies(df['room_type'], prefix='room_type')
+    df = pd.concat([df, room_type_dummies], axis=1)
+    return df
+
+
+def make_joint_frame(rows, seed=0):
+    """Synthetic merged dataset with Boston-like cardinalities."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(rows, dtype=np.int64),
+        "neighbourhood": rng.choice([f"Neighbourhood {i}" for i in range(25)], rows),
+        "room_type": rng.choice(["Entire home/apt", "Private room", "Shared room", "Hotel room"],
+                                rows, p=[0.7, 0.27, 0.02, 0.01]),
+        "price": np.round(rng.lognormal(5.2, 0.7, rows)),
+        "availability_365": rng.integers(0, 366, rows),
+        "quarter": rng.choice(["Q1", "Q2", "Q3", "Q4"], rows),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="engineer_features benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df = make_joint_frame(args.rows)
+    expected = legacy_engineer_features(df)
+    actual = engineer_features(df).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected)
+
+    print(f"engineer_features on {args.rows:,} rows")
+    for label, func in [("legacy (merge + concat)", legacy_engineer_features),
+                        ("single pass (transform)", engineer_features)]:
+        result = measure(func, df, args.repeat)
+        print(f"  {label:<26} {result['seconds']:8.3f} s   peak {result['peak_mib']:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Wall time and peak memory of one benchmark case, shared by the benchmark scripts.
+"""
+
+import time
+import tracemalloc
+
+
+def measure(func, df, repeat: int) -> dict:
+    """
+    Best wall time over ``repeat`` runs and peak traced memory (numpy/pandas
+    allocations) of one more run. One untimed call comes first, so first-call
+    costs (imports, caches, font loading, ...) land in neither figure,
+    whatever ``repeat`` is.
+    """
+    func(df)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(times), "peak_mib": peak / 2**20}
@@ -0,0 +1,204 @@
+"""
+Scaling benchmarks for the pipeline stages on synthetic data.
+
+Every stage runs at each size (rows of synthetic listings, see
+``synthetic.py``), each case in a fresh fork of the harness; after an
+untimed warm-up call, the best wall time over ``--repeat`` runs and the
+peak traced memory (numpy/pandas allocations) of one more run are recorded
+(``measure.py``). The results are compared with a
+stored baseline and the script exits with status 1 when a case is slower or
+uses more memory than the baseline by more than the thresholds, so it can
+gate changes. The baseline remembers its ``--repeat``, and a run with a
+different one is refused (status 2) rather than compared. Time differences
+under MIN_SECONDS never fail (the small sizes of the fast stages take a few
+milliseconds), and cases the baseline has no entry for are reported as not
+gated: the stored baseline stops at 1M rows because 10M does not fit in the
+memory of the machine it was recorded on (see its "notes").
+
+    python benchmarks/run_benchmarks.py --sizes 10k 100k 1M 10M
+    python benchmarks/run_benchmarks.py --sizes 10k 100k --save-baseline
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from measure import measure
+from synthetic import SNAPSHOT_DATES, make_snapshots
+
+from analysis.create_figures import generate_exploratory_figures
+from analysis.generate_summary_stats import calculate_summary_stats, run_anova
+from pipeline.clean_raw_data import clean_airbnb_data
+from pipeline.create_aggregate_data import clean_joint_dataset, engineer_features, merge_quarterly_data
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = ["10k", "100k", "1M", "10M"]
+# below these absolute differences a change is noise, whatever the ratio
+MIN_SECONDS = 0.1  # timings of a few tens of ms vary by more than any threshold
+MIN_MIB = 1.0
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10_000, '1M' -> 1_000_000, '2500' -> 2500."""
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def prepare(rows: int) -> dict:
+    """Inputs of every stage for ``rows`` synthetic listings."""
+    raw = make_snapshots(rows)
+    quarterly = {}
+    for i, (snapshot, date) in enumerate(zip(raw, SNAPSHOT_DATES), start=1):
+        cleaned = clean_airbnb_data(snapshot)
+        cleaned["date"] = pd.Timestamp(date)
+        cleaned["quarter"] = f"Q{i}"
+        quarterly[i] = cleaned
+    merged = merge_quarterly_data(quarterly)
+    return {
+        "raw": pd.concat(raw, ignore_index=True),
+        "merged": merged,
+        "joint": clean_joint_dataset(merged),
+    }
+
+
+def _render_figures(joint):
+    with tempfile.TemporaryDirectory() as directory:
+        generate_exploratory_figures(joint, directory, workers=1)
+
+
+# stage -> (input name, function)
+STAGES = {
+    "clean_airbnb_data": ("raw", clean_airbnb_data),
+    "engineer_features": ("merged", engineer_features),
+    "clean_joint_dataset": ("merged", clean_joint_dataset),
+    "calculate_summary_stats": ("joint", calculate_summary_stats),
+    "run_anova": ("joint", run_anova),
+    "figures": ("joint", _render_figures),
+}
+
+
+_INPUTS = {}  # inputs of the size being measured, inherited by the forked case processes
+
+
+def _measure_case(stage: str, repeat: int) -> dict:
+    input_name, func = STAGES[stage]
+    with redirect_stdout(io.StringIO()):
+        return measure(func, _INPUTS[input_name], repeat)
+
+
+def run(sizes: list, stages: list, repeat: int) -> dict:
+    results = {stage: {} for stage in stages}
+    fork = multiprocessing.get_context("fork")
+    for size in sizes:
+        # the stages report progress with print; keep the benchmark output readable
+        with redirect_stdout(io.StringIO()):
+            _INPUTS.update(prepare(size))
+        for stage in stages:
+            # each case in a fresh fork of this process: caches filled by earlier cases
+            # (matplotlib's, pandas') do not change its peak memory or time
+            with ProcessPoolExecutor(max_workers=1, mp_context=fork) as pool:
+                measured = pool.submit(_measure_case, stage, repeat).result()
+            results[stage][str(size)] = result = {
+                "rows": len(_INPUTS[STAGES[stage][0]]), "seconds": round(measured["seconds"], 4),
+                "peak_mib": round(measured["peak_mib"], 2)}
+            print(f"  {stage:<24} {size:>10,} rows  {result['seconds']:9.3f} s  "
+                  f"peak {result['peak_mib']:9.1f} MiB", flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, time_threshold: float, memory_threshold: float) -> list:
+    """Cases that regressed beyond the thresholds, as printable messages."""
+    regressions = []
+    for stage, by_size in results.items():
+        for size, current in by_size.items():
+            previous = baseline.get(stage, {}).get(size)
+            if previous is None:
+                continue
+            for key, threshold, floor, unit in [("seconds", time_threshold, MIN_SECONDS, "s"),
+                                                ("peak_mib", memory_threshold, MIN_MIB, "MiB")]:
+                old, new = previous[key], current[key]
+                if new > old * (1 + threshold) and new - old > floor:
+                    regressions.append(f"{stage} @ {int(size):,} rows: {key} {old}{unit} -> {new}{unit} "
+                                       f"(+{100 * (new - old) / old:.0f}%, limit {100 * threshold:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline scaling benchmarks")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES,
+                        help="Numbers of synthetic listings, e.g. 10k 100k 1M 10M")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline instead of comparing")
+    parser.add_argument("--time-threshold", type=float, default=0.25,
+                        help="Allowed relative slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.10,
+                        help="Allowed relative growth of peak memory before failing")
+    parser.add_argument("--output", help="Also write these results to this JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # the traced peak of figures keeps shrinking over the first calls (matplotlib
+        # caches), so results are only comparable at the same number of runs
+        if baseline.get("repeat", args.repeat) != args.repeat:
+            print(f"{args.baseline} was recorded with --repeat {baseline['repeat']}; run with "
+                  f"the same --repeat, or save a new baseline to another --baseline path")
+            return 2
+
+    sizes = [parse_size(s) for s in args.sizes]
+    print(f"Benchmarking {', '.join(args.stages)} at {', '.join(f'{s:,}' for s in sizes)} rows")
+    results = run(sizes, args.stages, args.repeat)
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "pandas": pd.__version__},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        baseline = baseline or {"results": {}}
+        # keep baseline entries for sizes / stages not run this time
+        for stage, by_size in results.items():
+            baseline["results"].setdefault(stage, {}).update(by_size)
+        baseline["machine"] = report["machine"]
+        baseline["repeat"] = args.repeat
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    ungated = sorted({int(size) for stage, by_size in results.items() for size in by_size
+                      if size not in baseline["results"].get(stage, {})})
+    if ungated:
+        print(f"Not gated (no baseline): {', '.join(f'{s:,}' for s in ungated)} rows")
+    regressions = compare(results, baseline["results"], args.time_threshold, args.memory_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print("No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Synthetic InsideAirbnb listings for benchmarks.
+
+``make_snapshots`` produces raw ``listings.csv``-shaped frames (same columns
+and dtypes as ``read_raw_listings`` returns) for consecutive snapshots of a
+city: 25 neighbourhoods with their own centres and price levels, Boston's
+room-type mix, heavy-tailed prices and host portfolios, missing prices and
+reviews at the observed rates, a few invalid rows for the cleaning to drop,
+and panel attrition (each snapshot a share of listings leaves and new ones
+enter), so the balanced panel shrinks as snapshots are added.
+
+    from synthetic import make_snapshots
+    raw = make_snapshots(1_000_000)   # 4 snapshots, 1M rows in total
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from pipeline.schema import RAW_COLUMNS, RAW_READ_DTYPES
+
+SNAPSHOT_DATES = ["2024-09-18", "2024-12-20", "2025-03-15", "2025-06-19"]
+NEIGHBOURHOODS = [
+    "Allston", "Back Bay", "Bay Village", "Beacon Hill", "Brighton", "Charlestown",
+    "Chinatown", "Dorchester", "Downtown", "East Boston", "Fenway", "Hyde Park",
+    "Jamaica Plain", "Leather District", "Longwood Medical Area", "Mattapan",
+    "Mission Hill", "North End", "Roslindale", "Roxbury", "South Boston",
+    "South Boston Waterfront", "South End", "West End", "West Roxbury",
+]
+ROOM_TYPES = ["Entire home/apt", "Private room", "Hotel room", "Shared room"]
+ROOM_TYPE_SHARES = [0.68, 0.305, 0.012, 0.003]
+
+MISSING_PRICE = 0.18
+MISSING_REVIEWS = 0.22
+INVALID_ROWS = 0.02
+
+
+def _listings(ids: np.ndarray, rng) -> pd.DataFrame:
+    """Time-invariant attributes of new listings."""
+    n = len(ids)
+    hood = rng.integers(0, len(NEIGHBOURHOODS), n)
+    centre = np.random.default_rng(7).normal([42.33, -71.08], [0.03, 0.04], (len(NEIGHBOURHOODS), 2))
+    # most hosts have one listing, a few run large portfolios
+    portfolio = np.minimum(rng.zipf(2.2, n), 500)
+    hosts = rng.permutation(np.repeat(np.arange(n), portfolio)[:n]) + (int(ids[0]) * 10 if n else 0) + 1
+    return pd.DataFrame({
+        "id": ids,
+        "host_id": hosts,
+        "neighbourhood_code": hood,
+        "latitude": np.round(centre[hood, 0] + rng.normal(0, 0.006, n), 5),
+        "longitude": np.round(centre[hood, 1] + rng.normal(0, 0.008, n), 5),
+        "room_type_code": rng.choice(len(ROOM_TYPES), n, p=ROOM_TYPE_SHARES),
+        "base_price": rng.lognormal(5.2 + 0.3 * np.sin(hood), 0.6, n),
+    })
+
+
+def _snapshot(panel: pd.DataFrame, rng) -> pd.DataFrame:
+    """One raw snapshot of the listings in ``panel``."""
+    n = len(panel)
+    price = np.round(panel["base_price"].to_numpy() * rng.lognormal(0, 0.1, n))
+    price[rng.random(n) < MISSING_PRICE] = np.nan
+    reviews = rng.negative_binomial(1, 0.02, n)
+    no_reviews = rng.random(n) < MISSING_REVIEWS
+    last_review = pd.Timestamp("2024-09-01") - pd.to_timedelta(rng.integers(0, 2000, n), unit="D")
+    minimum_nights = np.where(rng.random(n) < 0.6, rng.integers(1, 4, n), rng.choice([7, 30, 91], n))
+    availability = rng.integers(0, 366, n)
+
+    invalid = rng.random(n) < INVALID_ROWS
+    minimum_nights[invalid & (rng.random(n) < 0.5)] = 400
+    availability[invalid & (minimum_nights != 400)] = -1
+
+    hosts = panel["host_id"].to_numpy()
+    _, host_index, host_counts = np.unique(hosts, return_inverse=True, return_counts=True)
+    raw = pd.DataFrame({
+        "id": panel["id"].to_numpy(),
+        "name": pd.Series(np.array([f"Listing {i}" for i in range(1000)])[panel["id"].to_numpy() % 1000]),
+        "host_id": hosts,
+        "host_name": pd.Series(np.array([f"Host {i}" for i in range(1000)])[hosts % 1000]),
+        "neighbourhood_group": np.nan,
+        "neighbourhood": np.array(NEIGHBOURHOODS)[panel["neighbourhood_code"].to_numpy()],
+        "latitude": panel["latitude"].to_numpy(),
+        "longitude": panel["longitude"].to_numpy(),
+        "room_type": np.array(ROOM_TYPES)[panel["room_type_code"].to_numpy()],
+        "price": price,
+        "minimum_nights": minimum_nights,
+        "number_of_reviews": reviews,
+        "last_review": np.where(no_reviews, None, last_review.strftime("%Y-%m-%d")),
+        "reviews_per_month": np.where(no_reviews, np.nan, np.round(reviews / rng.uniform(6, 120, n), 2)),
+        "calculated_host_listings_count": host_counts[host_index],
+        "availability_365": availability,
+        "number_of_reviews_ltm": rng.binomial(reviews, 0.2),
+        "license": np.where(rng.random(n) < 0.37, None, "STR-000000"),
+    })
+    return raw[RAW_COLUMNS].astype(RAW_READ_DTYPES)
+
+
+def make_snapshots(rows: int, snapshots: int = len(SNAPSHOT_DATES), attrition: float = 0.1,
+                   seed: int = 0) -> list:
+    """
+    ``snapshots`` raw frames with ``rows`` rows in total. Between consecutive
+    snapshots an ``attrition`` share of listings leaves and is replaced by
+    new listings, keeping the snapshot size constant.
+    """
+    rng = np.random.default_rng(seed)
+    per_snapshot = rows // snapshots
+    panel = _listings(np.arange(per_snapshot, dtype=np.int64), rng)
+    next_id = per_snapshot
+    frames = []
+    for i in range(snapshots):
+        if i:
+            stay = rng.random(len(panel)) >= attrition
+            entrants = len(panel) - int(stay.sum())
+            panel = pd.concat([panel[stay], _listings(np.arange(next_id, next_id + entrants), rng)],
+                              ignore_index=True)
+            next_id += entrants
+        frames.append(_snapshot(panel, rng))
+    return frames
@@ -1,78 +1,277 @@
 """
 Main entry point for the Airbnb analysis pipeline.
 Runs the complete analysis from raw data to final results.
+
+Stages are declared as a DAG with their inputs and outputs; a stage whose
+inputs, code and parameters are unchanged since its last successful run is
+skipped, and independent stages (figures, stats) run in parallel.
+
+Each stage is also a subcommand (``python run_analysis.py stats``). Stage
+modules are imported only when their stage runs, so a command loads just the
+libraries it needs (``stats`` never imports matplotlib, ``clean`` never
+imports scipy); ``test`` runs the test suite and ``all`` everything.
+``ingest`` appends new snapshots without rebuilding the earlier ones.
 """
 
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import json
 import os
+import shutil
 import sys
+from dataclasses import replace
 from datetime import datetime
-import pytest
 
 # Add src to path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 src_dir = os.path.join(current_dir, "src")
 sys.path.insert(0, src_dir)
 
-from pipeline.get_raw_data import main as download_data
-from pipeline.clean_raw_data import main as clean_data
-from pipeline.create_aggregate_data import main as aggregate_data
-from analysis.create_figures import main as create_figures
-from analysis.generate_summary_stats import main as generate_stats
+from pipeline import dag, profiling
+from pipeline.dag import Pipeline, Stage
 
+JOINT_DATASET = "data/processed/boston_listings_joint.parquet"
+AGGREGATE_CUBE = "data/processed/aggregate_cube*"
+HOST_PORTFOLIOS = "data/processed/host_portfolios.parquet"
+PROFILE_DIR = os.path.join(".pipeline_cache", "profile")
 
-def main():
-    """Run the complete analysis pipeline + tests"""
-    print("Starting Airbnb analysis pipeline...")
-    start_time = datetime.now()
+STAGES = [
+    Stage(
+        name="download",
+        target="pipeline.get_raw_data:main",
+        outputs=["data/raw/raw_manifest.json"],
+        always_run=True,  # conditional requests make unchanged reruns cheap
+    ),
+    Stage(
+        name="clean",
+        target="pipeline.clean_raw_data:main",
+        # the manifest names each blob by its content hash; legacy plain files are hashed
+        inputs=["data/raw/raw_manifest.json", "data/raw/listings_*.csv*"],
+        outputs=["data/processed/listings_quarter*.parquet", "results/tables/cleaning_violations.csv"],
+        deps=["download"],
+        code=["pipeline.storage", "pipeline.schema", "pipeline.cleaning_rules", "pipeline.raw_store"],
+    ),
+    Stage(
+        name="aggregate",
+        target="pipeline.create_aggregate_data:main",
+        inputs=["data/processed/listings_quarter*.parquet"],
+        outputs=[JOINT_DATASET, "data/processed/panel/*"],
+        deps=["clean"],
+        code=["pipeline.storage", "pipeline.schema", "pipeline.panel_store", "pipeline.spatial",
+              "pipeline.aggregate_cube"],
+    ),
+    Stage(
+        name="hosts",
+        target="pipeline.host_panel:main",
+        inputs=["data/processed/listings_quarter*.parquet"],
+        outputs=[HOST_PORTFOLIOS, "data/processed/host_room_mix.parquet"],
+        deps=["clean"],
+        code=["pipeline.storage", "pipeline.schema"],
+    ),
+    Stage(
+        name="cube",
+        target="pipeline.aggregate_cube:main",
+        inputs=[JOINT_DATASET],
+        outputs=[AGGREGATE_CUBE],
+        deps=["aggregate"],
+        code=["pipeline.storage", "pipeline.schema"],
+    ),
+    Stage(
+        name="figures",
+        target="analysis.create_figures:main",
+        inputs=[JOINT_DATASET, AGGREGATE_CUBE],
+        outputs=["results/figures/*.png"],
+        deps=["cube"],
+        code=["pipeline.storage", "pipeline.schema", "pipeline.aggregate_cube"],
+    ),
+    Stage(
+        name="stats",
+        target="analysis.generate_summary_stats:main",
+        inputs=[JOINT_DATASET, AGGREGATE_CUBE, HOST_PORTFOLIOS],
+        outputs=["results/tables/summary_statistics.csv", "results/tables/statistical_tests.csv",
+                 "results/tables/permutation_tests.csv", "results/tables/bootstrap_intervals.csv",
+                 "results/tables/host_summary.csv"],
+        deps=["cube", "hosts"],
+        code=["pipeline.storage", "pipeline.schema", "pipeline.aggregate_cube",
+              "analysis.streaming_stats", "analysis.resampling"],
+    ),
+]
 
-    # Define key paths
-    project_root = current_dir
-    data_processed = os.path.join(project_root, "data", "processed")
-    results_tables = os.path.join(project_root, "results", "tables")
 
-    try:
-        # Step 1: Download raw data
-        print("Step 1/5: Downloading raw data...")
-        download_data()
+COMMANDS = [s.name for s in STAGES] + ["all", "ingest", "test"]
+# stages whose outputs ``ingest`` updates in place
+INGESTED_STAGES = ["clean", "aggregate"]
+# libraries whose import dominates startup; reported so a stage's footprint is visible
+HEAVY_MODULES = ["pandas", "pyarrow", "numpy", "scipy", "matplotlib", "seaborn", "requests", "pytest"]
+
+
+def parse_args(argv=None):
+    """
+    ``run_analysis.py <command> [options]``; without a command (old style,
+    e.g. ``--offline --skip-tests``) the whole pipeline runs as ``all``.
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in COMMANDS + ["-h", "--help"]:
+        argv.insert(0, "all")
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    pipeline_options = argparse.ArgumentParser(add_help=False)
+    pipeline_options.add_argument("--force", action="store_true",
+                                  help="Rerun stages even if their inputs are unchanged")
+    pipeline_options.add_argument("--jobs", type=int, default=2,
+                                  help="Number of independent stages to run at once")
+    pipeline_options.add_argument("--offline", action="store_true",
+                                  help="Use the raw files already on disk instead of downloading")
+    pipeline_options.add_argument("--profile", action="store_true",
+                                  help=f"Record per-stage/step timings, memory, I/O and rows to "
+                                       f"{PROFILE_DIR}/run_report.json")
+    pipeline_options.add_argument("--cprofile", action="store_true",
+                                  help="With --profile, also dump a cProfile .prof file per stage")
+
+    stage_commands = {
+        stage.name: commands.add_parser(stage.name, parents=[pipeline_options],
+                                        help=f"Bring the {stage.name} stage (and what it needs) up to date")
+        for stage in STAGES
+    }
+    stage_commands["figures"].add_argument("--figures", nargs="+", metavar="NAME",
+                                           help="Render only these figures (names: "
+                                                "PYTHONPATH=src python -m analysis.create_figures --list)")
+    run_all = commands.add_parser("all", parents=[pipeline_options],
+                                  help="Run every stage, then the test suite")
+    run_all.add_argument("stages", nargs="*", help=argparse.SUPPRESS)  # old positional form
+    run_all.add_argument("--skip-tests", action="store_true",
+                         help="Do not run the test suite after the pipeline")
+    ingest = commands.add_parser("ingest", parents=[pipeline_options],
+                                 help="Append new snapshots incrementally, then update the later stages")
+    ingest.add_argument("dates", nargs="*",
+                        help="Snapshot dates (YYYY-MM-DD) to download and append; "
+                             "default: raw files newer than the joint dataset")
+    commands.add_parser("test", help="Run the test suite only")
+    return parser.parse_args(argv)
+
+
+def start_profiling(profile_dir, cprofile=False):
+    """Route stage/step records of this run (and its workers) to a fresh directory."""
+    records_dir = os.path.join(profile_dir, "current")
+    shutil.rmtree(records_dir, ignore_errors=True)
+    os.environ[profiling.PROFILE_DIR_ENV] = records_dir
+    if cprofile:
+        os.environ[profiling.CPROFILE_ENV] = "1"
+
+
+def write_run_report(profile_dir, status, wall_s):
+    """Write run_report.json (keeping the last one) and print the per-stage summary."""
+    report_path = os.path.join(profile_dir, "run_report.json")
+    previous = None
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            previous = json.load(f)
+        os.replace(report_path, os.path.join(profile_dir, "run_report.previous.json"))
 
-        # Step 2: Clean data
-        print("Step 2/5: Cleaning data...")
-        clean_data()
+    report = profiling.build_report(os.environ[profiling.PROFILE_DIR_ENV], status, wall_s, previous)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
 
-        # Step 3: Create aggregate dataset
-        print("Step 3/5: Creating aggregate dataset...")
-        aggregate_data()
+    print(f"\nRun report: {report_path}")
+    for stage in report["stages"]:
+        change = report.get("changes", {}).get(stage["name"], {}).get("wall_s", {}).get("change_pct")
+        trend = f" ({change:+.1f}% vs previous)" if change is not None else ""
+        peak = f"{stage['peak_rss_mb']:8.1f} MiB" if stage["peak_rss_mb"] is not None else "     n/a"
+        print(f"  {stage['name']:<10} wall {stage['wall_s']:8.2f}s  cpu {stage['cpu_s']:8.2f}s  "
+              f"peak rss {peak}{trend}")
 
-        # Step 4: Generate figures
-        print("Step 4/5: Creating figures...")
-        create_figures()
 
-        # Step 5: Generate summary statistics
-        print("Step 5/5: Generating summary statistics...")
-        generate_stats()
+def ingest_snapshots(pipeline, dates, offline=False):
+    """
+    Download (unless ``offline``) and append the snapshots for ``dates`` to the
+    cleaned quarters and the joint dataset, then record those stages as up to
+    date so the next run does not rebuild them.
+    """
+    if dates and not offline:
+        dag.run_target("pipeline.get_raw_data:main", {"dates": dates}, "download")
+    dag.run_target("pipeline.ingest:main", {"dates": dates or None}, "ingest")
+    pipeline.record(INGESTED_STAGES)
 
 
+def run_tests(project_root) -> int:
+    """Run the test suite (pytest is only imported here)."""
+    import pytest
+
+    print("\nRunning test suite...")
+    exit_code = pytest.main([os.path.join(project_root, "tests"), "-v"])
+    if exit_code == 0:
+        print("All tests passed!")
+    else:
+        print("Some tests failed. Check logs above.")
+    return exit_code
+
+
+def report_imports(startup_s):
+    """Print the import cost of this command: CLI startup, each stage module, heavy libraries."""
+    stage_imports = ", ".join(f"{target.split(':')[0]} {seconds:.2f}s"
+                              for target, seconds in dag.IMPORT_SECONDS.items())
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    print(f"Import time: startup {startup_s:.2f}s"
+          + (f"; stages: {stage_imports}" if stage_imports else "")
+          + f"; loaded: {', '.join(loaded) or 'none'}")
+
+
+def main(argv=None):
+    """Run one pipeline stage, the complete pipeline (+ tests) or the tests"""
+    startup_s = time.perf_counter() - _START
+    args = parse_args(argv)
+
+    # Define key paths
+    project_root = current_dir
+    if args.command == "test":
+        sys.exit(run_tests(project_root))
+
+    print("Starting Airbnb analysis pipeline...")
+    start_time = datetime.now()
+    profile_dir = os.path.join(project_root, PROFILE_DIR)
+    if args.profile:
+        start_profiling(profile_dir, args.cprofile)
+
+    try:
+        # Stage functions resolve paths from the working directory
+        os.chdir(project_root)
+        stages = STAGES
+        if getattr(args, "figures", None):
+            # a subset is a different parameterization: it is not mistaken for a full render
+            stages = [replace(s, params={"names": args.figures}) if s.name == "figures" else s
+                      for s in STAGES]
+        pipeline = Pipeline(stages, project_root)
+        skip = ["download"] if args.offline else None
+        if args.command == "ingest":
+            ingest_snapshots(pipeline, args.dates, args.offline)
+            names, skip = None, ["download"]
+        else:
+            names = (args.stages or None) if args.command == "all" else [args.command]
+        status = pipeline.run(names, force=args.force, jobs=args.jobs, skip=skip)
+
         end_time = datetime.now()
         duration = end_time - start_time
 
         print("Analysis completed successfully!")
+        for name, outcome in status.items():
+            print(f"  {name}: {outcome}")
         print(f"Total duration: {duration}")
-
-        # Run tests after pipeline
-        print("\nRunning test suite...")
-        test_dir = os.path.join(project_root, "tests")
-        # Run pytest programmatically
-        pytest_args = [test_dir, "-v"]
-        exit_code = pytest.main(pytest_args)
-        if exit_code == 0:
-            print("All tests passed!")
-        else:
-            print("Some tests failed. Check logs above.")
+        report_imports(startup_s)
+        if args.profile:
+            write_run_report(profile_dir, status, duration.total_seconds())
 
     except Exception as e:
         print(f"Pipeline failed: {e}")
         sys.exit(1)
 
+    if args.command == "all" and not args.skip_tests:
+        run_tests(project_root)
+
 
 if __name__ == "__main__":
     main()
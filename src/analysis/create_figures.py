@@ -1,237 +1,507 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import colorsys
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")  # non-interactive backend: renderers also run in worker processes
+import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from pipeline import artifacts, profiling
+from pipeline.aggregate_cube import cube_exists, load_cube
+from pipeline.schema import required_columns, uses
+from pipeline.storage import dataset_path
+
+# name -> renderer; each renderer draws one PNG from the data and shared aggregates
+FIGURES = {}
+
+
+def register_figure(name, columns=()):
+    """
+    Register a renderer ``func(df, aggregates) -> Figure`` saved as
+    ``<name>.png``. ``columns`` are the joint dataset columns it reads from
+    ``df`` itself (most renderers only draw ``aggregates``).
+    """
+    def decorator(func):
+        func = uses(*columns)(func)
+        FIGURES[name] = func
+        return func
+    return decorator
+
+
+def _observed(series):
+    """Drop categories with no rows (e.g. room types removed by cleaning)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.remove_unused_categories()
+    return series
+
+
+# Box plots keep at most this many outlier points per box (evenly spaced over
+# the sorted outliers, so the most extreme ones are always drawn)
+MAX_FLIERS = 200
+HISTOGRAM_BINS = 50
+
+
+def _sorted_quantile(x, q):
+    """``q``-quantile of sorted ``x`` with numpy's default linear interpolation."""
+    position = (len(x) - 1) * q
+    lower = int(np.floor(position))
+    upper = min(lower + 1, len(x) - 1)
+    return x[lower] + (position - lower) * (x[upper] - x[lower])
+
+
+def box_stats(values, groups, order=None, whis=1.5, max_fliers=MAX_FLIERS):
+    """
+    Box plot statistics per group, in the form ``Axes.bxp`` draws.
+
+    Same quartiles, whiskers (furthest point within ``whis`` IQRs) and outliers
+    as ``matplotlib.cbook.boxplot_stats``, but computed from one sort of all
+    rows by (group, value) instead of per-group copies, and with the outliers
+    thinned to ``max_fliers`` per box.
+
+    Args:
+        values: numeric values (missing values are ignored)
+        groups: group label of each value
+        order: group labels to return, in this order (default: observed
+            categories, or sorted labels)
+    """
+    groups = _observed(pd.Series(groups).astype('category')) if order is None \
+        else pd.Series(pd.Categorical(groups, categories=list(order)))
+    labels = list(groups.cat.categories)
+    codes = groups.cat.codes.to_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    valid = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    values = values[np.lexsort((values, codes))]
+    counts = np.bincount(codes, minlength=len(labels))
+    starts = np.r_[0, np.cumsum(counts)]
+
+    stats = []
+    for g, label in enumerate(labels):
+        x = values[starts[g]:starts[g + 1]]
+        if not len(x):
+            continue
+        q1, med, q3 = (_sorted_quantile(x, q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        low = np.searchsorted(x, q1 - whis * iqr, side='left')
+        high = np.searchsorted(x, q3 + whis * iqr, side='right')
+        fliers = np.concatenate([x[:low], x[high:]])
+        if len(fliers) > max_fliers:
+            fliers = fliers[np.unique(np.linspace(0, len(fliers) - 1, max_fliers).round().astype(int))]
+        stats.append({
+            'label': label, 'n': len(x), 'med': med, 'q1': q1, 'q3': q3,
+            'whislo': min(x[low], q1) if low < len(x) else q1,
+            'whishi': max(x[high - 1], q3) if high > 0 else q3,
+            'fliers': fliers,
+        })
+    return stats
+
+
+def histogram(values, bins=HISTOGRAM_BINS):
+    """(counts, bin edges) of the non-missing ``values``, as ``Series.hist`` bins them."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.histogram(values[~np.isnan(values)], bins=bins)
 
 
-def generate_exploratory_figures(df, results_path):
-    """Generate exploratory analysis figures using engineered features"""
-    
+def compute_distributions(df, top_neighbourhoods):
+    """
+    Binned summaries behind the distribution figures, so rendering them costs
+    the same whatever the number of rows. Columns the data lacks are skipped.
+    """
+    distributions = {}
+    for column in ['price', 'log_price']:
+        if column in df.columns:
+            distributions[f'{column}_by_quarter'] = box_stats(df[column], df['quarter'])
+    if 'price_premium_pct' in df.columns:
+        distributions['price_premium_hist'] = histogram(df['price_premium_pct'])
+    top = df['neighbourhood'].isin(top_neighbourhoods).to_numpy()
+    distributions['price_by_neighbourhood'] = box_stats(
+        df['price'].to_numpy()[top], df['neighbourhood'].to_numpy()[top], order=top_neighbourhoods)
+    return distributions
+
+
+# quarterly aggregate name -> (metric, statistic)
+QUARTERLY_AGGREGATES = {
+    'availability_mean': ('availability_365', 'mean'),
+    'highly_available_pct': ('is_highly_available', 'mean'),
+    'price_premium_mean': ('price_premium_pct', 'mean'),
+    'reviews_per_month_mean': ('reviews_per_month', 'mean'),
+    'number_of_reviews_median': ('number_of_reviews', 'median'),
+    'price_median': ('price', 'median'),
+    'neighborhood_avg_price_mean': ('neighborhood_avg_price', 'mean'),
+}
+# joint dataset columns behind the shared aggregates, and those only read
+# when no cube answers the quarter / room type / neighbourhood aggregates
+AGGREGATE_COLUMNS = ['quarter', 'neighbourhood', 'price', 'log_price', 'price_premium_pct',
+                     'price_category', 'is_peak_season']
+ROW_AGGREGATE_COLUMNS = ['room_type'] + [metric for metric, _ in QUARTERLY_AGGREGATES.values()]
+
+
+@profiling.profiled
+@uses(*AGGREGATE_COLUMNS, *ROW_AGGREGATE_COLUMNS)
+def compute_aggregates(df, cube=None):
+    """
+    Group-level aggregates shared by several figures, computed once per run.
+
+    With an ``AggregateCube`` the quarter / neighbourhood / room type
+    aggregates are read from the cube instead of scanning the rows.
+    """
+    if cube is not None:
+        quarterly = pd.DataFrame({
+            name: cube.stats(['quarter'], metric, [stat])[stat]
+            for name, (metric, stat) in QUARTERLY_AGGREGATES.items()
+        })
+        by_room_type = cube.stats(['quarter', 'room_type'], 'price', ['count', 'median'])
+        room_type_counts = by_room_type['count'].unstack(fill_value=0)
+        room_type_pct = room_type_counts.div(room_type_counts.sum(axis=1), axis=0) * 100
+        room_type_pricing = by_room_type['median'].unstack()
+        neighbourhood_counts = (cube.stats(['neighbourhood'], 'price', ['count'])['count']
+                                .sort_values(ascending=False, kind='stable'))
+    else:
+        room_type = _observed(df['room_type'])
+        quarterly = df.groupby('quarter', observed=True).agg(**QUARTERLY_AGGREGATES)
+        room_type_pct = pd.crosstab(df['quarter'], room_type, normalize='index') * 100
+        room_type_pricing = df.groupby(['quarter', room_type], observed=True)['price'].median().unstack()
+        neighbourhood_counts = df['neighbourhood'].value_counts()
+
+    quarterly['highly_available_pct'] *= 100
+    return {
+        **compute_distributions(df, list(neighbourhood_counts.head(5).index)),
+        'quarterly': quarterly,
+        'neighbourhood_counts': neighbourhood_counts,
+        'price_category_pct': pd.crosstab(df['quarter'], df['price_category'], normalize='index') * 100,
+        'room_type_pct': room_type_pct,
+        'room_type_pricing': room_type_pricing,
+        'season_comparison': df.groupby('is_peak_season')['price'].agg(['mean', 'median', 'count']),
+    }
+
+
+def _boxplot(ax, boxes, xlabel, ylabel):
+    """Draw precomputed ``box_stats`` the way ``seaborn.boxplot`` draws raw values."""
+    color = sns.desaturate(sns.color_palette()[0], 0.75)
+    line = colorsys.rgb_to_hls(*matplotlib.colors.to_rgb(color))[1] * 0.6
+    linecolor = (line, line, line)
+    ax.bxp(boxes, positions=range(len(boxes)), widths=0.8, capwidths=0.4, patch_artist=True,
+           manage_ticks=False,
+           boxprops={'facecolor': color, 'edgecolor': linecolor},
+           medianprops={'color': linecolor, 'solid_capstyle': 'butt'},
+           whiskerprops={'color': linecolor, 'solid_capstyle': 'butt'},
+           capprops={'color': linecolor},
+           flierprops={'markeredgecolor': linecolor})
+    ax.set_xticks(range(len(boxes)), [str(b['label']) for b in boxes])
+    ax.set_xlim(-0.5, len(boxes) - 0.5)
+    ax.xaxis.grid(False)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+
+def _set_style():
     # Set style for better visuals
     plt.style.use('seaborn-v0_8')
     sns.set_palette("husl")
-    
-    # 1. Price distribution by quarter (with log scale option)
+
+
+# 1. Price distribution by quarter (with log scale option)
+@register_figure('price_distribution_by_quarter')
+def plot_price_distribution_by_quarter(df, aggregates):
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-    
+
     # Regular price
-    sns.boxplot(data=df, x='quarter', y='price', ax=ax1)
+    _boxplot(ax1, aggregates['price_by_quarter'], 'quarter', 'Price ($)')
     ax1.set_title('Price Distribution by Quarter')
-    ax1.set_ylabel('Price ($)')
-    
+
     # Log price for better visualization of distribution
-    sns.boxplot(data=df, x='quarter', y='log_price', ax=ax2)
+    _boxplot(ax2, aggregates['log_price_by_quarter'], 'quarter', 'Log(Price)')
     ax2.set_title('Log Price Distribution by Quarter')
-    ax2.set_ylabel('Log(Price)')
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'price_distribution_by_quarter.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 2. Price categories across quarters
-    plt.figure(figsize=(12, 8))
-    price_cat_counts = pd.crosstab(df['quarter'], df['price_category'], normalize='index') * 100
-    price_cat_counts.plot(kind='bar', stacked=True, ax=plt.gca())
+    return fig
+
+
+# 2. Price categories across quarters
+@register_figure('price_category_distribution')
+def plot_price_category_distribution(df, aggregates):
+    fig = plt.figure(figsize=(12, 8))
+    aggregates['price_category_pct'].plot(kind='bar', stacked=True, ax=plt.gca())
     plt.title('Price Category Distribution by Quarter')
     plt.ylabel('Percentage (%)')
     plt.xlabel('Quarter')
     plt.legend(title='Price Category', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'price_category_distribution.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 3. Availability analysis
+    return fig
+
+
+# 3. Availability analysis
+@register_figure('availability_analysis')
+def plot_availability_analysis(df, aggregates):
+    quarterly = aggregates['quarterly']
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-    
+
     # Average availability by quarter
-    availability_by_quarter = df.groupby('quarter')['availability_365'].mean()
-    availability_by_quarter.plot(kind='bar', ax=ax1, color='skyblue')
+    quarterly['availability_mean'].plot(kind='bar', ax=ax1, color='skyblue')
     ax1.set_title('Average Availability by Quarter')
     ax1.set_ylabel('Average Availability (days)')
     ax1.set_xlabel('Quarter')
-    
+
     # Highly available listings percentage
-    highly_available_pct = df.groupby('quarter')['is_highly_available'].mean() * 100
-    highly_available_pct.plot(kind='bar', ax=ax2, color='lightcoral')
+    quarterly['highly_available_pct'].plot(kind='bar', ax=ax2, color='lightcoral')
     ax2.set_title('Percentage of Highly Available Listings (>180 days)')
     ax2.set_ylabel('Percentage (%)')
     ax2.set_xlabel('Quarter')
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'availability_analysis.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 4. Neighborhood analysis - Top 10 neighborhoods by listing count
-    plt.figure(figsize=(12, 8))
-    top_neighborhoods = df['neighbourhood'].value_counts().head(10)
+    return fig
+
+
+# 4. Neighborhood analysis - Top 10 neighborhoods by listing count
+@register_figure('top_neighborhoods')
+def plot_top_neighborhoods(df, aggregates):
+    fig = plt.figure(figsize=(12, 8))
+    top_neighborhoods = aggregates['neighbourhood_counts'].head(10)
     top_neighborhoods.plot(kind='barh', color='teal')
     plt.title('Top 10 Neighborhoods by Number of Listings')
     plt.xlabel('Number of Listings')
     plt.gca().invert_yaxis()
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'top_neighborhoods.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 5. Room type distribution across quarters
-    plt.figure(figsize=(12, 8))
-    room_type_pct = pd.crosstab(df['quarter'], df['room_type'], normalize='index') * 100
-    room_type_pct.plot(kind='bar', stacked=True, ax=plt.gca())
+    return fig
+
+
+# 5. Room type distribution across quarters
+@register_figure('room_type_distribution')
+def plot_room_type_distribution(df, aggregates):
+    fig = plt.figure(figsize=(12, 8))
+    aggregates['room_type_pct'].plot(kind='bar', stacked=True, ax=plt.gca())
     plt.title('Room Type Distribution by Quarter')
     plt.ylabel('Percentage (%)')
     plt.xlabel('Quarter')
     plt.legend(title='Room Type', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'room_type_distribution.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 6. Price premium analysis
+    return fig
+
+
+# 6. Price premium analysis
+@register_figure('price_premium_analysis')
+def plot_price_premium_analysis(df, aggregates):
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-    
+
     # Price premium distribution
-    df['price_premium_pct'].hist(bins=50, ax=ax1, alpha=0.7, color='orange')
+    counts, edges = aggregates['price_premium_hist']
+    ax1.hist(edges[:-1], bins=edges, weights=counts, alpha=0.7, color='orange')
+    ax1.grid(True)
     ax1.set_title('Distribution of Price Premium Relative to Neighborhood')
     ax1.set_xlabel('Price Premium (%)')
     ax1.set_ylabel('Frequency')
     ax1.axvline(0, color='red', linestyle='--', alpha=0.8)
-    
+
     # Average price premium by quarter
-    premium_by_quarter = df.groupby('quarter')['price_premium_pct'].mean()
-    premium_by_quarter.plot(kind='bar', ax=ax2, color='gold')
+    aggregates['quarterly']['price_premium_mean'].plot(kind='bar', ax=ax2, color='gold')
     ax2.set_title('Average Price Premium by Quarter')
     ax2.set_ylabel('Average Price Premium (%)')
     ax2.set_xlabel('Quarter')
     ax2.axhline(0, color='red', linestyle='--', alpha=0.5)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'price_premium_analysis.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 7. Peak season vs off-season comparison
-    plt.figure(figsize=(10, 6))
-    season_comparison = df.groupby('is_peak_season')['price'].agg(['mean', 'median', 'count'])
+    return fig
+
+
+# 7. Peak season vs off-season comparison
+@register_figure('seasonal_pricing')
+def plot_seasonal_pricing(df, aggregates):
+    fig = plt.figure(figsize=(10, 6))
+    season_comparison = aggregates['season_comparison']
     season_comparison[['mean', 'median']].plot(kind='bar', ax=plt.gca())
     plt.title('Price Comparison: Peak Season vs Off-Season')
     plt.ylabel('Price ($)')
     plt.xlabel('Season')
     plt.xticks([0, 1], ['Off-Season', 'Peak Season'], rotation=0)
     plt.legend(['Mean Price', 'Median Price'])
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'seasonal_pricing.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 8. Review activity analysis (using existing review columns)
+    return fig
+
+
+# 8. Review activity analysis (using existing review columns)
+@register_figure('review_activity_analysis')
+def plot_review_activity_analysis(df, aggregates):
+    quarterly = aggregates['quarterly']
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-    
+
     # Average reviews per month by quarter
-    reviews_by_quarter = df.groupby('quarter')['reviews_per_month'].mean()
-    reviews_by_quarter.plot(kind='bar', ax=ax1, color='green')
+    quarterly['reviews_per_month_mean'].plot(kind='bar', ax=ax1, color='green')
     ax1.set_title('Average Reviews per Month by Quarter')
     ax1.set_ylabel('Reviews per Month')
     ax1.set_xlabel('Quarter')
-    
+
     # Number of reviews by quarter
-    total_reviews_by_quarter = df.groupby('quarter')['number_of_reviews'].median()
-    total_reviews_by_quarter.plot(kind='bar', ax=ax2, color='purple')
+    quarterly['number_of_reviews_median'].plot(kind='bar', ax=ax2, color='purple')
     ax2.set_title('Median Number of Reviews by Quarter')
     ax2.set_ylabel('Number of Reviews')
     ax2.set_xlabel('Quarter')
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'review_activity_analysis.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 9. Enhanced correlation heatmap (focus on key engineered features)
-    engineered_features = [
-        'price', 'log_price', 'minimum_nights', 'availability_365', 'availability_rate',
-        'number_of_reviews', 'reviews_per_month', 'calculated_host_listings_count',
-        'neighborhood_avg_price', 'price_premium_pct', 'neighborhood_count'
-    ]
-    
+    return fig
+
+
+# 9. Enhanced correlation heatmap (focus on key engineered features)
+CORRELATION_FEATURES = [
+    'price', 'log_price', 'minimum_nights', 'availability_365', 'availability_rate',
+    'number_of_reviews', 'reviews_per_month', 'calculated_host_listings_count',
+    'neighborhood_avg_price', 'price_premium_pct', 'neighborhood_count'
+]
+
+
+@register_figure('correlation_matrix_enhanced', columns=CORRELATION_FEATURES)
+def plot_correlation_matrix(df, aggregates):
     # Select only columns that exist in the dataframe
-    existing_features = [col for col in engineered_features if col in df.columns]
+    existing_features = [col for col in CORRELATION_FEATURES if col in df.columns]
     corr_matrix = df[existing_features].corr()
-    
-    plt.figure(figsize=(12, 10))
+
+    fig = plt.figure(figsize=(12, 10))
     mask = np.triu(np.ones_like(corr_matrix, dtype=bool))  # Mask upper triangle
-    sns.heatmap(corr_matrix, mask=mask, annot=True, cmap='coolwarm', center=0, 
+    sns.heatmap(corr_matrix, mask=mask, annot=True, cmap='coolwarm', center=0,
                 square=True, fmt='.2f', cbar_kws={"shrink": .8})
     plt.title('Correlation Matrix of Engineered Features')
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'correlation_matrix_enhanced.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 10. Time trend of key metrics
-    quarterly_metrics = df.groupby('quarter').agg({
-        'price': 'median',
-        'availability_365': 'mean',
-        'number_of_reviews': 'median',
-        'neighborhood_avg_price': 'mean'
-    }).reset_index()
-    
+    return fig
+
+
+# 10. Time trend of key metrics
+@register_figure('time_trends')
+def plot_time_trends(df, aggregates):
+    quarterly_metrics = aggregates['quarterly']
+
     fig, axes = plt.subplots(2, 2, figsize=(15, 10))
     axes = axes.flatten()
-    
-    metrics = ['price', 'availability_365', 'number_of_reviews', 'neighborhood_avg_price']
+
+    metrics = ['price_median', 'availability_mean', 'number_of_reviews_median', 'neighborhood_avg_price_mean']
     titles = ['Median Price', 'Average Availability', 'Median Reviews', 'Neighborhood Avg Price']
     colors = ['blue', 'green', 'red', 'purple']
-    
+
     for i, (metric, title, color) in enumerate(zip(metrics, titles, colors)):
-        axes[i].plot(range(len(quarterly_metrics)), quarterly_metrics[metric], 
+        axes[i].plot(range(len(quarterly_metrics)), quarterly_metrics[metric],
                     marker='o', linewidth=2, markersize=8, color=color)
         axes[i].set_title(f'{title} Trend')
         axes[i].set_xlabel('Quarter')
         axes[i].set_ylabel(title)
         axes[i].set_xticks(range(len(quarterly_metrics)))
-        axes[i].set_xticklabels(quarterly_metrics['quarter'])
+        axes[i].set_xticklabels(quarterly_metrics.index.astype(str))
         axes[i].grid(True, alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'time_trends.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 11. Room type pricing comparison
-    plt.figure(figsize=(12, 8))
-    room_type_pricing = df.groupby(['quarter', 'room_type'])['price'].median().unstack()
-    room_type_pricing.plot(kind='bar', ax=plt.gca())
+    return fig
+
+
+# 11. Room type pricing comparison
+@register_figure('room_type_pricing')
+def plot_room_type_pricing(df, aggregates):
+    fig = plt.figure(figsize=(12, 8))
+    aggregates['room_type_pricing'].plot(kind='bar', ax=plt.gca())
     plt.title('Median Price by Room Type and Quarter')
     plt.ylabel('Median Price ($)')
     plt.xlabel('Quarter')
     plt.legend(title='Room Type', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'room_type_pricing.png'), dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 12. Neighborhood price distribution (top 5 neighborhoods)
-    plt.figure(figsize=(12, 8))
-    top_5_neighborhoods = df['neighbourhood'].value_counts().head(5).index
-    top_neighborhood_data = df[df['neighbourhood'].isin(top_5_neighborhoods)]
-    
-    sns.boxplot(data=top_neighborhood_data, x='neighbourhood', y='price')
+    return fig
+
+
+# 12. Neighborhood price distribution (top 5 neighborhoods)
+@register_figure('neighborhood_pricing')
+def plot_neighborhood_pricing(df, aggregates):
+    fig = plt.figure(figsize=(12, 8))
+    _boxplot(plt.gca(), aggregates['price_by_neighbourhood'], 'neighbourhood', 'Price ($)')
     plt.title('Price Distribution in Top 5 Neighborhoods')
     plt.ylabel('Price ($)')
     plt.xlabel('Neighborhood')
     plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_path, 'neighborhood_pricing.png'), dpi=300, bbox_inches='tight')
-    plt.close()
+    return fig
 
-def main():
+
+# State of a worker process, set once by _init_worker instead of pickled per figure
+_WORKER_STATE = {}
+
+
+def _init_worker(df, aggregates, results_path):
+    _set_style()
+    _WORKER_STATE.update(df=df, aggregates=aggregates, results_path=results_path)
+
+
+def render_figure(name, df, aggregates, results_path):
+    """Render one registered figure to ``<results_path>/<name>.png``."""
+    with profiling.step(f"figure[{name}]"):
+        fig = FIGURES[name](df, aggregates)
+        fig.tight_layout()
+        path = os.path.join(results_path, f'{name}.png')
+        fig.savefig(path, dpi=300, bbox_inches='tight')
+        plt.close(fig)
+    return path
+
+
+def _render_in_worker(name):
+    state = _WORKER_STATE
+    return render_figure(name, state['df'], state['aggregates'], state['results_path'])
+
+
+def generate_exploratory_figures(df, results_path, names=None, workers=1, cube=None):
+    """
+    Generate exploratory analysis figures using engineered features
+
+    Args:
+        df: joint dataset
+        results_path: directory the PNGs are written to
+        names: registered figure names to render (default: all)
+        workers: processes rendering in parallel (1 renders in this process)
+        cube: optional AggregateCube answering the group-level aggregates
+
+    Returns:
+        list: paths of the rendered figures
+    """
+    names = list(FIGURES) if names is None else list(names)
+    unknown = [n for n in names if n not in FIGURES]
+    if unknown:
+        raise ValueError(f"Unknown figures {unknown}; available: {sorted(FIGURES)}")
+
+    aggregates = compute_aggregates(df, cube)
+    workers = min(workers or os.cpu_count() or 1, len(names))
+    if workers <= 1:
+        _set_style()
+        return [render_figure(name, df, aggregates, results_path) for name in names]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(df, aggregates, results_path)) as pool:
+        return list(pool.map(_render_in_worker, names))
+
+
+def figure_columns(names=None, cube=False) -> list:
+    """
+    Joint dataset columns needed to render ``names`` (default: all figures):
+    those of the shared aggregates plus those the renderers read themselves.
+    With a ``cube`` the group-level aggregates need no rows.
+    """
+    renderers = [FIGURES[n] for n in (FIGURES if names is None else names) if n in FIGURES]
+    aggregate_columns = AGGREGATE_COLUMNS + ([] if cube else ROW_AGGREGATE_COLUMNS)
+    return list(dict.fromkeys(aggregate_columns + required_columns(*renderers)))
+
+
+def main(names=None, workers=None):
     current_path = os.getcwd()
     project_path = current_path.replace("/src/analysis", "")
     processed_data_path = os.path.join(project_path, "data", "processed")
     figures_results_path = os.path.join(project_path, "results", "figures")
-    
+
     # Create results directory if it doesn't exist
     os.makedirs(figures_results_path, exist_ok=True)
-    
+
     print("Loading joint dataset...")
-    df = pd.read_csv(os.path.join(processed_data_path, "boston_listings_joint.csv"))
-    
+    cube = load_cube(processed_data_path) if cube_exists(processed_data_path) else None
+    df = artifacts.consume(dataset_path(processed_data_path, "boston_listings_joint"),
+                           columns=figure_columns(names, cube=cube is not None))
+    profiling.count_rows(rows_in=len(df))
+
     print("Generating exploratory figures...")
-    generate_exploratory_figures(df, figures_results_path)
-    
+    generate_exploratory_figures(df, figures_results_path, names=names, workers=workers, cube=cube)
+
     print(f"Exploratory analysis complete! Figures saved to {figures_results_path}")
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render exploratory figures")
+    parser.add_argument("--figures", nargs="+", metavar="NAME",
+                        help="Figures to render (default: all)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Rendering processes (default: one per CPU)")
+    parser.add_argument("--list", action="store_true", help="List figure names and exit")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.list:
+        print("\n".join(FIGURES))
+    else:
+        main(names=args.figures, workers=args.workers)
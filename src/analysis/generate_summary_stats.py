@@ -2,23 +2,69 @@ import pandas as pd
 import os
 from scipy import stats
 
-
-def calculate_summary_stats(df: pd.DataFrame) -> pd.DataFrame:
-    """Calculate summary statistics grouped by quarter (no file writing)."""
-    return df.groupby("quarter").agg({
-        "price": ["mean", "median", "std", "count"],
-        "availability_365": ["mean", "median", "std"],
-        "number_of_reviews": ["mean", "median", "std"]
-    }).round(2)
-
-
-def run_anova(df: pd.DataFrame) -> pd.DataFrame:
-    """Run ANOVA on price across quarters (no file writing)."""
-    price_by_quarter = [
-        df[df["quarter"] == q]["price"].dropna() for q in df["quarter"].unique()
-    ]
-    f_stat, p_value = stats.f_oneway(*price_by_quarter)
-
+from pipeline import artifacts, profiling
+from pipeline.aggregate_cube import AggregateCube, cube_exists, load_cube
+from pipeline.host_panel import PORTFOLIOS_NAME
+from analysis.resampling import N_RESAMPLES, RESAMPLING_DIMENSIONS, run_resampling_tests
+from analysis.streaming_stats import SUMMARY_STATS, StreamingStats, stats_from_datasets
+from pipeline.schema import required_columns, uses
+from pipeline.storage import dataset_path
+
+HOST_FLOWS = ["listings_entered", "listings_exited", "listings_switched_in", "host_entered", "host_exited"]
+
+
+@uses("quarter", *SUMMARY_STATS)
+def calculate_summary_stats(df) -> pd.DataFrame:
+    """
+    Calculate summary statistics grouped by quarter (no file writing).
+
+    ``df`` is either the row-level joint dataset, an ``AggregateCube`` or a
+    ``StreamingStats`` state, which give the same table from group-level
+    statistics.
+    """
+    if isinstance(df, StreamingStats):
+        return df.summary_table(SUMMARY_STATS)
+    if isinstance(df, AggregateCube):
+        return pd.concat(
+            {metric: df.stats(["quarter"], metric, stats) for metric, stats in SUMMARY_STATS.items()},
+            axis=1,
+        ).round(2)
+    return df.groupby("quarter", observed=True).agg(SUMMARY_STATS).round(2)
+
+
+@uses("quarter", "price")
+def run_anova(df) -> pd.DataFrame:
+    """
+    Run ANOVA on price across quarters (no file writing); accepts an
+    AggregateCube or a StreamingStats state too.
+    """
+    if isinstance(df, StreamingStats):
+        f_stat, p_value = df.anova("price")
+    elif isinstance(df, AggregateCube):
+        f_stat, p_value = _anova_from_cube(df)
+    else:
+        # one grouping pass; float64 for the statistic even when price is float32
+        price_by_quarter = [
+            prices.dropna().astype("float64")
+            for _, prices in df.groupby("quarter", observed=True)["price"]
+        ]
+        f_stat, p_value = stats.f_oneway(*price_by_quarter)
+
+    return _anova_table(f_stat, p_value)
+
+
+def _anova_from_cube(cube: AggregateCube):
+    """One-way ANOVA F and p from per-quarter count, mean and variance."""
+    groups = cube.stats(["quarter"], "price", ["count", "mean", "var"])
+    k, n = len(groups), groups["count"].sum()
+    grand_mean = (groups["count"] * groups["mean"]).sum() / n
+    ss_between = (groups["count"] * (groups["mean"] - grand_mean) ** 2).sum()
+    ss_within = ((groups["count"] - 1) * groups["var"].fillna(0)).sum()
+    f_stat = (ss_between / (k - 1)) / (ss_within / (n - k))
+    return f_stat, stats.f.sf(f_stat, k - 1, n - k)
+
+
+def _anova_table(f_stat, p_value) -> pd.DataFrame:
     return pd.DataFrame({
         "test": ["ANOVA - Price across quarters"],
         "f_statistic": [f_stat],
@@ -27,8 +73,41 @@ def run_anova(df: pd.DataFrame) -> pd.DataFrame:
     })
 
 
-def perform_statistical_analysis(df: pd.DataFrame, results_path: str):
-    """Perform full statistical analysis and save outputs to disk."""
+@uses("quarter", "listings", "revenue_proxy", *HOST_FLOWS)
+def calculate_host_summary(portfolios: pd.DataFrame) -> pd.DataFrame:
+    """
+    Host market structure per quarter from the host portfolio table (no file
+    writing): active and multi-listing hosts, the share of listings run by
+    multi-listing hosts, portfolio size and revenue proxy per host, and the
+    listing and host flows since the previous quarter (missing for the first).
+    """
+    active = portfolios["listings"] > 0
+    multi = portfolios["listings"] > 1
+    table = portfolios.assign(
+        active=active,
+        multi=multi,
+        multi_listings=portfolios["listings"].where(multi, 0),
+        active_listings=portfolios["listings"].where(active),
+        active_revenue=portfolios["revenue_proxy"].where(active),
+    )
+    grouped = table.groupby("quarter", observed=True)
+    summary = pd.DataFrame({
+        "hosts": grouped["active"].sum(),
+        "multi_listing_hosts": grouped["multi"].sum(),
+        "multi_listing_share": grouped["multi_listings"].sum() / grouped["listings"].sum(),
+        "listings_per_host": grouped["active_listings"].mean(),
+        "revenue_per_host": grouped["active_revenue"].mean(),
+    })
+    for flow in HOST_FLOWS:
+        summary[flow] = grouped[flow].sum(min_count=1)
+    return summary.rename(columns={"listings_switched_in": "listings_switched",
+                                   "host_entered": "hosts_entered",
+                                   "host_exited": "hosts_exited"}).round(2)
+
+
+@profiling.profiled
+def perform_statistical_analysis(df, results_path: str):
+    """Perform full statistical analysis and save outputs to disk (rows or cube)."""
     os.makedirs(results_path, exist_ok=True)
 
     summary_stats = calculate_summary_stats(df)
@@ -40,19 +119,46 @@ def perform_statistical_analysis(df: pd.DataFrame, results_path: str):
     return summary_stats, stats_results
 
 
-def main():
-    """Entry point for running statistical analysis as a script."""
+def main(streaming=False, workers=None, resamples=N_RESAMPLES):
+    """
+    Entry point for running statistical analysis as a script.
+
+    With ``streaming`` the joint dataset is consumed in chunks (split across
+    ``workers`` processes) instead of being loaded or read from the cube.
+    ``resamples`` permutations / bootstrap samples (0 to skip) back the
+    distribution-free tests, which also run on ``workers`` processes.
+    """
     current_path = os.getcwd()
     project_path = current_path.replace(os.path.join("src", "analysis"), "")
 
     processed_data_path = os.path.join(project_path, "data", "processed")
     tables_results_path = os.path.join(project_path, "results", "tables")
 
-    df = pd.read_csv(os.path.join(processed_data_path, "boston_listings_joint.csv"))
+    joint_path = dataset_path(processed_data_path, "boston_listings_joint")
+    # Answer from the aggregate cube when it has been built; fall back to rows
+    if streaming:
+        df = stats_from_datasets([joint_path], workers=workers or os.cpu_count() or 1)
+    elif cube_exists(processed_data_path):
+        df = load_cube(processed_data_path)
+    else:
+        df = artifacts.consume(joint_path, columns=required_columns(calculate_summary_stats, run_anova))
 
     print("Performing statistical analysis...")
     perform_statistical_analysis(df, tables_results_path)
 
+    if resamples:
+        print(f"Running permutation and bootstrap tests ({resamples} resamples)...")
+        rows = artifacts.consume(joint_path, columns=["price"] + RESAMPLING_DIMENSIONS)
+        profiling.count_rows(rows_in=len(rows))
+        run_resampling_tests(rows, tables_results_path, n_resamples=resamples, workers=workers)
+
+    if artifacts.exists(dataset_path(processed_data_path, PORTFOLIOS_NAME)):
+        print("Summarizing host portfolios...")
+        portfolios = artifacts.consume(dataset_path(processed_data_path, PORTFOLIOS_NAME),
+                                       columns=required_columns(calculate_host_summary))
+        host_summary = calculate_host_summary(portfolios)
+        host_summary.to_csv(os.path.join(tables_results_path, "host_summary.csv"))
+
     print("Statistical analysis complete!")
     print(f"Summary saved to: {os.path.join(tables_results_path, 'summary_statistics.csv')}")
     print(f"Stats test saved to: {os.path.join(tables_results_path, 'statistical_tests.csv')}")
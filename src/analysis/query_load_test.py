@@ -0,0 +1,143 @@
+"""
+Load test of the aggregate query service on localhost.
+
+Keep-alive client connections send a mix of ``/query`` requests built from
+the service's ``/dimensions``: ``--distinct`` different queries, repeated
+until ``--requests`` have been sent, so the first round measures computed
+answers and the rest cached ones. Reports throughput and client-side latency
+percentiles (cold and repeated queries separately) next to the service's own
+``/metrics``.
+
+    PYTHONPATH=src python -m analysis.query_load_test --port 8765
+    PYTHONPATH=src python -m analysis.query_load_test --serve   # in-process service over data/processed
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+from analysis.query_service import DEFAULT_PORT, QueryService
+
+GROUPINGS = [["quarter"], ["neighbourhood"], ["room_type"], ["quarter", "room_type"],
+             ["neighbourhood", "room_type"], ["quarter", "neighbourhood", "room_type"]]
+QUERY_METRICS = ["price", "availability_365", "number_of_reviews"]
+
+
+async def fetch(reader, writer, target: str) -> tuple:
+    """``(status, decoded JSON body)`` of one GET on an open keep-alive connection."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def build_queries(dimensions: dict, distinct: int) -> list:
+    """``distinct`` different ``/query`` targets: groupings x metrics, unfiltered then per neighbourhood."""
+    neighbourhoods = [None] + dimensions["neighbourhood"]
+    queries = []
+    for neighbourhood, by, metric in itertools.product(neighbourhoods, GROUPINGS, QUERY_METRICS):
+        params = [("by", ",".join(by)), ("metric", metric)]
+        if neighbourhood is not None:
+            params.append(("neighbourhood", neighbourhood))
+        queries.append(f"/query?{urlencode(params)}")
+        if len(queries) == distinct:
+            break
+    return queries
+
+
+async def run_load(host: str, port: int, requests: int = 2000, connections: int = 8,
+                   distinct: int = 50) -> dict:
+    """Send ``requests`` queries over ``connections`` connections; returns the report."""
+    reader, writer = await asyncio.open_connection(host, port)
+    _, dimensions = await fetch(reader, writer, "/dimensions")
+    queries = build_queries(dimensions["dimensions"], distinct)
+    schedule = iter(enumerate(itertools.islice(itertools.cycle(queries), requests)))
+    latencies = {"first": [], "repeated": []}
+    errors = []
+
+    async def client():
+        conn_reader, conn_writer = await asyncio.open_connection(host, port)
+        try:
+            for i, target in schedule:
+                start = time.perf_counter()
+                status, body = await fetch(conn_reader, conn_writer, target)
+                latencies["first" if i < len(queries) else "repeated"].append(time.perf_counter() - start)
+                if status != 200:
+                    errors.append(body.get("error", status))
+        finally:
+            conn_writer.close()
+            await conn_writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    _, server_metrics = await fetch(reader, writer, "/metrics")
+    writer.close()
+    await writer.wait_closed()
+
+    report = {"requests": requests, "connections": connections, "distinct_queries": len(queries),
+              "errors": len(errors), "seconds": elapsed, "requests_per_s": requests / elapsed,
+              "latency_ms": {}, "server": server_metrics}
+    for kind, values in latencies.items():
+        if values:
+            ms = np.asarray(values) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            report["latency_ms"][kind] = {"count": len(ms), "p50": p50, "p95": p95, "p99": p99, "max": ms.max()}
+    return report
+
+
+async def run_with_service(directory: str, **options) -> dict:
+    """Start a service over the cube in ``directory`` on a free port and load-test it."""
+    server = await QueryService.from_directory(directory).start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await run_load("127.0.0.1", port, **options)
+
+
+def print_report(report: dict):
+    print(f"{report['requests']} requests ({report['distinct_queries']} distinct) over "
+          f"{report['connections']} connections in {report['seconds']:.2f}s: "
+          f"{report['requests_per_s']:.0f} req/s, {report['errors']} errors")
+    for kind, latency in report["latency_ms"].items():
+        print(f"  {kind:<9} client latency ms  p50 {latency['p50']:7.2f}  p95 {latency['p95']:7.2f}  "
+              f"p99 {latency['p99']:7.2f}  max {latency['max']:7.2f}  (n={latency['count']})")
+    cache = report["server"]["cache"]
+    print(f"  server cache: {cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions")
+    for kind, latency in report["server"]["latency_ms"].items():
+        print(f"  server {kind:<11} handling ms  p50 {latency['p50']:7.3f}  p99 {latency['p99']:7.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the aggregate query service on localhost")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--requests", type=int, default=2000, help="Total queries to send")
+    parser.add_argument("--connections", type=int, default=8, help="Concurrent keep-alive connections")
+    parser.add_argument("--distinct", type=int, default=50, help="Number of different queries")
+    parser.add_argument("--serve", action="store_true",
+                        help="Start the service in-process over data/processed instead of connecting")
+    args = parser.parse_args(argv)
+
+    options = {"requests": args.requests, "connections": args.connections, "distinct": args.distinct}
+    if args.serve:
+        processed_data_path = os.path.join(os.getcwd().replace("/src/analysis", ""), "data", "processed")
+        report = asyncio.run(run_with_service(processed_data_path, **options))
+    else:
+        report = asyncio.run(run_load(args.host, args.port, **options))
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Local HTTP query service over the aggregate cube.
+
+The service loads the aggregate cube (quarter x neighbourhood x room_type)
+once and answers grouped, filtered statistics as JSON, so dashboards do not
+rerun the analysis scripts:
+
+    GET /query?by=quarter,room_type&metric=price&stats=mean,median&neighbourhood=Back Bay
+    GET /dimensions     dimension values, metrics and statistics that can be asked for
+    GET /metrics        request counts, throughput, latency percentiles, cache counters
+
+``by`` and ``stats`` are comma-separated; every dimension can be filtered on
+(repeat the parameter for several values). Encoded responses are kept in an
+LRU cache keyed by the normalized query, so a repeated query costs a
+dictionary lookup. The cube is reloaded, and the cache cleared, when the cube
+stage rewrites its descriptor or either of its tables.
+
+Run with ``PYTHONPATH=src python -m analysis.query_service --port 8765`` from
+the project root; ``analysis.query_load_test`` measures it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from pipeline.aggregate_cube import CUBE_NAME, METRICS, SKETCH_METRICS, cube_exists, load_cube
+from pipeline.storage import dataset_path
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_STATS = ["count", "mean", "median", "std"]
+CUBE_STATS = ["count", "sum", "mean", "std", "var", "min", "max", "median"]
+LATENCY_WINDOW = 10_000  # latencies kept per request kind for the percentiles
+RELOAD_CHECK_S = 1.0     # how often the cube files are checked for a rebuild
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+
+class ResultCache:
+    """LRU of encoded responses by query key, with hit/miss/eviction counters."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body: bytes):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def summary(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else None}
+
+
+class ServiceMetrics:
+    """Request counters and a window of recent handling latencies per request kind."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.status = {}
+        self.latencies = {}   # kind -> deque of seconds
+
+    def record(self, kind: str, status: int, seconds: float):
+        self.requests += 1
+        self.status[status] = self.status.get(status, 0) + 1
+        self.latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def summary(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        latency = {}
+        for kind, window in self.latencies.items():
+            ms = np.asarray(window) * 1000
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+            latency[kind] = {"count": len(ms), "mean": ms.mean(), "p50": p50, "p90": p90,
+                             "p99": p99, "max": ms.max()}
+        return {"uptime_s": uptime, "requests": self.requests,
+                "requests_per_s": self.requests / uptime if uptime else None,
+                "status": {str(code): n for code, n in sorted(self.status.items())},
+                "latency_ms": latency}
+
+
+def parse_query(params: dict, dims: list) -> tuple:
+    """
+    Normalized ``(by, metric, stats, filters)`` of ``/query`` parameters (as
+    ``parse_qs`` returns them); the tuple is also the cache key.
+    """
+    def values(name):
+        return [v.strip() for value in params.get(name, []) for v in value.split(",") if v.strip()]
+
+    by = tuple(values("by"))
+    metric = (params.get("metric") or ["price"])[-1]
+    stats = tuple(values("stats") or DEFAULT_STATS)
+    unknown = sorted(set(params) - {"by", "metric", "stats"} - set(dims))
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) {unknown}; filter on dimensions {dims}")
+    if not by:
+        raise ValueError(f"'by' must name at least one dimension of {dims}")
+    if len(set(by)) != len(by) or not set(by) <= set(dims):
+        raise ValueError(f"'by' must list distinct dimensions of {dims}, got {list(by)}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'; available: {METRICS}")
+    for stat in stats:
+        if stat.startswith("q"):
+            try:
+                q = float(stat[1:])
+            except ValueError:
+                raise ValueError(f"Unknown statistic '{stat}'") from None
+            if not 0 <= q <= 1:
+                raise ValueError(f"Quantile '{stat}' must be between q0 and q1")
+    filters = tuple(sorted((dim, tuple(sorted(set(params[dim])))) for dim in dims if dim in params))
+    return by, metric, stats, filters
+
+
+class QueryService:
+    """Answers aggregate queries from a cube, caching encoded responses."""
+
+    def __init__(self, cube, cache_size: int = DEFAULT_CACHE_SIZE, directory: str = None):
+        self.cube = cube
+        self.cache = ResultCache(cache_size)
+        self.metrics = ServiceMetrics()
+        self.directory = directory
+        self._version = self._cube_version()
+        self._checked = time.monotonic()
+
+    @classmethod
+    def from_directory(cls, directory: str, cache_size: int = DEFAULT_CACHE_SIZE) -> "QueryService":
+        """Service over the cube stored in ``directory`` (``data/processed``)."""
+        if not cube_exists(directory):
+            raise ValueError(f"No aggregate cube in {directory}; run `python run_analysis.py cube` first")
+        return cls(load_cube(directory), cache_size, directory)
+
+    def _cube_version(self):
+        """(mtime, size) of the descriptor and both cube tables; any rewrite changes it."""
+        if self.directory is None:
+            return None
+        paths = [os.path.join(self.directory, f"{CUBE_NAME}.json"),
+                 dataset_path(self.directory, f"{CUBE_NAME}_moments"),
+                 dataset_path(self.directory, f"{CUBE_NAME}_sketch")]
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, paths))
+
+    def refresh(self):
+        """Reload the cube (and drop cached answers) if it was rebuilt since it was loaded."""
+        if self.directory is None or time.monotonic() - self._checked < RELOAD_CHECK_S:
+            return
+        self._checked = time.monotonic()
+        try:
+            version = self._cube_version()
+        except FileNotFoundError:
+            return  # files being replaced: keep serving the loaded cube
+        if version != self._version:
+            self.cube = load_cube(self.directory)
+            self.cache.clear()
+            self._version = version
+
+    def query(self, params: dict) -> tuple:
+        """``(body, cached)`` of a ``/query``; raises ValueError for invalid queries."""
+        self.refresh()
+        key = parse_query(params, self.cube.dims)
+        body = self.cache.get(key)
+        if body is not None:
+            return body, True
+        by, metric, stats, filters = key
+        cube = self.cube.where(dict(filters)) if filters else self.cube
+        table = cube.stats(list(by), metric, stats).reset_index()
+        result = {"by": list(by), "metric": metric, "stats": list(stats),
+                  "filters": {dim: list(values) for dim, values in filters},
+                  "rows": json.loads(table.to_json(orient="records"))}
+        body = json.dumps(result).encode()
+        self.cache.put(key, body)
+        return body, False
+
+    def dimensions(self) -> bytes:
+        moments = self.cube.moments
+        return json.dumps({
+            "dimensions": {dim: sorted(moments[dim].astype(str).unique().tolist()) for dim in self.cube.dims},
+            "metrics": METRICS, "quantile_metrics": SKETCH_METRICS,
+            "stats": CUBE_STATS + ["q<fraction>, e.g. q0.9"],
+        }).encode()
+
+    def handle(self, method: str, target: str) -> tuple:
+        """``(status, body)`` of one request; records its handling latency."""
+        start = time.perf_counter()
+        url = urlsplit(target)
+        kind = url.path
+        try:
+            if method != "GET":
+                status, body = 405, _error(f"Method {method} not allowed")
+            elif url.path == "/query":
+                body, cached = self.query(parse_qs(url.query))
+                status, kind = 200, "query_hit" if cached else "query_miss"
+            elif url.path == "/dimensions":
+                status, body = 200, self.dimensions()
+            elif url.path == "/metrics":
+                status, body = 200, json.dumps({**self.metrics.summary(),
+                                                "cache": self.cache.summary()}).encode()
+            else:
+                status, body, kind = 404, _error(f"No endpoint {url.path}"), "other"
+        except ValueError as e:
+            status, body = 400, _error(str(e))
+        except Exception as e:  # keep serving; the client sees the failure
+            status, body = 500, _error(f"{type(e).__name__}: {e}")
+        self.metrics.record(kind, status, time.perf_counter() - start)
+        return status, body
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """HTTP/1.1 with keep-alive: answer requests until the client closes."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0)):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                status, body = self.handle(method, target)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(body)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                             .encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away or sent something that is not HTTP
+        except asyncio.CancelledError:
+            pass  # server shutting down with the connection still open
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> asyncio.Server:
+        """Start listening (``port=0`` picks a free port, see ``server.sockets``)."""
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+def _error(message: str) -> bytes:
+    return json.dumps({"error": message}).encode()
+
+
+async def serve(service: QueryService, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+    server = await service.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving aggregate queries on http://{address[0]}:{address[1]} "
+          f"(cube: {len(service.cube)} cell-metrics; cache: {service.cache.max_entries} results)")
+    async with server:
+        await server.serve_forever()
+
+
+def main(host="127.0.0.1", port=DEFAULT_PORT, cache_size=DEFAULT_CACHE_SIZE):
+    """Serve the aggregate cube of ``data/processed`` until interrupted."""
+    current_path = os.getcwd()
+    project_path = current_path.replace("/src/analysis", "")
+    processed_data_path = os.path.join(project_path, "data", "processed")
+
+    service = QueryService.from_directory(processed_data_path, cache_size)
+    try:
+        asyncio.run(serve(service, host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve aggregate listing statistics over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Number of query results kept in the LRU cache")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.host, args.port, args.cache_size)
@@ -0,0 +1,184 @@
+"""
+Streaming, mergeable statistics for the summary table and the ANOVA.
+
+``StreamingStats`` consumes the joint dataset chunk by chunk and keeps, per
+group (quarter by default) and metric, Welford moments (count, mean, M2,
+min, max) plus a quantile sketch for medians. States built on separate
+chunks, files or worker processes merge exactly (Chan et al.'s parallel
+update), and the merged state produces the same table as
+``calculate_summary_stats`` and the same F / p values as ``run_anova``
+without ever holding all rows in memory.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from pipeline.aggregate_cube import sketch_keys, sketch_quantiles
+from pipeline.schema import natural_key
+from pipeline.storage import iter_dataset, num_row_groups
+
+SUMMARY_STATS = {
+    "price": ["mean", "median", "std", "count"],
+    "availability_365": ["mean", "median", "std"],
+    "number_of_reviews": ["mean", "median", "std"]
+}
+
+
+class StreamingStats:
+    """Per-group Welford moments and quantile sketches that can be updated and merged."""
+
+    def __init__(self, by: str = "quarter", metrics: list = None, relative_accuracy: float = None):
+        self.by = by
+        self.metrics = list(metrics or SUMMARY_STATS)
+        self.relative_accuracy = relative_accuracy
+        # index (group, metric) -> count, mean, m2, min, max
+        self.moments = pd.DataFrame(columns=["count", "mean", "m2", "min", "max"],
+                                    index=pd.MultiIndex.from_arrays([[], []], names=[by, "metric"]),
+                                    dtype="float64")
+        # index (group, metric, bucket) -> count
+        self.sketch = pd.Series(dtype="int64",
+                                index=pd.MultiIndex.from_arrays([[], [], []], names=[by, "metric", "bucket"]))
+
+    def update(self, chunk: pd.DataFrame) -> "StreamingStats":
+        """Fold one chunk of rows into the state."""
+        groups = chunk[self.by].astype("object")
+        moment_parts, sketch_parts = [], []
+        for metric in self.metrics:
+            values = chunk[metric].astype("float64")
+            grouped = values.groupby(groups, sort=False)
+            part = pd.DataFrame({
+                "count": grouped.count().astype("float64"),
+                "mean": grouped.mean(),
+                "m2": grouped.var(ddof=0) * grouped.count(),
+                "min": grouped.min(),
+                "max": grouped.max(),
+            })
+            part = part[part["count"] > 0]
+            part.index = pd.MultiIndex.from_arrays(
+                [part.index, [metric] * len(part)], names=[self.by, "metric"])
+            moment_parts.append(part)
+
+            valid = values.notna()
+            buckets = sketch_keys(values[valid].to_numpy(), self.relative_accuracy)
+            counts = pd.Series(1, index=pd.MultiIndex.from_arrays(
+                [groups[valid].to_numpy(), [metric] * int(valid.sum()), buckets],
+                names=[self.by, "metric", "bucket"]))
+            sketch_parts.append(counts.groupby(level=[0, 1, 2]).sum())
+
+        other = StreamingStats(self.by, self.metrics, self.relative_accuracy)
+        other.moments = pd.concat(moment_parts)
+        other.sketch = pd.concat(sketch_parts)
+        return self.merge(other, inplace=True)
+
+    def merge(self, other: "StreamingStats", inplace: bool = False) -> "StreamingStats":
+        """Combine two states; the result equals a state fed with both inputs."""
+        if (self.by, self.relative_accuracy) != (other.by, other.relative_accuracy):
+            raise ValueError("Only states with the same grouping and sketch accuracy can merge")
+        result = self if inplace else StreamingStats(self.by, self.metrics, self.relative_accuracy)
+        result.moments = _merge_moments(self.moments, other.moments)
+        result.sketch = self.sketch.add(other.sketch, fill_value=0).astype("int64")
+        return result
+
+    def _stat(self, metric: str, stat: str) -> pd.Series:
+        moments = self.moments.xs(metric, level="metric")
+        if stat == "count":
+            return moments["count"].astype("int64")
+        if stat == "mean":
+            return moments["mean"]
+        if stat in ("var", "std"):
+            var = (moments["m2"] / (moments["count"] - 1)).where(moments["count"] > 1)
+            return var if stat == "var" else np.sqrt(var)
+        if stat in ("min", "max"):
+            return moments[stat]
+        if stat == "median":
+            sketch = self.sketch.xs(metric, level="metric").rename("count").reset_index()
+            return sketch_quantiles(sketch, [self.by], 0.5)
+        raise ValueError(f"Unknown statistic '{stat}'")
+
+    def summary_table(self, spec: dict = None) -> pd.DataFrame:
+        """Same layout as ``calculate_summary_stats``: (metric, stat) columns per group."""
+        spec = spec or SUMMARY_STATS
+        table = pd.concat(
+            {metric: pd.DataFrame({stat: self._stat(metric, stat) for stat in stat_list})
+             for metric, stat_list in spec.items()},
+            axis=1,
+        )
+        table = table.loc[sorted(table.index, key=natural_key)]
+        table.index.name = self.by
+        return table.round(2)
+
+    def anova(self, metric: str = "price"):
+        """One-way ANOVA F and p across groups from the merged moments."""
+        moments = self.moments.xs(metric, level="metric")
+        n, k = moments["count"].sum(), len(moments)
+        grand_mean = (moments["count"] * moments["mean"]).sum() / n
+        ss_between = (moments["count"] * (moments["mean"] - grand_mean) ** 2).sum()
+        ss_within = moments["m2"].sum()
+        f_stat = (ss_between / (k - 1)) / (ss_within / (n - k))
+        return f_stat, stats.f.sf(f_stat, k - 1, n - k)
+
+
+def _merge_moments(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Chan et al.'s pairwise combination of (count, mean, M2) plus min/max."""
+    if a.empty:
+        return b.copy()
+    if b.empty:
+        return a.copy()
+    a, b = a.align(b, join="outer")
+    na, nb = a["count"].fillna(0), b["count"].fillna(0)
+    n = na + nb
+    mean_a, mean_b = a["mean"].fillna(0), b["mean"].fillna(0)
+    delta = mean_b - mean_a
+    return pd.DataFrame({
+        "count": n,
+        "mean": mean_a + delta * nb / n,
+        "m2": a["m2"].fillna(0) + b["m2"].fillna(0) + delta ** 2 * na * nb / n,
+        "min": np.fmin(a["min"], b["min"]),
+        "max": np.fmax(a["max"], b["max"]),
+    })
+
+
+def consume(chunks, by: str = "quarter", metrics: list = None,
+            relative_accuracy: float = None) -> StreamingStats:
+    """Build a state from an iterable of DataFrame chunks."""
+    state = StreamingStats(by, metrics, relative_accuracy)
+    for chunk in chunks:
+        state.update(chunk)
+    return state
+
+
+def _partition_stats(job):
+    path, row_groups, by, metrics, batch_size = job
+    chunks = iter_dataset(path, columns=[by] + metrics, batch_size=batch_size, row_groups=row_groups)
+    return consume(chunks, by, metrics)
+
+
+def stats_from_datasets(paths: list, by: str = "quarter", metrics: list = None,
+                        workers: int = 1, batch_size: int = 100_000) -> StreamingStats:
+    """
+    Stream stored datasets (e.g. one per city or snapshot) into one merged state.
+
+    Row groups are split into partitions handled by ``workers`` processes; each
+    returns its partial state and the partials are merged.
+    """
+    metrics = list(metrics or SUMMARY_STATS)
+    jobs = []
+    for path in paths:
+        groups = list(range(num_row_groups(path)))
+        parts = max(1, min(workers, len(groups)))
+        jobs += [(path, list(chunk), by, metrics, batch_size)
+                 for chunk in np.array_split(groups, parts) if len(chunk)]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(_partition_stats, jobs))
+    else:
+        partials = [_partition_stats(job) for job in jobs]
+
+    state = StreamingStats(by, metrics)
+    for partial in partials:
+        state.merge(partial, inplace=True)
+    return state
@@ -0,0 +1,263 @@
+"""
+Materialized aggregate cube over quarter x neighbourhood x room_type.
+
+For every cell of the cube and every metric the cube keeps mergeable
+statistics: count, sum, sum of squares, min and max, plus a quantile sketch
+(value -> count) for medians and other quantiles. Cells can be rolled up to
+any subset of the dimensions, two cubes (e.g. from different cities or
+snapshots) can be merged, and the analysis stages answer their group-level
+questions from the cube in time proportional to the number of groups rather
+than the number of listings.
+
+The sketch is exact by default (one bucket per distinct value, which is small
+for the integer-valued prices, availabilities and review counts). With a
+``relative_accuracy`` it switches to log-spaced buckets whose representative
+value is within that relative error of any value in the bucket.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline import artifacts, profiling
+from pipeline.storage import dataset_path
+
+DIMENSIONS = ["quarter", "neighbourhood", "room_type"]
+METRICS = [
+    "price", "availability_365", "number_of_reviews", "reviews_per_month",
+    "price_premium_pct", "neighborhood_avg_price", "is_highly_available",
+]
+# metrics that also get a quantile sketch (medians are only asked of these)
+SKETCH_METRICS = ["price", "availability_365", "number_of_reviews"]
+
+CUBE_NAME = "aggregate_cube"
+MOMENT_COLUMNS = ["count", "sum", "sum_sq", "min", "max"]
+
+
+def sketch_keys(values: np.ndarray, relative_accuracy: float = None) -> np.ndarray:
+    """
+    Bucket key of each value: the value itself (exact sketch) or the
+    representative value of its log-spaced bucket.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not relative_accuracy:
+        return values
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    magnitude = np.abs(values)
+    with np.errstate(divide="ignore"):
+        index = np.ceil(np.log(magnitude) / np.log(gamma))
+    keys = np.sign(values) * 2 * gamma ** index / (gamma + 1)
+    return np.where(magnitude == 0, 0.0, keys)
+
+
+def sketch_quantiles(sketch: pd.DataFrame, by: list, q: float) -> pd.Series:
+    """
+    ``q``-quantile per group of a (by..., bucket, count) sketch table, with the
+    same linear interpolation as ``pandas.Series.quantile``.
+    """
+    sketch = sketch[sketch["count"] > 0].sort_values(by + ["bucket"], kind="stable")
+    if sketch.empty:
+        return pd.Series(dtype="float64")
+    counts = sketch["count"].to_numpy(dtype=np.int64)
+    buckets = sketch["bucket"].to_numpy(dtype=np.float64)
+    cumulative = np.cumsum(counts)
+
+    group_ids = sketch.groupby(by, observed=True, sort=False).ngroup().to_numpy()
+    starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+    totals = np.add.reduceat(counts, starts)
+    offsets = cumulative[starts] - counts[starts]
+
+    position = (totals - 1) * q
+    lower, upper = np.floor(position), np.ceil(position)
+    value_lo = buckets[np.searchsorted(cumulative, offsets + lower, side="right")]
+    value_hi = buckets[np.searchsorted(cumulative, offsets + upper, side="right")]
+    result = value_lo + (position - lower) * (value_hi - value_lo)
+
+    index = pd.MultiIndex.from_frame(sketch.iloc[starts][by]) if len(by) > 1 \
+        else pd.Index(sketch.iloc[starts][by[0]], name=by[0])
+    return pd.Series(result, index=index)
+
+
+class AggregateCube:
+    """
+    Mergeable per-cell statistics.
+
+    Attributes:
+        moments: one row per (cell, metric) with count, sum, sum_sq, min, max
+        sketch: one row per (cell, metric, bucket) with the bucket's count
+        dims: dimension columns identifying a cell
+        relative_accuracy: sketch accuracy (None means exact)
+    """
+
+    def __init__(self, moments, sketch, dims, relative_accuracy=None):
+        self.moments = moments
+        self.sketch = sketch
+        self.dims = list(dims)
+        self.relative_accuracy = relative_accuracy
+
+    def __len__(self):
+        return len(self.moments)
+
+    def _check_dims(self, by):
+        unknown = [d for d in by if d not in self.dims]
+        if unknown:
+            raise ValueError(f"Cube has no dimension(s) {unknown}; available: {self.dims}")
+
+    def rollup(self, by: list) -> "AggregateCube":
+        """Combine cells so that only the ``by`` dimensions remain."""
+        self._check_dims(by)
+        moments = _combine_moments(self.moments, by + ["metric"])
+        sketch = (self.sketch.groupby(by + ["metric", "bucket"], observed=True)["count"]
+                  .sum().reset_index())
+        return AggregateCube(moments, sketch, by, self.relative_accuracy)
+
+    def where(self, filters: dict) -> "AggregateCube":
+        """Cells whose dimension values are among ``filters[dim]`` for every filtered dimension."""
+        self._check_dims(list(filters))
+        tables = []
+        for table in (self.moments, self.sketch):
+            keep = np.ones(len(table), dtype=bool)
+            for dim, values in filters.items():
+                keep &= table[dim].astype(str).isin([str(v) for v in values]).to_numpy()
+            tables.append(table[keep])
+        return AggregateCube(*tables, self.dims, self.relative_accuracy)
+
+    def merge(self, other: "AggregateCube") -> "AggregateCube":
+        """Cube holding the statistics of both inputs (e.g. two cities or batches)."""
+        if self.dims != other.dims or self.relative_accuracy != other.relative_accuracy:
+            raise ValueError("Only cubes with the same dimensions and sketch accuracy can merge")
+        keys = self.dims + ["metric"]
+        moments = _combine_moments(pd.concat([self.moments, other.moments], ignore_index=True), keys)
+        sketch = (pd.concat([self.sketch, other.sketch], ignore_index=True)
+                  .groupby(keys + ["bucket"], observed=True)["count"].sum().reset_index())
+        return AggregateCube(moments, sketch, self.dims, self.relative_accuracy)
+
+    def stats(self, by: list, metric: str, stats=("count", "mean", "median", "std")) -> pd.DataFrame:
+        """
+        Group statistics of ``metric`` grouped by the ``by`` dimensions.
+
+        Supported stats: count, sum, mean, std (ddof=1), var, min, max, median
+        and any quantile written as e.g. ``"q0.9"``.
+        """
+        self._check_dims(by)
+        moments = self.moments[self.moments["metric"] == metric]
+        grouped = _combine_moments(moments, by).set_index(by)
+        count, total = grouped["count"], grouped["sum"]
+        mean = total / count
+        var = (grouped["sum_sq"] - total * mean) / (count - 1)
+        var = var.where(count > 1).clip(lower=0)
+
+        out = pd.DataFrame(index=grouped.index)
+        for stat in stats:
+            if stat == "count":
+                out[stat] = count.astype("int64")
+            elif stat == "sum":
+                out[stat] = total
+            elif stat == "mean":
+                out[stat] = mean
+            elif stat == "var":
+                out[stat] = var
+            elif stat == "std":
+                out[stat] = np.sqrt(var)
+            elif stat in ("min", "max"):
+                out[stat] = grouped[stat]
+            elif stat == "median" or stat.startswith("q"):
+                if metric not in SKETCH_METRICS:
+                    raise ValueError(f"No quantile sketch is kept for '{metric}'")
+                q = 0.5 if stat == "median" else float(stat[1:])
+                sketch = self.sketch[self.sketch["metric"] == metric]
+                out[stat] = sketch_quantiles(sketch, by, q).reindex(out.index)
+            else:
+                raise ValueError(f"Unknown statistic '{stat}'")
+        return out
+
+
+def _combine_moments(moments: pd.DataFrame, keys: list) -> pd.DataFrame:
+    grouped = moments.groupby(keys, observed=True)
+    combined = grouped[["count", "sum", "sum_sq"]].sum()
+    combined["min"] = grouped["min"].min()
+    combined["max"] = grouped["max"].max()
+    return combined.reset_index()
+
+
+@profiling.profiled
+def build_cube(df: pd.DataFrame, dims: list = DIMENSIONS, metrics: list = METRICS,
+               relative_accuracy: float = None) -> AggregateCube:
+    """Aggregate row-level listings into an AggregateCube (one scan per metric)."""
+    dims = list(dims)
+    moment_parts, sketch_parts = [], []
+    for metric in [m for m in metrics if m in df.columns]:
+        values = df[metric].astype("float64")
+        valid = values.notna()
+        frame = df.loc[valid, dims].copy()
+        frame["value"] = values[valid].to_numpy()
+        frame["value_sq"] = frame["value"] ** 2
+        grouped = frame.groupby(dims, observed=True)
+        part = grouped["value"].agg(["count", "sum", "min", "max"])
+        part["sum_sq"] = grouped["value_sq"].sum()
+        part = part.reset_index()
+        part["metric"] = metric
+        moment_parts.append(part)
+
+        if metric in SKETCH_METRICS:
+            frame["bucket"] = sketch_keys(frame["value"].to_numpy(), relative_accuracy)
+            sketch = frame.groupby(dims + ["bucket"], observed=True).size().rename("count").reset_index()
+            sketch["metric"] = metric
+            sketch_parts.append(sketch)
+
+    moments = pd.concat(moment_parts, ignore_index=True)[dims + ["metric"] + MOMENT_COLUMNS]
+    sketch = pd.concat(sketch_parts, ignore_index=True)[dims + ["metric", "bucket", "count"]]
+    for table in (moments, sketch):
+        table["metric"] = table["metric"].astype("category")
+    return AggregateCube(moments, sketch, dims, relative_accuracy)
+
+
+def save_cube(cube: AggregateCube, directory: str, name: str = CUBE_NAME):
+    """
+    Persist a cube as two Parquet tables plus a small JSON descriptor. The
+    descriptor is replaced last, once both tables are on disk, so readers
+    that wait for it never see a half-written cube.
+    """
+    artifacts.publish(cube.moments, dataset_path(directory, f"{name}_moments"))
+    artifacts.publish(cube.sketch, dataset_path(directory, f"{name}_sketch"))
+    artifacts.flush()
+    descriptor_path = os.path.join(directory, f"{name}.json")
+    tmp_path = descriptor_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"dims": cube.dims, "relative_accuracy": cube.relative_accuracy}, f, indent=2)
+    os.replace(tmp_path, descriptor_path)
+
+
+def load_cube(directory: str, name: str = CUBE_NAME) -> AggregateCube:
+    """Load a cube written by ``save_cube``."""
+    with open(os.path.join(directory, f"{name}.json")) as f:
+        meta = json.load(f)
+    moments = artifacts.consume(dataset_path(directory, f"{name}_moments"))
+    sketch = artifacts.consume(dataset_path(directory, f"{name}_sketch"))
+    return AggregateCube(moments, sketch, meta["dims"], meta["relative_accuracy"])
+
+
+def cube_exists(directory: str, name: str = CUBE_NAME) -> bool:
+    return os.path.exists(os.path.join(directory, f"{name}.json"))
+
+
+def main(relative_accuracy=None):
+    """Build the aggregate cube from the joint dataset and store it next to it."""
+    current_path = os.getcwd()
+    project_path = current_path.replace("/src/pipeline", "")
+    processed_data_path = os.path.join(project_path, "data", "processed")
+
+    print("Building aggregate cube...")
+    df = artifacts.consume(dataset_path(processed_data_path, "boston_listings_joint"),
+                      columns=DIMENSIONS + METRICS)
+    cube = build_cube(df, relative_accuracy=relative_accuracy)
+    save_cube(cube, processed_data_path)
+    profiling.count_rows(rows_in=len(df), rows_out=len(cube))
+    print(f"Saved aggregate cube ({len(cube)} cell-metrics, {len(cube.sketch)} sketch buckets) "
+          f"to {processed_data_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+In-process handoff of stored datasets between pipeline stages.
+
+Stages ``publish`` the datasets they produce and ``consume`` the ones they
+read, by path, instead of calling ``write_dataset`` / ``read_dataset``:
+
+- ``publish`` keeps the frame in memory (exactly as ``read_dataset`` would
+  return it) and hands the Parquet write to a background thread, so the
+  stage carries on while the file is written (write-behind).
+- ``consume`` answers from memory when the dataset was published or already
+  loaded in this process, applying projection and filters to the in-memory
+  frame. Otherwise an unfiltered consumer reads the requested columns (all
+  of them without a projection) and keeps them (memoized), so later
+  consumers with other filters or fewer columns do not parse the file
+  again; a consumer asking for columns that are not in memory yet reads
+  them together with the ones kept. A filtered consumer that misses reads
+  straight from disk with the filters pushed down (row groups that cannot
+  match are skipped) and nothing is kept.
+- Frames are kept up to a byte budget (``PIPELINE_ARTIFACT_MB``, default
+  2048) and evicted least recently used first; a dataset larger than the
+  budget is read straight from disk, with its projection and filters.
+
+A standalone run of one stage therefore still loads everything from disk,
+while a full pipeline run parses each dataset at most once. Pending writes
+are finished before the process forks (worker processes inherit the frames
+in memory) and before it exits; stage mains flush before returning, so a
+failed write fails the stage, and the DAG runner flushes after every stage,
+worker processes after every job that publishes.
+"""
+
+import atexit
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from pipeline import storage
+from pipeline.storage import dataset_nbytes, from_table, read_dataset, to_table, write_table
+
+MEMORY_ENV = "PIPELINE_ARTIFACT_MB"
+DEFAULT_MEMORY_MB = 2048
+
+_OPERATORS = {
+    "==": lambda s, v: s == v,
+    "=": lambda s, v: s == v,
+    "!=": lambda s, v: s != v,
+    "<": lambda s, v: s < v,
+    "<=": lambda s, v: s <= v,
+    ">": lambda s, v: s > v,
+    ">=": lambda s, v: s >= v,
+    "in": lambda s, v: s.isin(v),
+    "not in": lambda s, v: ~s.isin(v),
+}
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _file_version(path: str):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def apply_filters(df: pd.DataFrame, filters: list) -> pd.DataFrame:
+    """Rows of ``df`` matching all ``(column, op, value)`` filters, as pyarrow reads them."""
+    if not filters:
+        return df
+    keep = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported filter operator '{op}'")
+        keep &= _OPERATORS[op](df[column], value).fillna(False).astype(bool)
+    return df[keep].reset_index(drop=True)
+
+
+class ArtifactStore:
+    """Byte-bounded LRU of stored datasets with write-behind persistence."""
+
+    def __init__(self, max_bytes: int = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get(MEMORY_ENV, DEFAULT_MEMORY_MB)) << 20
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.loads = {}       # path -> times parsed from disk by this process
+        # path -> (frame, nbytes, file version or None, whether it has every column)
+        self._frames = OrderedDict()
+        self._error = None
+        self._reset_writer()
+
+    # --- memory ---------------------------------------------------------------
+
+    def _remember(self, path: str, df: pd.DataFrame, version, complete: bool = True):
+        nbytes = _frame_nbytes(df)
+        with self._lock:
+            self._forget(path)
+            if nbytes > self.max_bytes:
+                return
+            self._frames[path] = (df, nbytes, version, complete)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted, _, _) = self._frames.popitem(last=False)
+                self.nbytes -= evicted
+
+    def _forget(self, path: str):
+        entry = self._frames.pop(path, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+
+    def _cached(self, path: str, columns: list = None):
+        """Frame kept for ``path`` if it has ``columns`` (every column if None)."""
+        with self._lock:
+            entry = self._frames.get(path)
+            if entry is None:
+                return None
+            df, _, version, complete = entry
+            # loaded from disk: only valid while the file is unchanged
+            if version is not None and (not os.path.exists(path) or _file_version(path) != version):
+                self._forget(path)
+                return None
+            if not (complete if columns is None else set(columns) <= set(df.columns)):
+                return None
+            self._frames.move_to_end(path)
+            return df
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.abspath(path) in self._frames
+
+    def exists(self, path: str) -> bool:
+        """Whether a dataset is stored at ``path``, published or on disk."""
+        path = os.path.abspath(path)
+        return path in self._frames or path in self.pending() or os.path.exists(path)
+
+    def clear(self):
+        self.flush()
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
+
+    # --- publish / consume ----------------------------------------------------
+
+    def publish(self, df: pd.DataFrame, path: str, schema: pa.Schema = None) -> pd.DataFrame:
+        """
+        Make ``df`` the dataset stored at ``path``: downstream consumers get it
+        from memory right away, the file is written in the background.
+
+        Returns the frame consumers will see (``df`` with the stored dtypes).
+        """
+        path = os.path.abspath(path)
+        table = to_table(df, schema)
+        stored = from_table(table)
+        self._remember(path, stored, None)
+        with self._lock:
+            self._pending.add(path)
+        self._start_writer()
+        self._writes.put((path, table))
+        return stored
+
+    def consume(self, path: str, columns: list = None, filters: list = None) -> pd.DataFrame:
+        """
+        The dataset stored at ``path``, like ``read_dataset(path, columns,
+        filters)``, from memory when possible. The frame is shared with other
+        consumers: add columns freely, but do not modify values in place.
+        """
+        path = os.path.abspath(path)
+        needed = None
+        if columns is not None:
+            needed = list(dict.fromkeys([*columns, *(column for column, _, _ in filters or [])]))
+        df = self._cached(path, needed)
+        if df is None:
+            if path in self.pending():
+                self.flush()  # evicted before its write finished
+            self._raise_write_error()
+            if filters or dataset_nbytes(path) > self.max_bytes:
+                # not kept: filters are pushed down, so row groups that cannot match are
+                # never decoded (and a filtered frame is not the whole dataset)
+                self.loads[path] = self.loads.get(path, 0) + 1
+                return read_dataset(path, columns=columns, filters=filters)
+            with self._lock:
+                kept = self._frames.get(path)
+            if needed is not None and kept is not None:
+                # a valid frame with other columns: read those again along with the new ones
+                needed = list(dict.fromkeys([*kept[0].columns, *needed]))
+            version = _file_version(path)
+            df = read_dataset(path, columns=needed)
+            self.loads[path] = self.loads.get(path, 0) + 1
+            self._remember(path, df, version, complete=needed is None)
+        df = apply_filters(df, filters)
+        return df[list(columns)] if columns is not None else df.copy(deep=False)
+
+    # --- write-behind ---------------------------------------------------------
+
+    def _reset_writer(self):
+        # also run in a forked child: the parent's writer thread (and whatever
+        # it was waiting on) does not exist there
+        self._lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._pending = set()
+        self._writer = None
+
+    def _start_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name="artifact-writer", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            path, table = self._writes.get()
+            try:
+                tmp_path = path + ".tmp"
+                write_table(table, tmp_path)
+                os.replace(tmp_path, path)
+                # the frame now mirrors this file
+                with self._lock:
+                    entry = self._frames.get(path)
+                    if entry is not None and entry[2] is None:
+                        self._frames[path] = (entry[0], entry[1], _file_version(path), entry[3])
+            except Exception as error:  # surfaced by flush / consume in the stage's thread
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                self._error = self._error or error
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+                self._writes.task_done()
+
+    def _raise_write_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def pending(self) -> list:
+        with self._lock:
+            return sorted(self._pending)
+
+    def flush(self):
+        """Block until every published dataset is on disk (call before forking or exiting)."""
+        if self._writer is not None:
+            self._writes.join()
+        self._raise_write_error()
+
+
+STORE = ArtifactStore()
+# a forked child has no writer thread: finish pending writes first (errors surface on flush)
+os.register_at_fork(before=lambda: STORE._writes.join(), after_in_child=STORE._reset_writer)
+# the writer is a daemon thread: a stage run on its own must not exit with writes in flight
+atexit.register(STORE.flush)
+
+
+def publish(df: pd.DataFrame, path: str, schema: pa.Schema = None) -> pd.DataFrame:
+    """Publish ``df`` as the dataset at ``path`` in this process's store."""
+    return STORE.publish(df, path, schema)
+
+
+def consume(path: str, columns: list = None, filters: list = None) -> pd.DataFrame:
+    """Read the dataset at ``path`` through this process's store."""
+    return STORE.consume(path, columns, filters)
+
+
+def exists(path: str) -> bool:
+    """Whether a dataset is stored at ``path``, counting ones still being written."""
+    return STORE.exists(path)
+
+
+def list_datasets(directory: str, prefix: str) -> list:
+    """``storage.list_datasets`` once the pending writes are done, so published datasets are listed."""
+    STORE.flush()
+    return storage.list_datasets(directory, prefix)
+
+
+def flush():
+    STORE.flush()
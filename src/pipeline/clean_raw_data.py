@@ -1,78 +1,202 @@
 import pandas as pd
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-def clean_airbnb_data(df):
+from pipeline import artifacts, profiling, raw_store
+from pipeline.cleaning_rules import LISTING_RULES
+from pipeline.storage import (
+    CLEAN_LISTINGS_SCHEMA, DatasetWriter, dataset_path, read_raw_listings,
+)
+
+# Rows per chunk in streaming mode; peak memory scales with this, not the file
+CHUNK_SIZE = 100_000
+
+VIOLATIONS_COLUMNS = ["quarter", "date", "rule", "violations"]
+
+
+@profiling.profiled
+def clean_airbnb_data(df, report=False, keep_rejected=False):
     """
     Clean Airbnb dataset by removing invalid rows instead of capping values.
 
+    The rules live in ``cleaning_rules.LISTING_RULES`` and run in one pass.
     Drops rows where:
-      - price < 0
-      - minimum_nights > 365
-      - availability_365 > 365 or < 0
+      - price is missing or < 0
+      - minimum_nights is missing or outside 1..365
+      - availability_365 is missing or outside 0..365
 
       --------
       Returns:
-      df: cleaned data frame
+      df: cleaned data frame, or with ``report`` a ``CleaningResult``
+      (cleaned frame, per-rule violation counts, rejected rows if
+      ``keep_rejected``)
+    """
+    result = LISTING_RULES.apply(df, keep_rejected=keep_rejected)
+    return result if report else result.clean
+
+
+def _add_violations(total, violations):
+    for rule, count in violations.items():
+        total[rule] = total.get(rule, 0) + count
+    return total
+
+
+def clean_snapshot(input_file, output_file, date, chunksize=None, rejected_file=None):
+    """
+    Clean one raw snapshot file and store it. Columns the cleaning rules
+    drop are skipped while the CSV is parsed.
+
+    With ``chunksize`` set, the raw file (plain or compressed, e.g.
+    ``listings.csv.gz``) is read ``chunksize`` rows at a time and each cleaned
+    chunk is appended to the output, so memory is bounded by the chunk size.
+    The stored result is identical to cleaning the whole file at once.
+    Without it, the cleaned snapshot is published to the artifact store, so
+    later stages of the same run get it from memory.
+    With ``rejected_file`` set, the rejected rows and the rules they broke
+    are written to that CSV.
+
+    Returns:
+        tuple: (rows read, rows kept, per-rule violation counts)
+    """
+    if rejected_file is not None:
+        os.makedirs(os.path.dirname(rejected_file) or ".", exist_ok=True)
+    keep_rejected = rejected_file is not None
+
+    if chunksize is None:
+        df = read_raw_listings(input_file, usecols=LISTING_RULES.reads)
+        df_clean, violations, rejected = clean_airbnb_data(df, report=True, keep_rejected=keep_rejected)
+        df_clean["date"] = pd.Timestamp(date)
+        artifacts.publish(df_clean, output_file, CLEAN_LISTINGS_SCHEMA)
+        if keep_rejected:
+            rejected.to_csv(rejected_file, index=False)
+        return len(df), len(df_clean), violations
+
+    rows_in, violations = 0, {}
+    with DatasetWriter(output_file, CLEAN_LISTINGS_SCHEMA) as writer:
+        chunks = read_raw_listings(input_file, usecols=LISTING_RULES.reads, chunksize=chunksize)
+        for i, chunk in enumerate(chunks):
+            rows_in += len(chunk)
+            chunk_clean, chunk_violations, rejected = clean_airbnb_data(
+                chunk, report=True, keep_rejected=keep_rejected)
+            _add_violations(violations, chunk_violations)
+            chunk_clean["date"] = pd.Timestamp(date)
+            writer.write(chunk_clean)
+            if keep_rejected:
+                rejected.to_csv(rejected_file, index=False, mode="w" if i == 0 else "a", header=i == 0)
+    return rows_in, writer.rows_written, violations
+
+
+def discover_snapshots(raw_data_path):
+    """
+    Map each raw snapshot in ``raw_data_path`` to its date.
+
+    Dates come from the raw store's manifest (compressed blobs) or, for
+    snapshots not in the store, the file names (``listings_<date>.csv[.gz]``),
+    so labels never depend on how many files happen to be present.
+
+    Returns:
+        list: (date, path) pairs sorted by date
+    """
+    return raw_store.discover_snapshots(raw_data_path)
+
+
+def _clean_job(job):
+    """Clean one snapshot; runs in a worker process."""
+    quarter, date, input_file, output_file, chunksize, rejected_file = job
+    start = time.perf_counter()
+    with profiling.step(f"clean_snapshot[{date}]") as measurement:
+        rows_in, rows_out, violations = clean_snapshot(input_file, output_file, date,
+                                                       chunksize=chunksize, rejected_file=rejected_file)
+        if measurement:
+            measurement.rows_in, measurement.rows_out = rows_in, rows_out
+    return {
+        "quarter": quarter, "date": date, "input_file": input_file, "output_file": output_file,
+        "rows_in": rows_in, "rows_out": rows_out, "violations": violations,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _clean_job_in_worker(job):
+    """Clean one snapshot in a worker process, which may exit once the job returns."""
+    result = _clean_job(job)
+    artifacts.flush()
+    return result
+
+
+def violations_table(results):
+    """Per-rule violation counts of cleaned snapshots (``_clean_job`` results), one row per rule."""
+    return pd.DataFrame(
+        [{"quarter": f"Q{r['quarter']}", "date": r["date"], "rule": rule, "violations": count}
+         for r in results for rule, count in r["violations"].items()],
+        columns=VIOLATIONS_COLUMNS,
+    )
+
+
+def main(dates=None, streaming=False, chunksize=CHUNK_SIZE, workers=None, rejected=False):
+    """
+    Clean the raw snapshots for ``dates`` (all snapshots on disk if None).
+
+    Snapshots are independent, so they are fanned out to ``workers`` processes
+    (default: one per CPU, at most one per snapshot). Quarter numbers follow
+    date order, whatever order the workers finish in.
+
+    The per-rule violation counts of every snapshot are saved to
+    ``results/tables/cleaning_violations.csv``; with ``rejected`` the rejected
+    rows themselves go to ``data/processed/rejected/``.
+
+    Returns:
+        list: per-snapshot dicts with row counts, violations and timings, in date order
     """
-    df = df.copy()
-
-    #drop uninformative columns
-    df = df.drop(columns=['license', 'neighbourhood_group'])
-    
-    # Ensure correct dtypes
-    df["id"] = pd.to_numeric(df["id"], errors="coerce").astype("Int64")
-    if "host_id" in df.columns:
-        df["host_id"] = pd.to_numeric(df["host_id"], errors="coerce").astype("Int64")
-    if "last_review" in df.columns:
-        df["last_review"] = pd.to_datetime(df["last_review"], errors="coerce")
-
-
-    numeric_cols = [
-        "latitude", "longitude", "price", "minimum_nights",
-        "number_of_reviews", "reviews_per_month",
-        "calculated_host_listings_count", "availability_365",
-        "number_of_reviews_ltm"
-    ]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    
-
-    # --- Drop weird data points ---
-    df = df[df["price"] >= 0]                          # no negative prices
-    df = df[df["minimum_nights"].between(1, 365)]      # reasonable stays only
-    df = df[df["availability_365"].between(0, 365)]    # within a year
-    return df
-
-    
-def main(dates = ["2024-09-18", "2024-12-20", "2025-03-15", "2025-06-19"]):
     # Paths
     current_path = os.getcwd()
     project_path = current_path.replace("/src/pipeline", "")
     raw_data_path = os.path.join(project_path, "data", "raw")
     processed_data_path = os.path.join(project_path, "data", "processed")
+    rejected_path = os.path.join(processed_data_path, "rejected")
+    tables_path = os.path.join(project_path, "results", "tables")
+
+    # gets all snapshot files in the data/raw, keyed by their date
+    snapshots = discover_snapshots(raw_data_path)
+    if dates is not None:
+        available = dict(snapshots)
+        missing = [d for d in dates if d not in available]
+        if missing:
+            print(f"Warning: no raw file for dates {missing}, skipping them.")
+        snapshots = [(d, available[d]) for d in sorted(dates) if d in available]
+
+    jobs = [
+        (i + 1, date, input_file,
+         dataset_path(processed_data_path, f"listings_quarter{i+1}"),
+         chunksize if streaming else None,
+         os.path.join(rejected_path, f"listings_quarter{i+1}_rejected.csv") if rejected else None)
+        for i, (date, input_file) in enumerate(snapshots)
+    ]
+
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    print(f"Cleaning {len(jobs)} snapshots with {workers} worker(s) ...")
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_clean_job_in_worker, jobs))
+    else:
+        results = [_clean_job(job) for job in jobs]
+
+    profiling.count_rows(rows_in=sum(r["rows_in"] for r in results),
+                         rows_out=sum(r["rows_out"] for r in results))
+    for r in results:
+        print(f"Saved cleaned file: {r['output_file']} "
+              f"({r['rows_out']}/{r['rows_in']} rows kept, {r['seconds']:.2f}s)")
+        broken = ", ".join(f"{rule} {count}" for rule, count in r["violations"].items() if count)
+        if broken:
+            print(f"  rejected: {broken}")
 
-    # gets all files in the data/raw 
-    raw_files = [f for f in os.listdir(raw_data_path) if f.startswith("listings")]
-    raw_files.sort()
-    
-    
-    for i, fname in enumerate(raw_files):
-        input_file = os.path.join(raw_data_path, fname)
-        output_file = os.path.join(processed_data_path, f"listings_quarter{i+1}")
-    
-        print(f"Loading {input_file} ...")
-        df = pd.read_csv(input_file)
-    
-        print(f"Cleaning data from {fname} ...")
-        df_clean = clean_airbnb_data(df)
-        df_clean["date"] = dates[i]
-        
-        df_clean.to_csv(output_file, index=False)
-        print(f"Saved cleaned file: {output_file}")
+    os.makedirs(tables_path, exist_ok=True)
+    violations_table(results).to_csv(os.path.join(tables_path, "cleaning_violations.csv"), index=False)
 
+    artifacts.flush()  # the published quarters are on disk before the stage returns
     print("Done!")
+    return results
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,141 @@
+"""
+Declarative cleaning rules for raw listings.
+
+The rule set says which columns are dropped, how each column is coerced
+(values that do not parse become missing) and which rows are invalid:
+``required`` rules reject missing values, ``range`` rules reject values outside
+``[low, high]``. ``RuleSet`` compiles the declarations into a per-column plan,
+so applying it touches every column once: the column is coerced, checked by
+all of its rules on one float view, and the violations are OR-ed into a
+single rejection mask. The per-rule violation counts come out of the same
+pass; rejected rows (with the rules they broke) are only materialized on
+request.
+"""
+
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+def _to_integer(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values, errors="coerce").astype("Int64")
+
+
+def _to_number(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values, errors="coerce")
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(values, errors="coerce")
+
+
+COERCIONS = {"integer": _to_integer, "number": _to_number, "datetime": _to_datetime}
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A row is invalid when ``column`` is missing (required) or outside [low, high] (range)."""
+    name: str
+    column: str
+    kind: str = "range"
+    low: float = -np.inf
+    high: float = np.inf
+
+    def violations(self, values: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        if self.kind == "required":
+            return missing
+        # a missing value is the business of the column's required rule
+        with np.errstate(invalid="ignore"):
+            return ~missing & ((values < self.low) | (values > self.high))
+
+
+class CleaningResult(NamedTuple):
+    clean: pd.DataFrame
+    violations: dict          # rule name -> number of rows breaking it
+    rejected: pd.DataFrame    # rejected rows + "rejected_by", or None
+
+
+class RuleSet:
+    """Compiled cleaning rules; ``apply`` cleans a raw frame in one pass."""
+
+    def __init__(self, coerce: dict, rules: list, drop: list = ()):
+        unknown = set(coerce.values()) - set(COERCIONS)
+        if unknown:
+            raise ValueError(f"Unknown coercions: {sorted(unknown)}")
+        self.coerce = dict(coerce)
+        self.rules = list(rules)
+        self.drop = list(drop)
+        self.required = [r.column for r in self.rules if r.kind == "required"]
+        # column -> (coercion, rules checking it), each column visited once
+        self._plan = {column: (COERCIONS[kind], []) for column, kind in self.coerce.items()}
+        for rule in self.rules:
+            self._plan.setdefault(rule.column, (None, []))[1].append(rule)
+
+    def reads(self, column: str) -> bool:
+        """Whether ``column`` is used at all (a ``usecols`` callable for the raw reader)."""
+        return column not in self.drop
+
+    def apply(self, df: pd.DataFrame, keep_rejected: bool = False) -> CleaningResult:
+        """
+        Clean ``df``: drop the declared columns, coerce, and keep the rows
+        breaking no rule. Columns a rule set knows but ``df`` lacks are
+        skipped, unless a required rule needs them (``ValueError``).
+        """
+        missing_columns = [c for c in self.required if c not in df.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {missing_columns}")
+
+        # dropping columns is the only copy of the input
+        df = df.drop(columns=self.drop, errors="ignore")
+        rejected = np.zeros(len(df), dtype=bool)
+        broken = {}
+        for column, (coerce, rules) in self._plan.items():
+            if column not in df.columns:
+                continue
+            if coerce is not None:
+                df[column] = coerce(df[column])
+            if not rules:
+                continue
+            values = df[column].to_numpy(dtype="float64", na_value=np.nan)
+            missing = np.isnan(values)
+            for rule in rules:
+                broken[rule.name] = rule.violations(values, missing)
+                rejected |= broken[rule.name]
+
+        violations = {rule.name: int(broken[rule.name].sum()) if rule.name in broken else 0
+                      for rule in self.rules}
+        rejected_rows = None
+        if keep_rejected:
+            rejected_rows = df[rejected].copy()
+            reasons = zip(*(np.where(broken[name][rejected], name, "") for name in broken))
+            rejected_rows["rejected_by"] = [";".join(filter(None, row)) for row in reasons]
+        return CleaningResult(df[~rejected], violations, rejected_rows)
+
+
+LISTING_RULES = RuleSet(
+    drop=["license", "neighbourhood_group"],  # uninformative
+    coerce={
+        "id": "integer",
+        "host_id": "integer",
+        "last_review": "datetime",
+        "latitude": "number",
+        "longitude": "number",
+        "price": "number",
+        "minimum_nights": "number",
+        "number_of_reviews": "number",
+        "reviews_per_month": "number",
+        "calculated_host_listings_count": "number",
+        "availability_365": "number",
+        "number_of_reviews_ltm": "number",
+    },
+    rules=[
+        Rule("price_missing", "price", kind="required"),
+        Rule("price_negative", "price", low=0),                                  # no negative prices
+        Rule("minimum_nights_missing", "minimum_nights", kind="required"),
+        Rule("minimum_nights_out_of_range", "minimum_nights", low=1, high=365),  # reasonable stays only
+        Rule("availability_missing", "availability_365", kind="required"),
+        Rule("availability_out_of_range", "availability_365", low=0, high=365),  # within a year
+    ],
+)
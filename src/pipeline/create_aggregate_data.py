@@ -5,124 +5,294 @@ Script to merge quarterly data into a joint dataset and apply additional cleanin
 
 import pandas as pd
 import numpy as np
+import json
 import os
 
+from pipeline import artifacts, profiling
+from pipeline.aggregate_cube import sketch_quantiles
+from pipeline.panel_store import PANEL_DIR, build_panel
+from pipeline.schema import apply_schema, concat_frames
+from pipeline.spatial import add_competitor_features
+from pipeline.storage import JOINT_SCHEMA, dataset_path
 
-def load_quarterly_data(processed_data_path):
-    """Load all quarterly processed data files"""
-    data_files = [f for f in os.listdir(processed_data_path) if f.startswith("listings_quarter")]
-    data_files.sort()
+JOINT_NAME = "boston_listings_joint"
+# partial states kept next to the joint dataset for incremental ingestion
+STATE_NAME = "joint_state"
+PRICE_STATE_NAME = "joint_neighbourhood_prices"
+
+
+def balanced_panel_ids(data_files):
+    """
+    Sorted ids of the listings present in every one of ``data_files``.
+
+    Only the ``id`` column of each file is read. Each file after the first is
+    read with an ``id in <candidates>`` filter, so once the panel has shrunk,
+    row groups that hold none of the surviving ids are not decoded (unless
+    the quarter is already in memory, where the filter costs no I/O).
+    """
+    panel = None
+    for input_file in data_files:
+        filters = None if panel is None else [("id", "in", panel)]
+        ids = artifacts.consume(input_file, columns=["id"], filters=filters)["id"]
+        ids = np.unique(ids.dropna().to_numpy(dtype=np.int64))
+        panel = ids if panel is None else np.intersect1d(panel, ids, assume_unique=True)
+    return panel
+
+
+def load_quarterly_data(processed_data_path, balanced=False):
+    """
+    Load all quarterly processed data files
+
+    With ``balanced`` only the listings present in every quarter are read:
+    the panel is computed from the id columns first and then applied as a
+    filter while reading each quarter.
+    """
+    data_files = artifacts.list_datasets(processed_data_path, "listings_quarter")
     
     if not data_files:
         raise ValueError("No processed data files found. Run clean_data.py first.")
+
+    filters = None
+    if balanced:
+        panel = balanced_panel_ids(data_files)
+        print(f"Balanced panel: {len(panel)} listings present in all {len(data_files)} quarters")
+        filters = [("id", "in", panel)]
     
     quarterly_data = {}
-    for i, fname in enumerate(data_files):
-        input_file = os.path.join(processed_data_path, fname)
+    for i, input_file in enumerate(data_files):
         print(f"Loading quarter {i+1} from {input_file}")
         
-        df = pd.read_csv(input_file)
+        df = artifacts.consume(input_file, filters=filters)
         df['quarter'] = f"Q{i+1}"
         
         quarterly_data[i+1] = df
     
     return quarterly_data
 
+@profiling.profiled
 def merge_quarterly_data(quarterly_data):
     """Merge all quarterly data into a single DataFrame"""
-    all_data = pd.concat(quarterly_data.values(), ignore_index=True)
+    all_data = apply_schema(concat_frames(quarterly_data.values()))
     print(f"Merged {len(quarterly_data)} quarters, total {len(all_data)} listings")
     return all_data
 
-def engineer_features(df):
+def neighbourhood_price_state(df):
+    """
+    Mergeable state of the neighbourhood price statistics: the number of rows
+    per (quarter, neighbourhood, price). States of disjoint row sets add up
+    (``update_price_state``), and ``neighbourhood_stats`` derives the exact
+    counts, means and medians from it.
+    """
+    state = (df.dropna(subset=["price"])
+             .groupby(["quarter", "neighbourhood", "price"], observed=True).size()
+             .rename("count").reset_index().rename(columns={"price": "bucket"}))
+    state["bucket"] = state["bucket"].astype("float64")
+    return state
+
+
+def update_price_state(state, added=None, removed=None):
+    """``state`` with the rows of the ``added`` frame counted and those of ``removed`` taken out."""
+    parts = [state]
+    if added is not None:
+        parts.append(neighbourhood_price_state(added))
+    if removed is not None:
+        removed = neighbourhood_price_state(removed)
+        removed["count"] = -removed["count"]
+        parts.append(removed)
+    keys = ["quarter", "neighbourhood", "bucket"]
+    parts = [part.astype({"quarter": str, "neighbourhood": str}) for part in parts]
+    state = pd.concat(parts, ignore_index=True).groupby(keys, sort=False)["count"].sum().reset_index()
+    return state[state["count"] > 0].reset_index(drop=True)
+
+
+def neighbourhood_stats(state):
+    """Per neighbourhood (all quarters): average, median and number of priced rows."""
+    state = state[state["count"] > 0]
+    grouped = state.assign(total=state["bucket"] * state["count"]).groupby("neighbourhood", observed=True)
+    count = grouped["count"].sum()
+    return pd.DataFrame({
+        "neighborhood_avg_price": (grouped["total"].sum() / count).round(2),
+        "neighborhood_median_price": sketch_quantiles(state, ["neighbourhood"], 0.5).round(2),
+        "neighborhood_count": count,
+    })
+
+
+def add_neighbourhood_features(df, stats):
+    """Broadcast neighbourhood ``stats`` to the rows of ``df`` (in place), with the price premium."""
+    codes = pd.Categorical(df["neighbourhood"].astype(str), categories=stats.index.astype(str)).codes
+    for column in stats.columns:
+        # in the price's precision, as groupby().transform would give them
+        values = np.append(stats[column].to_numpy(dtype=df["price"].dtype), np.nan)
+        df[column] = values[codes]  # code -1 (unknown neighbourhood) takes the trailing NaN
+    df['price_premium_pct'] = ((df['price'] - df['neighborhood_avg_price']) / df['neighborhood_avg_price']) * 100
+    return df
+
+
+def add_room_type_indicators(df):
+    """
+    One boolean column per room type present (same columns and order as
+    pd.get_dummies; room types dropped by the cleaning don't get an
+    all-False column). Existing indicator columns are replaced.
+    """
+    # del per stale column: even an empty drop(inplace=True) rebuilds the whole frame
+    for column in [c for c in df.columns if c.startswith('room_type_')]:
+        del df[column]
+    room_types = pd.Categorical(df['room_type']).remove_unused_categories()
+    for code, room_type in enumerate(room_types.categories):
+        df[f'room_type_{room_type}'] = room_types.codes == code
+    return df
+
+
+@profiling.profiled
+def engineer_features(df, inplace=False, neighbourhood=None):
     """
     Create meaningful features for analysis (of the merged data)
+
+    Every feature is added as one new column: neighbourhood statistics come from
+    ``groupby().transform`` instead of a merge, and room-type indicators are
+    boolean arrays built from the category codes instead of a concat. Unless
+    ``inplace`` is True the input frame is left untouched (a shallow copy gets
+    the new columns; no existing data is copied).
+
+    ``neighbourhood`` (from ``neighbourhood_stats``) supplies the neighbourhood
+    statistics instead, when ``df`` is only part of the rows they describe.
     """
     print("Engineering features...")
-    
+    if not inplace:
+        df = df.copy(deep=False)
+
     #  Price-based features
-    df = df.copy()
     df['log_price'] = np.log(df['price'])  # For normalized distribution
-    
+
     # Price categories
-    df['price_category'] = pd.cut(df['price'], 
+    df['price_category'] = pd.cut(df['price'],
                                  bins=[50, 100, 150, 200, 500, 1000, np.inf],
-                                 labels=['Budget', 'Moderate', 'Comfort', 
+                                 labels=['Budget', 'Moderate', 'Comfort',
                                         'Expensive', 'Premium', 'Luxury'])
-    
+
     # Availability features
     df['availability_rate'] = df['availability_365'] / 365
     df['is_highly_available'] = df['availability_365'] > 180  # Available > 6 months
-    
-    # Seasonal/quarter features
-    df['quarter_num'] = df['quarter'].str.replace('Q', '').astype(int)
+
+    # Seasonal/quarter features (parse each distinct label once, then take by code)
+    quarters = pd.Categorical(df['quarter'])
+    quarter_nums = np.array([int(q.replace('Q', '')) for q in quarters.categories], dtype=np.int64)
+    df['quarter_num'] = quarter_nums[quarters.codes]
     df['is_peak_season'] = df['quarter_num'].isin([2, 3])  # Q2, Q3 = summer/fall
-    
-    # Geographic features 
-    # Calculate neighborhood statistics
-    neighborhood_stats = df.groupby('neighbourhood').agg({
-        'price': ['mean', 'median', 'count']
-    }).round(2)
-    neighborhood_stats.columns = ['neighborhood_avg_price', 'neighborhood_median_price', 'neighborhood_count']
-    df = df.merge(neighborhood_stats, on='neighbourhood', how='left')
-    
-    # Price premium relative to neighborhood
-    df['price_premium_pct'] = ((df['price'] - df['neighborhood_avg_price']) / df['neighborhood_avg_price']) * 100
-    
+
+    # Geographic features
+    # Neighborhood statistics, broadcast back to the rows of each neighborhood
+    if neighbourhood is not None:
+        add_neighbourhood_features(df, neighbourhood)
+    else:
+        neighborhood_price = df.groupby('neighbourhood', observed=True, sort=False)['price']
+        df['neighborhood_avg_price'] = neighborhood_price.transform('mean').round(2)
+        df['neighborhood_median_price'] = neighborhood_price.transform('median').round(2)
+        df['neighborhood_count'] = neighborhood_price.transform('count')
+
+        # Price premium relative to neighborhood
+        df['price_premium_pct'] = ((df['price'] - df['neighborhood_avg_price']) / df['neighborhood_avg_price']) * 100
+
     # 7. Room type features
-    room_type_dummies = pd.get_dummies(df['room_type'], prefix='room_type')
-    df = pd.concat([df, room_type_dummies], axis=1)
-    
-    return df
+    return add_room_type_indicators(df)
 
 
-def clean_joint_dataset(df):
+@profiling.profiled
+def clean_joint_dataset(df, balanced=False):
     """
     Apply additional cleaning specific to the joint dataset
     Drop listings that don't appear in every quarter/date
 
-    Takes in the merged data
+    Takes in the merged data. Pass ``balanced=True`` when it was loaded with
+    ``load_quarterly_data(..., balanced=True)``, which already dropped them.
     """
     print("Cleaning joint dataset...")
-    
-    # Get the unique quarters/dates in the dataset
-    unique_quarters = df['quarter'].unique()
-    
-    # Count how many quarters each listing appears in
-    listing_quarter_count = df.groupby('id')['quarter'].nunique()
-    
-    # Find listings that appear in ALL quarters
-    listings_in_all_quarters = listing_quarter_count[listing_quarter_count == len(unique_quarters)].index
-    
-    # Filter the dataframe to only include listings that appear in every quarter
-    df = df[df['id'].isin(listings_in_all_quarters)]
+
+    if not balanced:
+        # Get the unique quarters/dates in the dataset
+        unique_quarters = df['quarter'].unique()
+
+        # Count how many quarters each listing appears in
+        listing_quarter_count = df.groupby('id')['quarter'].nunique()
+
+        # Find listings that appear in ALL quarters
+        listings_in_all_quarters = listing_quarter_count[listing_quarter_count == len(unique_quarters)].index
+
+        # Filter the dataframe to only include listings that appear in every quarter
+        df = df[df['id'].isin(listings_in_all_quarters)]
 
     #transform it!
     df = engineer_features(df)
     return df
 
-def main():
+
+def save_state(processed_data_path, snapshots, reference_latitude, price_state):
+    """Store what ``pipeline.ingest`` needs to append a snapshot to the joint dataset."""
+    artifacts.publish(price_state, dataset_path(processed_data_path, PRICE_STATE_NAME))
+    with open(os.path.join(processed_data_path, f"{STATE_NAME}.json"), "w") as f:
+        json.dump({"snapshots": list(snapshots), "reference_latitude": reference_latitude}, f, indent=2)
+
+
+def load_state(processed_data_path):
+    """(snapshot dates, reference latitude, price state) saved with the joint dataset."""
+    state_file = os.path.join(processed_data_path, f"{STATE_NAME}.json")
+    if not os.path.exists(state_file):
+        raise ValueError("No joint dataset state found. Run create_aggregate_data.py first.")
+    with open(state_file) as f:
+        state = json.load(f)
+    price_state = artifacts.consume(dataset_path(processed_data_path, PRICE_STATE_NAME))
+    return state["snapshots"], state["reference_latitude"], price_state
+
+
+def snapshot_dates(data_files):
+    """Snapshot date (``YYYY-MM-DD``) of each cleaned quarter file."""
+    dates = []
+    for input_file in data_files:
+        date = artifacts.consume(input_file, columns=["date"])["date"].dropna()
+        dates.append(str(date.iloc[0].date()) if len(date) else None)
+    return dates
+
+def main(workers=None):
     # Paths
     current_path = os.getcwd()
     project_path = current_path.replace("/src/pipeline", "")
     processed_data_path = os.path.join(project_path, "data", "processed")
-    output_file = os.path.join(processed_data_path, "boston_listings_joint.csv")
+    output_file = dataset_path(processed_data_path, JOINT_NAME)
     
     print("Creating joint Boston listings dataset...")
     
-    # Load quarterly data (returns a dictionary)
-    quarterly_data_dict = load_quarterly_data(processed_data_path)
+    # Load the balanced panel of each quarter (returns a dictionary)
+    quarterly_data_dict = load_quarterly_data(processed_data_path, balanced=True)
     
     # Merge into single DataFrame
     merged_df = merge_quarterly_data(quarterly_data_dict)
     
     # Clean and engineer features
-    cleaned_df = clean_joint_dataset(merged_df)
+    cleaned_df = clean_joint_dataset(merged_df, balanced=True)
+
+    # Competition around each listing, per quarter (quarters run in parallel);
+    # later snapshots are projected around the same latitude
+    print("Computing competitor features...")
+    reference_latitude = float(cleaned_df["latitude"].mean())
+    cleaned_df = apply_schema(add_competitor_features(cleaned_df, reference_latitude=reference_latitude,
+                                                      workers=workers))
     
+    profiling.count_rows(rows_in=len(merged_df), rows_out=len(cleaned_df))
+
     # Save the final dataset
-    cleaned_df.to_csv(output_file, index=False)
+    cleaned_df = artifacts.publish(cleaned_df, output_file, JOINT_SCHEMA)
     
     print(f"Saved joint dataset to: {output_file}")
+
+    # Dense listing x quarter arrays for per-listing / per-host trajectories
+    panel = build_panel(cleaned_df)
+    panel.save(os.path.join(processed_data_path, PANEL_DIR))
+    print(f"Saved panel store ({len(panel)} listings x {len(panel.snapshots)} quarters)")
+
+    # Partial states for appending snapshots without rebuilding (pipeline.ingest)
+    dates = snapshot_dates(artifacts.list_datasets(processed_data_path, "listings_quarter"))
+    save_state(processed_data_path, dates, reference_latitude, neighbourhood_price_state(cleaned_df))
+    artifacts.flush()
     print(f"Final dataset shape: {cleaned_df.shape}")
     print("Done!")
 
@@ -0,0 +1,246 @@
+"""
+Incremental DAG runner for the pipeline stages.
+
+Each stage declares its input and output files (glob patterns relative to the
+project root), the stages it depends on, the modules that make up its code and
+its parameters. Before a stage runs, the content hashes of all of these are
+combined into a key; if the key matches the one stored in the manifest from the
+last successful run and the outputs still exist, the stage is skipped.
+Stages whose dependencies are satisfied at the same time run in parallel.
+
+Stages hand datasets to each other through ``pipeline.artifacts``: a stage
+with nothing to overlap runs in this process, and worker processes are forked
+per batch of parallel stages, so both see the frames published or loaded by
+the stages before them instead of parsing the files again.
+"""
+
+import glob
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from pipeline import profiling
+
+MANIFEST_PATH = os.path.join(".pipeline_cache", "manifest.json")
+
+# modules every stage runs through (run_target), hashed into every stage key
+RUNNER_CODE = ["pipeline.artifacts", "pipeline.profiling"]
+
+# target -> seconds spent importing its module in this process (first resolve only)
+IMPORT_SECONDS = {}
+
+
+@dataclass
+class Stage:
+    """One node of the pipeline graph."""
+    name: str
+    target: str                                   # "package.module:function"
+    inputs: list = field(default_factory=list)    # glob patterns
+    outputs: list = field(default_factory=list)   # glob patterns
+    deps: list = field(default_factory=list)      # upstream stage names
+    code: list = field(default_factory=list)      # extra modules hashed with the target's
+    params: dict = field(default_factory=dict)    # keyword arguments for the target
+    always_run: bool = False                      # e.g. network stages with their own caching
+
+    @property
+    def module(self) -> str:
+        return self.target.split(":")[0]
+
+
+def resolve(target: str):
+    """Import ``package.module:function`` lazily and return the function."""
+    module_name, func_name = target.split(":")
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_SECONDS.setdefault(target, time.perf_counter() - start)
+    return getattr(module, func_name)
+
+
+def run_target(target: str, params: dict, name: str = None):
+    """
+    Entry point used by worker processes; measured as stage ``name`` when
+    profiling. Returns once the datasets the stage published are on disk.
+    """
+    with profiling.stage(name or target) as measurement:
+        func = resolve(target)
+        if measurement:
+            measurement.import_s = round(IMPORT_SECONDS[target], 4)
+        result = func(**params)
+        from pipeline import artifacts  # imported with the stage already; keeps startup light
+        artifacts.flush()
+        return result
+
+
+def _hash_file(path: str, digest):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+
+def _expand(patterns: list, root: str) -> list:
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(root, pattern)))
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def stage_key(stage: Stage, root: str) -> str:
+    """Content hash of a stage's inputs, code and parameters."""
+    digest = hashlib.sha256()
+    for path in _expand(stage.inputs, root):
+        digest.update(os.path.relpath(path, root).encode())
+        _hash_file(path, digest)
+    for module in [stage.module] + stage.code + RUNNER_CODE:
+        spec = importlib.util.find_spec(module)
+        digest.update(module.encode())
+        _hash_file(spec.origin, digest)
+    digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def topological_order(stages: list) -> list:
+    """Stages sorted so that every stage comes after its dependencies."""
+    by_name = {s.name: s for s in stages}
+    ordered, visiting, done = [], set(), set()
+
+    def visit(stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Cycle in pipeline at stage '{stage.name}'")
+        visiting.add(stage.name)
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+            visit(by_name[dep])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+class Pipeline:
+    """A set of stages plus the manifest recording their last successful keys."""
+
+    def __init__(self, stages: list, root: str, manifest_path: str = None):
+        self.stages = topological_order(stages)
+        self.root = root
+        self.manifest_path = manifest_path or os.path.join(root, MANIFEST_PATH)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_up_to_date(self, stage: Stage, key: str) -> bool:
+        if stage.always_run or self.manifest.get(stage.name) != key:
+            return False
+        return all(glob.glob(os.path.join(self.root, pattern)) for pattern in stage.outputs)
+
+    def record(self, names: list):
+        """
+        Record the named stages as up to date with their current inputs, for
+        when their outputs were brought up to date outside ``run`` (e.g. by an
+        incremental update).
+        """
+        by_name = {s.name: s for s in self.stages}
+        for name in names:
+            self.manifest[name] = stage_key(by_name[name], self.root)
+        self._save_manifest()
+
+    def select(self, names: list) -> list:
+        """The named stages plus everything upstream of them."""
+        by_name = {s.name: s for s in self.stages}
+        wanted, stack = set(), list(names)
+        while stack:
+            name = stack.pop()
+            if name not in by_name:
+                raise ValueError(f"Unknown stage '{name}'")
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(by_name[name].deps)
+        return [s for s in self.stages if s.name in wanted]
+
+    def run(self, names: list = None, force: bool = False, jobs: int = 1,
+            skip: list = None) -> dict:
+        """
+        Run the pipeline, skipping stages that are up to date.
+
+        Args:
+            names (list): Stages to bring up to date (default: all).
+            force (bool): Run every selected stage regardless of the manifest.
+            jobs (int): Maximum number of stages running at once.
+            skip (list): Stages treated as up to date without checking.
+
+        Returns:
+            dict: stage name -> "ran" or "skipped".
+        """
+        stages = self.select(names) if names else list(self.stages)
+        status = {}
+        pending = list(stages)
+        running = {}
+        pool = None
+
+        try:
+            while pending or running:
+                ready = [s for s in pending if all(d in status for d in s.deps)]
+                to_run = []
+                for stage in ready:
+                    pending.remove(stage)
+                    if skip and stage.name in skip:
+                        print(f"[{stage.name}] skipped by request")
+                        status[stage.name] = "skipped"
+                        continue
+                    key = stage_key(stage, self.root)
+                    if not force and self.is_up_to_date(stage, key):
+                        print(f"[{stage.name}] up to date, skipping")
+                        status[stage.name] = "skipped"
+                        continue
+                    to_run.append((stage, key))
+                # decided after the skips: one stage left to run has nothing to overlap
+                # with and runs here, without a worker process
+                alone = not running and len(to_run) == 1
+                for stage, key in to_run:
+                    print(f"[{stage.name}] running...")
+                    if jobs <= 1 or alone:
+                        run_target(stage.target, stage.params, stage.name)
+                        self._finish(stage, key, status)
+                        continue
+                    if not running:
+                        # fresh workers inherit the artifacts published in this process so far
+                        if pool is not None:
+                            pool.shutdown()
+                        pool = ProcessPoolExecutor(max_workers=jobs)
+                    running[pool.submit(run_target, stage.target, stage.params, stage.name)] = (stage, key)
+
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, key = running.pop(future)
+                        future.result()  # re-raise stage failures
+                        self._finish(stage, key, status)
+                elif pending and not ready:
+                    raise ValueError("Pipeline has stages whose dependencies can never run")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return status
+
+    def _finish(self, stage: Stage, key: str, status: dict):
+        self.manifest[stage.name] = key
+        self._save_manifest()
+        status[stage.name] = "ran"
@@ -1,51 +1,230 @@
-import requests
+import contextlib
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pipeline.raw_store import RawStore, discover_snapshots
 
 BASE_URL = "https://data.insideairbnb.com/united-states/ma/boston/"
+MANIFEST_NAME = "download_manifest.json"
+CHUNK_SIZE = 1 << 16  # 64 KiB per write
+# snapshots of the original study; later ones are added with ``run_analysis.py ingest``
+SNAPSHOT_DATES = ["2024-09-18", "2024-12-20", "2025-03-15", "2025-06-19"]
+
+
+def snapshot_url(date: str, base_url: str = BASE_URL) -> str:
+    """URL of the listings summary file for one snapshot date."""
+    return f"{base_url}{date}/visualisations/listings.csv"
 
-def download_file(url: str, save_path: str):
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    """Session whose connection pool is large enough for every worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class DownloadManifest:
     """
-    Downloads a file from a URL to a specified path.
+    Thread-safe record of the validators (ETag / Last-Modified) seen for each
+    downloaded file, stored as JSON next to the raw data.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f)
+
+    def get(self, name: str) -> dict:
+        with self._lock:
+            return dict(self._entries.get(name, {}))
+
+    def update(self, name: str, **fields):
+        with self._lock:
+            self._entries.setdefault(name, {}).update(fields)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def _partial_path(save_path: str) -> str:
+    # hidden so that "listings*" discovery in the cleaning stage never sees it
+    directory, filename = os.path.split(save_path)
+    return os.path.join(directory, f".{filename}.part")
+
+
+def _validator(headers) -> str:
+    return headers.get("ETag") or headers.get("Last-Modified")
+
+
+def download_file(url: str, save_path: str, session=None, manifest=None,
+                  chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Streams a file from a URL to a specified path.
+
+    Reruns send If-None-Match / If-Modified-Since so unchanged files are skipped
+    (files moved to the raw store count as present: ``stored`` in the manifest),
+    and an interrupted download is resumed with a Range request (guarded by
+    If-Range, so a changed file is fetched again from the start).
 
     Args:
         url (str): The URL of the file to download.
         save_path (str): The local path to save the downloaded file.
+        session (requests.Session): Shared session; a new one is used if None.
+        manifest (DownloadManifest): Where validators are read and stored.
+        chunk_size (int): Bytes per chunk written to disk.
+
+    Returns:
+        dict: ``status`` ("downloaded", "resumed", "not_modified" or "failed"),
+        ``path`` and ``bytes`` transferred.
     """
- 
+    session = session or requests
+    name = os.path.basename(save_path)
+    entry = manifest.get(name) if manifest is not None else {}
+    part_path = _partial_path(save_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    headers = {}
+    if offset and entry.get("partial_validator"):
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = entry["partial_validator"]
+    elif os.path.exists(save_path) or entry.get("stored"):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
     try:
         print(f"Attempting to download {url}...")
-        resp = requests.get(url)
-        resp.raise_for_status()
+        with session.get(url, headers=headers, stream=True, timeout=60) as resp:
+            if resp.status_code == 304:
+                print(f"Not modified, keeping {save_path}")
+                return {"status": "not_modified", "path": save_path, "bytes": 0}
+            if resp.status_code == 416 and "Range" in headers:
+                # stale partial file (possibly already gone): drop it and start over
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(part_path)
+                if manifest is not None:
+                    manifest.update(name, partial_validator=None)
+                return download_file(url, save_path, session, manifest, chunk_size)
+            resp.raise_for_status()
+
+            resumed = resp.status_code == 206
+            if manifest is not None:
+                manifest.update(name, url=url, partial_validator=_validator(resp.headers))
+
+            written = 0
+            with open(part_path, "ab" if resumed else "wb") as f:
+                for chunk in resp.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+
+            os.replace(part_path, save_path)
+            if manifest is not None:
+                manifest.update(
+                    name,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                    size=os.path.getsize(save_path),
+                    partial_validator=None,
+                )
 
-        with open(save_path, "wb") as f:
-            f.write(resp.content)
         print(f"Successfully downloaded to {save_path}")
-    except requests.exceptions.RequestException as e:
+        return {"status": "resumed" if resumed else "downloaded",
+                "path": save_path, "bytes": written}
+    except (requests.exceptions.RequestException, OSError) as e:
         print(f"Failed to download {url}. Error: {e}")
-        
+        return {"status": "failed", "path": save_path, "bytes": 0, "error": str(e)}
+
+
+def download_snapshots(jobs, raw_data_dir: str, max_workers: int = 4) -> list:
+    """
+    Downloads many snapshots concurrently over one pooled session.
+
+    Args:
+        jobs (list): ``(url, filename)`` pairs, e.g. one per city/date.
+        raw_data_dir (str): Directory the files are saved to.
+        max_workers (int): Number of downloads in flight at once.
+
+    Returns:
+        list: One result dict (see ``download_file``) per job, in job order.
+    """
+    os.makedirs(raw_data_dir, exist_ok=True)
+    manifest = DownloadManifest(os.path.join(raw_data_dir, MANIFEST_NAME))
+    session = make_session(pool_size=max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(download_file, url, os.path.join(raw_data_dir, filename),
+                            session, manifest)
+                for url, filename in jobs
+            ]
+            return [future.result() for future in futures]
+    finally:
+        session.close()
+
+
+def known_dates(raw_data_dir: str) -> list:
+    """``SNAPSHOT_DATES`` plus the dates of every snapshot already in ``raw_data_dir``."""
+    return sorted(set(SNAPSHOT_DATES) | {date for date, _ in discover_snapshots(raw_data_dir)})
 
-#dates could change depending...
-def main(dates = ["2024-09-18", "2024-12-20", "2025-03-15", "2025-06-19"]):
+
+def store_downloads(dates, results, raw_data_dir: str) -> list:
     """
-    Downloads historical and current employment data files from the BLS website.
+    Move freshly downloaded snapshots into the compressed raw store (see
+    ``pipeline.raw_store``) and record in the download manifest that they are
+    stored, so later runs still send conditional requests for them.
+
+    Returns:
+        list: ``results`` with each stored download's manifest entry as ``stored``
+    """
+    store = RawStore(raw_data_dir)
+    manifest = DownloadManifest(os.path.join(raw_data_dir, MANIFEST_NAME))
+    for date, result in zip(dates, results):
+        if result["status"] not in ("downloaded", "resumed"):
+            continue
+        entry = store.put(date, result["path"])
+        os.remove(result["path"])
+        manifest.update(os.path.basename(result["path"]), stored=entry["sha256"])
+        result["stored"] = entry
+        print(f"Stored {date} as {entry['blob']} ({entry['bytes']:,} -> {entry['stored_bytes']:,} bytes"
+              f"{', same content as an earlier download' if entry['deduplicated'] else ''})")
+    return results
+
+
+def main(dates=None, base_url: str = BASE_URL, max_workers: int = 4):
+    """
+    Downloads the Inside Airbnb listings snapshots for the given dates
+    (default: the study's snapshots and any other already downloaded).
     """
     # Define the directory for saving files
     current_path = os.getcwd()# Get the current working directory
     project_path = current_path.replace('/src/pipeline', '')
     raw_data_dir = project_path + '/data/raw'
-    
+    if dates is None:
+        dates = known_dates(raw_data_dir)
+
     # Download data
     print("--- Downloading Airbnb data ---")
-    for date in dates:
-        url = f"{BASE_URL}{date}/visualisations/listings.csv"
-        filename = f"listings_{date}.csv"
-        save_path = os.path.join(raw_data_dir, filename)
-
-        try:
-            download_file(url, save_path)
-        except requests.exceptions.RequestException as e:
-            # Handle cases where the file for a specific year is not available
+    jobs = [(snapshot_url(date, base_url), f"listings_{date}.csv") for date in dates]
+    results = download_snapshots(jobs, raw_data_dir, max_workers=max_workers)
+    store_downloads(dates, results, raw_data_dir)
+
+    for date, result in zip(dates, results):
+        if result["status"] == "failed":
+            # Handle cases where the file for a specific date is not available
             print(f"Warning: File for date {date} was not found or could not be downloaded. Continuing to next date.")
+    return results
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
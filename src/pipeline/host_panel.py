@@ -0,0 +1,189 @@
+"""
+Host-level panel: every host's portfolio in every snapshot.
+
+Built from the cleaned quarters (not the balanced joint dataset), so listings
+entering and leaving the market are visible. For each (host, quarter) the
+portfolio table holds the number of listings, the room-type mix, the mean
+price and a revenue proxy, and the flows since the previous quarter: listings
+that entered or exited the market, listings that switched to or from another
+host, and whether the host itself entered or exited. A long table holds the
+host's listings per room type.
+
+Everything is computed on integer arrays: hosts are factorized once, each
+(quarter, host) pair is a dense cell index, and counts and sums are
+``np.bincount`` over those indices; listings are matched between quarters
+with one sorted intersection of their ids. There is no pandas groupby, so
+the cost is a few linear passes plus one sort per quarter.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline import artifacts, profiling
+from pipeline.schema import (
+    HOST_PORTFOLIO_COLUMNS, HOST_PORTFOLIO_SCHEMA, HOST_ROOM_MIX_COLUMNS, HOST_ROOM_MIX_SCHEMA,
+    apply_schema, concat_frames,
+)
+from pipeline.storage import dataset_path
+
+PORTFOLIOS_NAME = "host_portfolios"
+ROOM_MIX_NAME = "host_room_mix"
+INPUT_COLUMNS = ["id", "host_id", "room_type", "price", "minimum_nights", "number_of_reviews_ltm", "date"]
+ENTIRE_HOME = "Entire home/apt"
+
+# Revenue proxy: price x nights booked in the last twelve months, with the
+# bookings estimated from reviews (Inside Airbnb's occupancy model): one review
+# per REVIEW_RATE stays, stays of at least AVERAGE_STAY nights, occupancy capped
+REVIEW_RATE = 0.5
+AVERAGE_STAY = 3
+MAX_OCCUPANCY = 0.7
+
+
+def occupied_nights(reviews_ltm: np.ndarray, minimum_nights: np.ndarray) -> np.ndarray:
+    """Estimated nights booked over the last year (missing reviews count as none)."""
+    stays = np.nan_to_num(np.asarray(reviews_ltm, dtype=np.float64)) / REVIEW_RATE
+    nights = stays * np.maximum(np.nan_to_num(np.asarray(minimum_nights, dtype=np.float64)), AVERAGE_STAY)
+    return np.minimum(nights, MAX_OCCUPANCY * 365)
+
+
+def _flows(prev_ids, prev_hosts, ids, hosts, n_hosts):
+    """Per host: listings entered, exited, switched in and switched out between two snapshots."""
+    _, i_prev, i_cur = np.intersect1d(prev_ids, ids, assume_unique=True, return_indices=True)
+    stayed_prev = np.zeros(len(prev_ids), dtype=bool)
+    stayed_prev[i_prev] = True
+    stayed = np.zeros(len(ids), dtype=bool)
+    stayed[i_cur] = True
+    switched = prev_hosts[i_prev] != hosts[i_cur]
+    return [
+        np.bincount(hosts[~stayed], minlength=n_hosts),
+        np.bincount(prev_hosts[~stayed_prev], minlength=n_hosts),
+        np.bincount(hosts[i_cur][switched], minlength=n_hosts),
+        np.bincount(prev_hosts[i_prev][switched], minlength=n_hosts),
+    ]
+
+
+@profiling.profiled
+def build_host_panel(snapshots: list, quarters: list = None):
+    """
+    Host portfolios from cleaned snapshot frames (in time order).
+
+    Listings without an id or host are left out; a listing appearing twice in
+    a snapshot counts once. The first quarter has no flows (missing values).
+
+    Returns:
+        tuple: (portfolios, room_mix) DataFrames
+    """
+    quarters = quarters or [f"Q{i + 1}" for i in range(len(snapshots))]
+    frames = []
+    for t, df in enumerate(snapshots):
+        df = df.dropna(subset=["id", "host_id"]).drop_duplicates("id")
+        frames.append(df.assign(snapshot=t).sort_values("id", kind="stable"))
+    rows = concat_frames(frames)
+    n_snapshots = len(snapshots)
+    sizes = np.bincount(rows["snapshot"].to_numpy(), minlength=n_snapshots)
+    bounds = np.r_[0, np.cumsum(sizes)]
+
+    ids = rows["id"].to_numpy(dtype=np.int64)
+    host_ids, host_code = np.unique(rows["host_id"].to_numpy(dtype=np.int64), return_inverse=True)
+    n_hosts = len(host_ids)
+    cell = rows["snapshot"].to_numpy(dtype=np.int64) * n_hosts + host_code
+    n_cells = n_snapshots * n_hosts
+
+    price = rows["price"].to_numpy(dtype=np.float64, na_value=np.nan)
+    priced = ~np.isnan(price)
+    price = np.where(priced, price, 0.0)
+    revenue = price * occupied_nights(
+        rows["number_of_reviews_ltm"].to_numpy(dtype=np.float64, na_value=np.nan),
+        rows["minimum_nights"].to_numpy(dtype=np.float64, na_value=np.nan))
+
+    listings = np.bincount(cell, minlength=n_cells)
+    room_type = rows["room_type"].astype("category")
+    room_codes = room_type.cat.codes.to_numpy(dtype=np.int64)
+    n_rooms = len(room_type.cat.categories)
+    has_room = room_codes >= 0
+    rooms = np.bincount(cell[has_room] * n_rooms + room_codes[has_room],
+                        minlength=n_cells * n_rooms).reshape(n_cells, n_rooms)
+    entire = (rooms[:, room_type.cat.categories.get_loc(ENTIRE_HOME)]
+              if ENTIRE_HOME in room_type.cat.categories else np.zeros(n_cells, dtype=np.int64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_price = np.bincount(cell, weights=price, minlength=n_cells) \
+            / np.bincount(cell, weights=priced, minlength=n_cells)
+        entire_share = entire / listings
+
+    # flows since the previous snapshot, one row of cells per snapshot
+    flows = np.zeros((4, n_cells), dtype=np.int64)
+    for t in range(1, n_snapshots):
+        prev, cur = slice(bounds[t - 1], bounds[t]), slice(bounds[t], bounds[t + 1])
+        flows[:, t * n_hosts:(t + 1) * n_hosts] = _flows(
+            ids[prev], host_code[prev], ids[cur], host_code[cur], n_hosts)
+    previous = np.r_[np.zeros(n_hosts, dtype=np.int64), listings[:n_cells - n_hosts]]
+
+    # hosts active now, or active last quarter (their exit is a row with 0 listings)
+    keep = np.flatnonzero((listings > 0) | (previous > 0))
+    snapshot_of, host_of = np.divmod(keep, max(n_hosts, 1))
+    first = snapshot_of == 0
+    dates = pd.to_datetime(pd.Series([df["date"].iloc[0] if "date" in df.columns and len(df) else pd.NaT
+                                      for df in snapshots], dtype="object"))
+
+    def flow(values):
+        return pd.arrays.IntegerArray(values[keep].astype(np.int32), mask=first)
+
+    portfolios = pd.DataFrame({
+        "host_id": host_ids[host_of],
+        "quarter": np.asarray(quarters, dtype=object)[snapshot_of],
+        "date": dates.to_numpy()[snapshot_of],
+        "listings": listings[keep],
+        "entire_home_share": entire_share[keep],
+        "mean_price": mean_price[keep],
+        "revenue_proxy": np.bincount(cell, weights=revenue, minlength=n_cells)[keep],
+        "listings_entered": flow(flows[0]),
+        "listings_exited": flow(flows[1]),
+        "listings_switched_in": flow(flows[2]),
+        "listings_switched_out": flow(flows[3]),
+        "host_entered": pd.arrays.BooleanArray((listings[keep] > 0) & (previous[keep] == 0), mask=first),
+        "host_exited": pd.arrays.BooleanArray((listings[keep] == 0) & (previous[keep] > 0), mask=first),
+    })
+
+    mix_cell, mix_room = np.nonzero(rooms)
+    mix_snapshot, mix_host = np.divmod(mix_cell, max(n_hosts, 1))
+    room_mix = pd.DataFrame({
+        "host_id": host_ids[mix_host],
+        "quarter": np.asarray(quarters, dtype=object)[mix_snapshot],
+        "room_type": pd.Categorical.from_codes(mix_room, room_type.cat.categories),
+        "listings": rooms[mix_cell, mix_room],
+    })
+    return (apply_schema(portfolios[HOST_PORTFOLIO_COLUMNS]),
+            apply_schema(room_mix[HOST_ROOM_MIX_COLUMNS]))
+
+
+def load_host_panel(processed_data_path: str):
+    """Portfolio and room-mix tables written by ``main``."""
+    return (artifacts.consume(dataset_path(processed_data_path, PORTFOLIOS_NAME)),
+            artifacts.consume(dataset_path(processed_data_path, ROOM_MIX_NAME)))
+
+
+def main():
+    """Build the host panel from the cleaned quarters and store it next to them."""
+    current_path = os.getcwd()
+    project_path = current_path.replace("/src/pipeline", "")
+    processed_data_path = os.path.join(project_path, "data", "processed")
+
+    data_files = artifacts.list_datasets(processed_data_path, "listings_quarter")
+    if not data_files:
+        raise ValueError("No processed data files found. Run clean_data.py first.")
+
+    print(f"Building host panel from {len(data_files)} quarters...")
+    snapshots = [artifacts.consume(f, columns=INPUT_COLUMNS) for f in data_files]
+    portfolios, room_mix = build_host_panel(snapshots)
+    artifacts.publish(portfolios, dataset_path(processed_data_path, PORTFOLIOS_NAME), HOST_PORTFOLIO_SCHEMA)
+    artifacts.publish(room_mix, dataset_path(processed_data_path, ROOM_MIX_NAME), HOST_ROOM_MIX_SCHEMA)
+    artifacts.flush()
+    profiling.count_rows(rows_in=sum(len(s) for s in snapshots), rows_out=len(portfolios))
+    print(f"Saved host panel ({portfolios['host_id'].nunique()} hosts, {len(portfolios)} host-quarters) "
+          f"to {processed_data_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Memory-mapped listing x snapshot panel.
+
+The joint dataset is long format (one row per listing and quarter), so
+following one listing or host across quarters means scanning every row. The
+panel store keeps the same data as dense arrays instead: a sorted ``ids``
+vector and, per field, an ``(n_ids, n_snapshots)`` array whose row ``i`` is
+the trajectory of ``ids[i]`` (NaN where the listing is missing in a
+snapshot). Each array is a ``.npy`` file, so ``PanelStore.open`` maps them
+without reading or copying, and looking up many ids is one ``searchsorted``.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline import profiling
+from pipeline.schema import order_quarters
+
+PANEL_DIR = "panel"
+PANEL_FIELDS = [
+    "price", "availability_365", "number_of_reviews", "reviews_per_month",
+    "minimum_nights", "calculated_host_listings_count",
+]
+MISSING_HOST = -1
+
+
+class PanelStore:
+    """
+    Dense per-listing trajectories.
+
+    Attributes:
+        ids: sorted listing ids, one per panel row
+        snapshots: snapshot labels (e.g. quarters), one per panel column
+        fields: field name -> ``(n_ids, n_snapshots)`` float32 array
+        host_ids: host of each listing (``MISSING_HOST`` if unknown)
+        host_order: permutation of the rows that sorts them by host
+    """
+
+    def __init__(self, ids, snapshots, fields, host_ids, host_order=None):
+        self.ids = ids
+        self.snapshots = list(snapshots)
+        self.fields = fields
+        self.host_ids = host_ids
+        self.host_order = np.argsort(host_ids, kind="stable") if host_order is None else host_order
+        self._sorted_hosts = None  # built on the first host lookup
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def open(cls, directory: str, mmap_mode: str = "r") -> "PanelStore":
+        """Open a store written by ``save`` with its arrays memory-mapped (no copy)."""
+        with open(os.path.join(directory, "panel.json")) as f:
+            meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        fields = {field: load(field) for field in meta["fields"]}
+        return cls(load("ids"), meta["snapshots"], fields, load("host_ids"), load("host_order"))
+
+    def save(self, directory: str):
+        """Write every array as its own ``.npy`` file plus a JSON descriptor."""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {"ids": self.ids, "host_ids": self.host_ids, "host_order": self.host_order, **self.fields}
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(directory, "panel.json"), "w") as f:
+            json.dump({"snapshots": self.snapshots, "fields": list(self.fields)}, f, indent=2)
+
+    def _field(self, field: str) -> np.ndarray:
+        if field not in self.fields:
+            raise KeyError(f"Panel has no field '{field}'; available: {list(self.fields)}")
+        return self.fields[field]
+
+    def rows(self, ids) -> np.ndarray:
+        """Panel row of each id, or -1 for ids that are not in the panel."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(len(ids), -1)
+        positions = np.searchsorted(self.ids, ids)
+        clipped = np.minimum(positions, len(self.ids) - 1)
+        found = (positions < len(self.ids)) & (self.ids[clipped] == ids)
+        return np.where(found, positions, -1)
+
+    def get(self, field: str, ids) -> np.ndarray:
+        """``(len(ids), n_snapshots)`` trajectories of ``field``; all-NaN rows for unknown ids."""
+        values = self._field(field)
+        rows = self.rows(ids)
+        out = values[np.maximum(rows, 0)]
+        out[rows < 0] = np.nan
+        return out
+
+    def series(self, listing_id) -> pd.DataFrame:
+        """All fields of one listing, one row per snapshot."""
+        row = self.rows([listing_id])[0]
+        if row < 0:
+            raise KeyError(f"Listing {listing_id} is not in the panel")
+        return pd.DataFrame({field: values[row] for field, values in self.fields.items()},
+                            index=pd.Index(self.snapshots, name="quarter"))
+
+    def frame(self, field: str, ids=None) -> pd.DataFrame:
+        """Wide DataFrame (listing x snapshot) of ``field`` for ``ids`` (all listings if None)."""
+        values = self._field(field) if ids is None else self.get(field, ids)
+        index = self.ids if ids is None else np.asarray(ids, dtype=np.int64)
+        return pd.DataFrame(np.asarray(values), index=pd.Index(index, name="id"), columns=self.snapshots)
+
+    def changes(self, field: str, periods: int = 1, pct: bool = False) -> np.ndarray:
+        """
+        Snapshot-over-snapshot change of ``field`` for the whole panel, as an
+        ``(n_ids, n_snapshots - periods)`` array (relative change if ``pct``).
+        """
+        values = self._field(field)
+        before, after = values[:, :-periods], values[:, periods:]
+        if not pct:
+            return after - before
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (after - before) / before
+
+    def host_listings(self, host_id) -> np.ndarray:
+        """Ids of the listings of ``host_id`` (empty if unknown)."""
+        if self._sorted_hosts is None:
+            self._sorted_hosts = self.host_ids[self.host_order]
+        start = np.searchsorted(self._sorted_hosts, host_id, side="left")
+        stop = np.searchsorted(self._sorted_hosts, host_id, side="right")
+        return np.sort(self.ids[self.host_order[start:stop]])
+
+    def host_panel(self, field: str, host_id) -> pd.DataFrame:
+        """Trajectories of ``field`` for every listing of ``host_id``."""
+        return self.frame(field, self.host_listings(host_id))
+
+    def append(self, snapshot: str, df: pd.DataFrame) -> "PanelStore":
+        """
+        Store with one more snapshot, the rows of ``df`` (one per listing):
+        listings missing from ``df`` leave the panel, listings that are not in
+        the panel yet are not added (the panel stays balanced). Hosts are
+        taken from the new snapshot where known, as ``build_panel`` would.
+        """
+        new_ids = df["id"].to_numpy(dtype=np.int64)
+        ids = np.intersect1d(self.ids, new_ids)
+        rows = self.rows(ids)
+        order = np.argsort(new_ids, kind="stable")
+        new_rows = order[np.searchsorted(new_ids, ids, side="right", sorter=order) - 1]  # last row wins
+
+        fields = {}
+        for field, values in self.fields.items():
+            column = df[field].to_numpy(dtype=np.float32, na_value=np.nan)[new_rows] if field in df.columns \
+                else np.full(len(ids), np.nan, dtype=np.float32)
+            fields[field] = np.column_stack([values[rows], column])
+
+        host_ids = np.asarray(self.host_ids)[rows]
+        if "host_id" in df.columns:
+            known = df["host_id"].notna().to_numpy()[new_rows]
+            host_ids[known] = df["host_id"].to_numpy(dtype=np.int64, na_value=MISSING_HOST)[new_rows][known]
+        return PanelStore(ids, self.snapshots + [str(snapshot)], fields, host_ids)
+
+
+@profiling.profiled
+def build_panel(df: pd.DataFrame, fields: list = PANEL_FIELDS, snapshot_col: str = "quarter") -> PanelStore:
+    """
+    Pivot a long-format (listing, snapshot) DataFrame into a ``PanelStore``.
+
+    Snapshots are ordered naturally (Q1, Q2, ..., Q10); if a listing appears
+    more than once in a snapshot its last row wins.
+    """
+    snapshots = pd.Categorical(order_quarters(df[snapshot_col])).remove_unused_categories()
+    ids, rows = np.unique(df["id"].to_numpy(dtype=np.int64), return_inverse=True)
+    columns = snapshots.codes
+
+    arrays = {}
+    for field in [f for f in fields if f in df.columns]:
+        values = np.full((len(ids), len(snapshots.categories)), np.nan, dtype=np.float32)
+        values[rows, columns] = df[field].to_numpy(dtype=np.float32, na_value=np.nan)
+        arrays[field] = values
+
+    host_ids = np.full(len(ids), MISSING_HOST, dtype=np.int64)
+    if "host_id" in df.columns:
+        known = df["host_id"].notna().to_numpy()
+        host_ids[rows[known]] = df["host_id"][known].to_numpy(dtype=np.int64)
+
+    return PanelStore(ids, [str(s) for s in snapshots.categories], arrays, host_ids)
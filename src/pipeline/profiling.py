@@ -0,0 +1,288 @@
+"""
+Opt-in instrumentation of pipeline stages and their main steps.
+
+Profiling is switched on by pointing ``PIPELINE_PROFILE_DIR`` at a directory
+(``run_analysis.py --profile`` does this). Stages (``stage``) and decorated
+steps (``profiled``) then record wall and CPU time, peak RSS (polled while
+the stage or step runs), bytes read and written (a stage's own pending
+artifact writes included) and rows in/out. Each process appends its records
+to its own JSON Lines file in that directory, so steps that run in worker
+processes (the parallel cleaning, the competitor features, ...) are captured
+as well;
+``build_report`` gathers them into one run report. With ``PIPELINE_CPROFILE``
+set, every stage is also run under cProfile and dumped as ``<stage>.prof``.
+
+When profiling is off, ``stage`` and ``profiled`` only check the environment.
+"""
+
+import cProfile
+import functools
+import glob
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_DIR_ENV = "PIPELINE_PROFILE_DIR"
+CPROFILE_ENV = "PIPELINE_CPROFILE"
+STAGE_ENV = "PIPELINE_PROFILE_STAGE"  # inherited by worker processes of a stage
+RSS_SAMPLE_S = 0.01  # how often a measurement polls the resident set size
+
+_current_stage = None
+
+
+def enabled() -> bool:
+    return bool(os.environ.get(PROFILE_DIR_ENV))
+
+
+def _io_bytes():
+    """(bytes read, bytes written) by this process so far, if the OS reports them."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _cpu_seconds(who) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _max_rss_kib(who) -> int:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss >> 10 if os.uname().sysname == "Darwin" else maxrss
+
+
+def _rss_kib():
+    """Current resident set size of this process, if the OS reports it."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class _RssSampler(threading.Thread):
+    """Polls the resident set size until stopped, keeping the largest value seen."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak_kib = _rss_kib()
+        self._done = threading.Event()
+        if self.peak_kib is not None:
+            self.start()
+
+    def run(self):
+        while not self._done.wait(RSS_SAMPLE_S):
+            self.peak_kib = max(self.peak_kib, _rss_kib() or 0)
+
+    def stop(self):
+        self._done.set()
+        if self.is_alive():
+            self.join()
+        if self.peak_kib is not None:
+            self.peak_kib = max(self.peak_kib, _rss_kib() or 0)
+        return self.peak_kib
+
+
+def _mib(kib) -> float:
+    return None if kib is None else round(kib / 1024, 1)
+
+
+def _rows(obj):
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]  # (frame, extras...) results such as a CleaningResult
+    return len(obj) if hasattr(obj, "columns") else None
+
+
+class Measurement:
+    """Resource usage of one stage or step, from construction to ``finish``."""
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.stage = os.environ.get(STAGE_ENV)
+        self.rows_in = None
+        self.rows_out = None
+        self.import_s = None
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_seconds(resource.RUSAGE_SELF)
+        self._cpu_children = _cpu_seconds(resource.RUSAGE_CHILDREN)
+        self._io = _io_bytes()
+        # ru_maxrss is the peak over the process's lifetime (and over all joined
+        # children): it only describes this measurement if it grew during it
+        self._max_rss = _max_rss_kib(resource.RUSAGE_SELF)
+        self._max_rss_children = _max_rss_kib(resource.RUSAGE_CHILDREN)
+        self._rss = _RssSampler()
+        self.record = None
+
+    def _peak_rss_kib(self) -> int:
+        sampled = self._rss.stop()
+        max_rss = _max_rss_kib(resource.RUSAGE_SELF)
+        if max_rss > self._max_rss or sampled is None:
+            return max_rss  # a new lifetime peak (or no way to sample): exact
+        return sampled
+
+    def finish(self) -> dict:
+        read, written = _io_bytes()
+        peak_rss = self._peak_rss_kib()
+        max_rss_children = _max_rss_kib(resource.RUSAGE_CHILDREN)
+        self.record = {
+            "kind": self.kind,
+            "name": self.name,
+            "stage": self.stage,
+            "pid": os.getpid(),
+            "started": time.time() - (time.perf_counter() - self._wall),
+            "wall_s": round(time.perf_counter() - self._wall, 4),
+            "cpu_s": round(_cpu_seconds(resource.RUSAGE_SELF) - self._cpu, 4),
+            # worker processes of this stage/step that have been joined
+            "cpu_children_s": round(_cpu_seconds(resource.RUSAGE_CHILDREN) - self._cpu_children, 4),
+            "peak_rss_mb": _mib(peak_rss),
+            # largest joined worker, when one of this stage/step's workers set a new peak
+            "peak_rss_children_mb": _mib(max_rss_children)
+            if max_rss_children > self._max_rss_children else None,
+            "bytes_read": None if read is None else read - self._io[0],
+            "bytes_written": None if written is None else written - self._io[1],
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "import_s": self.import_s,
+        }
+        return self.record
+
+
+def _write(record: dict):
+    directory = os.environ[PROFILE_DIR_ENV]
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"records-{os.getpid()}.jsonl"), "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def stage(name: str):
+    """Measure one pipeline stage (yields None when profiling is off)."""
+    global _current_stage
+    if not enabled():
+        yield None
+        return
+    from pipeline import artifacts  # only when profiling; keeps startup light
+    artifacts.flush()  # writes published before the stage are not its I/O
+    os.environ[STAGE_ENV] = name
+    measurement = _current_stage = Measurement("stage", name)
+    profiler = cProfile.Profile() if os.environ.get(CPROFILE_ENV) else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield measurement
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(os.environ[PROFILE_DIR_ENV], f"{name}.prof"))
+        try:
+            artifacts.flush()  # the stage's own writes, before its I/O is taken
+        finally:
+            _write(measurement.finish())
+        _current_stage = None
+        os.environ.pop(STAGE_ENV, None)
+
+
+@contextmanager
+def step(name: str):
+    """Measure one step inside a stage (yields None when profiling is off)."""
+    if not enabled():
+        yield None
+        return
+    measurement = Measurement("step", name)
+    try:
+        yield measurement
+    finally:
+        _write(measurement.finish())
+
+
+def profiled(func=None, *, name: str = None):
+    """
+    Decorator measuring each call of ``func`` as a step. Rows in/out are taken
+    from the first argument and the return value when they are DataFrames.
+    """
+    if func is None:
+        return functools.partial(profiled, name=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled():
+            return func(*args, **kwargs)
+        with step(name or func.__name__) as measurement:
+            measurement.rows_in = _rows(args[0]) if args else None
+            result = func(*args, **kwargs)
+            measurement.rows_out = _rows(result)
+            return result
+    return wrapper
+
+
+def count_rows(rows_in: int = None, rows_out: int = None):
+    """Attach row counts to the stage running in this process (no-op otherwise)."""
+    if _current_stage is None:
+        return
+    if rows_in is not None:
+        _current_stage.rows_in = int(rows_in)
+    if rows_out is not None:
+        _current_stage.rows_out = int(rows_out)
+
+
+def collect(directory: str) -> list:
+    """All records written to ``directory``, in start order."""
+    records = []
+    for path in glob.glob(os.path.join(directory, "records-*.jsonl")):
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda r: r["started"])
+
+
+def compare(current: dict, previous: dict) -> dict:
+    """Per-stage change in wall time, CPU time and peak RSS between two reports."""
+    before = {s["name"]: s for s in previous.get("stages", [])}
+    changes = {}
+    for stage_record in current["stages"]:
+        old = before.get(stage_record["name"])
+        if old is None:
+            continue
+        changes[stage_record["name"]] = {
+            metric: {
+                "previous": old.get(metric),
+                "current": stage_record.get(metric),
+                # None when either run could not measure it (e.g. no RSS on this OS)
+                "change_pct": round(100 * (stage_record[metric] - old[metric]) / old[metric], 1)
+                if old.get(metric) and stage_record.get(metric) is not None else None,
+            }
+            for metric in ("wall_s", "cpu_s", "peak_rss_mb")
+        }
+    return changes
+
+
+def build_report(directory: str, status: dict, wall_s: float, previous: dict = None) -> dict:
+    """
+    Run report: per-stage records with their steps nested, the pipeline
+    status and, given the previous report, the change of every stage.
+    """
+    records = collect(directory)
+    stages = [r for r in records if r["kind"] == "stage"]
+    for stage_record in stages:
+        stage_record["steps"] = [r for r in records
+                                 if r["kind"] == "step" and r["stage"] == stage_record["name"]]
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "wall_s": round(wall_s, 4),
+        "status": status,
+        "stages": stages,
+        "profiles": sorted(glob.glob(os.path.join(directory, "*.prof"))),
+    }
+    if previous:
+        report["changes"] = compare(report, previous)
+    return report
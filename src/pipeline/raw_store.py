@@ -0,0 +1,203 @@
+"""
+Compressed, content-addressed store of raw snapshots.
+
+Raw snapshots are kept as compressed blobs named by the SHA-256 of their
+uncompressed content (``data/raw/blobs/ab/abcd....csv.gz``), and a manifest
+(``data/raw/raw_manifest.json``) maps each city and snapshot date to its
+blob. Identical downloads (the same file fetched twice, or two snapshots
+that did not change) are stored once. Blobs are gzip, or zstd when the
+optional ``zstandard`` package is installed; both are read by streaming
+decompression (``pandas.read_csv`` infers the codec from the extension), so
+the cleaning stage sees exactly the CSV it used to.
+
+Plain ``listings_<date>.csv`` files from before the store still work: they
+are listed for the dates the manifest does not know, and ``main`` moves them
+into the store.
+"""
+
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import threading
+
+CITY = "boston"
+MANIFEST_NAME = "raw_manifest.json"
+BLOB_DIR = "blobs"
+LEGACY_PATTERN = re.compile(r"^listings_(?P<date>\d{4}-\d{2}-\d{2})\.csv(\.gz)?$")
+CHUNK_SIZE = 1 << 20
+
+
+def _open_zstd(path: str, mode: str):
+    import zstandard
+
+    return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=10))
+
+
+# codec -> (blob extension, opener)
+CODECS = {
+    "gzip": (".csv.gz", lambda path, mode: gzip.GzipFile(path, mode, compresslevel=6, mtime=0)),
+    "zstd": (".csv.zst", _open_zstd),
+}
+DEFAULT_CODEC = "zstd" if importlib.util.find_spec("zstandard") else "gzip"
+
+
+class RawStore:
+    """Raw snapshots of one directory: compressed blobs plus the manifest."""
+
+    def __init__(self, directory: str, codec: str = DEFAULT_CODEC):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'; available: {sorted(CODECS)}")
+        self.directory = directory
+        self.codec = codec
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()  # downloads finish on several threads
+        self._entries = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self._entries = json.load(f)
+
+    def _save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _blob_path(self, digest: str, codec: str) -> str:
+        return os.path.join(self.directory, BLOB_DIR, digest[:2], digest + CODECS[codec][0])
+
+    def entry(self, date: str, city: str = CITY) -> dict:
+        """Manifest entry of a snapshot (content hash, blob, sizes), or None."""
+        with self._lock:
+            entry = self._entries.get(city, {}).get(date)
+            return dict(entry) if entry else None
+
+    def has(self, date: str, city: str = CITY) -> bool:
+        return self.entry(date, city) is not None
+
+    def put(self, date: str, source: str, city: str = CITY) -> dict:
+        """
+        Store the uncompressed file ``source`` as the snapshot of ``city`` on
+        ``date``. The file is hashed and compressed in one streaming pass; if
+        a blob with the same content exists, the new copy is dropped.
+
+        Returns:
+            dict: the manifest entry, with ``deduplicated`` set for known content
+        """
+        digest = hashlib.sha256()
+        extension, opener = CODECS[self.codec]
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".{city}_{date}{extension}.tmp")
+        size = 0
+        with open(source, "rb") as src, opener(tmp_path, "wb") as dst:
+            for block in iter(lambda: src.read(CHUNK_SIZE), b""):
+                digest.update(block)
+                dst.write(block)
+                size += len(block)
+        digest = digest.hexdigest()
+
+        blob = self._existing_blob(digest)
+        deduplicated = blob is not None
+        if deduplicated:
+            os.remove(tmp_path)
+        else:
+            blob = self._blob_path(digest, self.codec)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(tmp_path, blob)
+
+        entry = {
+            "sha256": digest,
+            "blob": os.path.relpath(blob, self.directory),
+            "bytes": size,
+            "stored_bytes": os.path.getsize(blob),
+        }
+        with self._lock:
+            self._entries.setdefault(city, {})[date] = entry
+            self._save()
+        return {**entry, "deduplicated": deduplicated}
+
+    def _existing_blob(self, digest: str):
+        for codec in CODECS:
+            path = self._blob_path(digest, codec)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def path(self, date: str, city: str = CITY) -> str:
+        """Compressed blob of a snapshot (readable with ``read_raw_listings``)."""
+        entry = self.entry(date, city)
+        if entry is None:
+            raise KeyError(f"No raw snapshot for {city} on {date}")
+        return os.path.join(self.directory, entry["blob"])
+
+    def open(self, date: str, city: str = CITY):
+        """Binary stream of a snapshot's uncompressed CSV."""
+        path = self.path(date, city)
+        codec = next(c for c, (extension, _) in CODECS.items() if path.endswith(extension))
+        return CODECS[codec][1](path, "rb")
+
+    def snapshots(self, city: str = CITY) -> list:
+        """(date, blob path) pairs of a city, sorted by date."""
+        with self._lock:
+            dates = sorted(self._entries.get(city, {}))
+        return [(date, self.path(date, city)) for date in dates]
+
+    def legacy_files(self) -> list:
+        """(date, path) pairs of plain ``listings_<date>.csv[.gz]`` files in the directory."""
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for fname in os.listdir(self.directory):
+            match = LEGACY_PATTERN.match(fname)
+            if match:
+                files.append((match.group("date"), os.path.join(self.directory, fname)))
+        return sorted(files)
+
+    def stats(self) -> dict:
+        """Raw bytes referenced by the manifest against bytes stored in blobs."""
+        with self._lock:
+            entries = [e for city in self._entries.values() for e in city.values()]
+        blobs = {e["blob"]: e["stored_bytes"] for e in entries}
+        return {"snapshots": len(entries), "blobs": len(blobs),
+                "raw_bytes": sum(e["bytes"] for e in entries), "stored_bytes": sum(blobs.values())}
+
+
+def discover_snapshots(raw_data_path: str, city: str = CITY) -> list:
+    """
+    (date, path) of every raw snapshot of ``city``, sorted by date: blobs of
+    the store, and legacy plain files for the dates the store lacks.
+    """
+    store = RawStore(raw_data_path)
+    snapshots = dict(store.snapshots(city))
+    for date, path in store.legacy_files():
+        snapshots.setdefault(date, path)
+    return sorted(snapshots.items())
+
+
+def main(remove_legacy=False):
+    """Move the plain ``listings_<date>.csv`` files in ``data/raw`` into the store."""
+    current_path = os.getcwd()
+    project_path = current_path.replace("/src/pipeline", "")
+    raw_data_path = os.path.join(project_path, "data", "raw")
+
+    store = RawStore(raw_data_path)
+    for date, path in store.legacy_files():
+        # compressed legacy files are read as they are; blobs hold uncompressed content
+        if store.has(date) or path.endswith(".gz"):
+            continue
+        entry = store.put(date, path)
+        print(f"Stored {os.path.basename(path)} as {entry['blob']} "
+              f"({entry['bytes']:,} -> {entry['stored_bytes']:,} bytes"
+              f"{', duplicate content' if entry['deduplicated'] else ''})")
+        if remove_legacy:
+            os.remove(path)
+    stats = store.stats()
+    print(f"Raw store: {stats['snapshots']} snapshots in {stats['blobs']} blobs, "
+          f"{stats['raw_bytes']:,} -> {stats['stored_bytes']:,} bytes")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
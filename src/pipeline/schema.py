@@ -0,0 +1,211 @@
+"""
+Central column registry.
+
+Declares the compact dtype of every column the pipeline reads or writes, both
+as a pandas dtype (what readers hand to the analysis code) and as the Arrow
+type it is stored with. Every reader and writer goes through this module:
+``storage`` builds its Parquet schemas from it and applies it when loading,
+and the raw CSV reader uses it to parse labels straight into categories.
+
+Consumers of a dataset declare the columns they read with ``uses``; stages
+load only ``required_columns`` of their consumers.
+"""
+
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import union_categoricals
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# column -> (pandas dtype, arrow type)
+COLUMNS = {
+    # raw / cleaned listing columns
+    "id": ("Int64", pa.int64()),
+    "name": ("string[pyarrow]", pa.string()),
+    "host_id": ("Int64", pa.int64()),
+    "host_name": ("string[pyarrow]", pa.string()),
+    "neighbourhood_group": ("category", _CATEGORY),
+    "neighbourhood": ("category", _CATEGORY),
+    "latitude": ("float64", pa.float64()),    # float32 would cost ~0.5 m of precision
+    "longitude": ("float64", pa.float64()),
+    "room_type": ("category", _CATEGORY),
+    "price": ("float32", pa.float32()),
+    "minimum_nights": ("int32", pa.int32()),
+    "number_of_reviews": ("Int32", pa.int32()),
+    "last_review": ("datetime64[ns]", pa.date32()),
+    "reviews_per_month": ("float32", pa.float32()),
+    "calculated_host_listings_count": ("Int32", pa.int32()),
+    "availability_365": ("int32", pa.int32()),
+    "number_of_reviews_ltm": ("Int32", pa.int32()),
+    "license": ("string[pyarrow]", pa.string()),
+    "date": ("datetime64[ns]", pa.date32()),
+    # joint dataset
+    "quarter": ("category", _CATEGORY),
+    "log_price": ("float32", pa.float32()),
+    "price_category": ("category", _CATEGORY),
+    "availability_rate": ("float32", pa.float32()),
+    "is_highly_available": ("bool", pa.bool_()),
+    "quarter_num": ("int16", pa.int16()),
+    "is_peak_season": ("bool", pa.bool_()),
+    "neighborhood_avg_price": ("float32", pa.float32()),
+    "neighborhood_median_price": ("float32", pa.float32()),
+    "neighborhood_count": ("Int32", pa.int32()),
+    "price_premium_pct": ("float32", pa.float32()),
+    "competitor_count": ("int32", pa.int32()),
+    "competitor_median_price": ("float32", pa.float32()),
+    "knn_room_median_price": ("float32", pa.float32()),
+    "knn_room_distance_m": ("float32", pa.float32()),
+    # host panel
+    "listings": ("int32", pa.int32()),
+    "entire_home_share": ("float32", pa.float32()),
+    "mean_price": ("float32", pa.float32()),
+    "revenue_proxy": ("float32", pa.float32()),
+    "listings_entered": ("Int32", pa.int32()),     # flows are missing in the first quarter
+    "listings_exited": ("Int32", pa.int32()),
+    "listings_switched_in": ("Int32", pa.int32()),
+    "listings_switched_out": ("Int32", pa.int32()),
+    "host_entered": ("boolean", pa.bool_()),
+    "host_exited": ("boolean", pa.bool_()),
+}
+
+RAW_COLUMNS = [
+    "id", "name", "host_id", "host_name", "neighbourhood_group", "neighbourhood",
+    "latitude", "longitude", "room_type", "price", "minimum_nights",
+    "number_of_reviews", "last_review", "reviews_per_month",
+    "calculated_host_listings_count", "availability_365",
+    "number_of_reviews_ltm", "license",
+]
+
+CLEAN_COLUMNS = [c for c in RAW_COLUMNS if c not in ("neighbourhood_group", "license")] + ["date"]
+
+JOINT_COLUMNS = CLEAN_COLUMNS + [
+    "quarter", "log_price", "price_category", "availability_rate",
+    "is_highly_available", "quarter_num", "is_peak_season",
+    "neighborhood_avg_price", "neighborhood_median_price",
+    "neighborhood_count", "price_premium_pct",
+    "competitor_count", "competitor_median_price",
+    "knn_room_median_price", "knn_room_distance_m",
+]
+
+HOST_PORTFOLIO_COLUMNS = [
+    "host_id", "quarter", "date", "listings", "entire_home_share", "mean_price", "revenue_proxy",
+    "listings_entered", "listings_exited", "listings_switched_in", "listings_switched_out",
+    "host_entered", "host_exited",
+]
+
+HOST_ROOM_MIX_COLUMNS = ["host_id", "quarter", "room_type", "listings"]
+
+# Raw columns that can be parsed into their final dtype by read_csv itself;
+# numeric columns are coerced by the cleaning step, which tolerates bad values.
+RAW_READ_DTYPES = {
+    c: COLUMNS[c][0] for c in RAW_COLUMNS
+    if COLUMNS[c][0] in ("category", "string[pyarrow]")
+}
+
+
+def arrow_schema(columns: list) -> pa.Schema:
+    """Arrow schema of the registered ``columns``, in that order."""
+    return pa.schema([(c, COLUMNS[c][1]) for c in columns])
+
+
+CLEAN_LISTINGS_SCHEMA = arrow_schema(CLEAN_COLUMNS)
+# room_type_* indicator columns depend on the data and are typed on the fly
+JOINT_SCHEMA = arrow_schema(JOINT_COLUMNS)
+HOST_PORTFOLIO_SCHEMA = arrow_schema(HOST_PORTFOLIO_COLUMNS)
+HOST_ROOM_MIX_SCHEMA = arrow_schema(HOST_ROOM_MIX_COLUMNS)
+
+
+def uses(*columns):
+    """
+    Declare the columns a consumer reads from the DataFrame it is given (its
+    first argument). The consumer is handed only those columns, so reading an
+    undeclared one raises ``KeyError`` on the spot instead of depending on
+    what its stage happened to load. Declared columns the frame lacks are
+    left out (consumers may treat them as optional); other first arguments
+    (cubes, streaming states) are passed through.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(df, *args, **kwargs):
+            if isinstance(df, pd.DataFrame):
+                df = project(df, columns)
+            return func(df, *args, **kwargs)
+        wrapper.columns = list(columns)
+        return wrapper
+    return decorator
+
+
+def project(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """
+    The ``columns`` of ``df`` that it has, in frame order, sharing their data
+    with ``df`` (``df[columns]`` would copy them).
+    """
+    declared = set(columns)
+    keep = [c for c in df.columns if c in declared]
+    if len(keep) == len(df.columns):
+        return df
+    return pd.DataFrame({c: df[c] for c in keep}, index=df.index, columns=keep, copy=False)
+
+
+def required_columns(*consumers) -> list:
+    """Union of the columns declared with ``uses`` by ``consumers``, in declaration order."""
+    undeclared = [getattr(c, "__name__", repr(c)) for c in consumers if not hasattr(c, "columns")]
+    if undeclared:
+        raise ValueError(f"Consumers {undeclared} do not declare their columns (see schema.uses)")
+    return list(dict.fromkeys(c for consumer in consumers for c in consumer.columns))
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the registered columns of ``df`` to their compact dtypes, in place.
+    Unregistered columns are left alone. Returns ``df`` for chaining.
+    """
+    for col in df.columns.intersection(list(COLUMNS)):
+        dtype = COLUMNS[col][0]
+        # compare dtypes, not their names: str() of a pyarrow string dtype is "string"
+        if df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    if "quarter" in df.columns:
+        df["quarter"] = order_quarters(df["quarter"])
+    return df
+
+
+def natural_key(label) -> list:
+    """Sort key treating digit runs as numbers (Q2 < Q10)."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", str(label))]
+
+
+def order_quarters(quarter: pd.Series) -> pd.Series:
+    """Quarter labels as a category ordered Q1, Q2, ..., Q10 (not Q1, Q10, Q2)."""
+    quarter = quarter.astype("category")
+    categories = sorted(quarter.cat.categories, key=natural_key)
+    return quarter.cat.reorder_categories(categories)
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    """
+    Concatenate frames without losing categorical dtypes: categories (and
+    whether they are ordered) are unified first, since pandas falls back to
+    object when they differ between frames.
+    """
+    frames = [f.copy(deep=False) for f in frames]
+    if not frames:
+        return pd.DataFrame()
+    for col in frames[0].columns:
+        if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames if col in f):
+            columns = [f[col] for f in frames if col in f]
+            categories = union_categoricals(columns, ignore_order=True).categories
+            ordered = all(c.cat.ordered for c in columns)
+            for f in frames:
+                if col in f:
+                    f[col] = f[col].cat.set_categories(categories, ordered=ordered)
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """Deep memory footprint of a frame in MiB."""
+    return float(np.sum(df.memory_usage(deep=True))) / 2**20
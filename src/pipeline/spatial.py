@@ -0,0 +1,141 @@
+"""
+Competitor features from listing coordinates.
+
+For every listing and quarter we describe its local competition: how many
+other listings lie within ``radius_m`` metres and their median price, and
+the prices of the ``k`` nearest listings of the same room type. Coordinates
+are projected to metres (equirectangular around the city's mean latitude,
+whose distortion is negligible at city scale) and indexed with a KD-tree,
+so each quarter costs O(n log n) plus the size of the neighbourhoods rather
+than O(n^2) pairwise distances. Quarters are independent and are computed
+in parallel processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from pipeline import profiling
+
+EARTH_RADIUS_M = 6_371_008.8
+COMPETITOR_RADIUS_M = 500
+K_NEAREST = 5
+COMPETITOR_COLUMNS = [
+    "competitor_count", "competitor_median_price",
+    "knn_room_median_price", "knn_room_distance_m",
+]
+
+
+def project(latitude, longitude, reference_latitude: float = None) -> np.ndarray:
+    """``(n, 2)`` x/y positions in metres of the given coordinates."""
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    ref = np.radians(reference_latitude) if reference_latitude is not None else np.nanmean(lat)
+    return np.column_stack([EARTH_RADIUS_M * lon * np.cos(ref), EARTH_RADIUS_M * lat])
+
+
+def group_medians(groups: np.ndarray, ranks: np.ndarray, unique_values: np.ndarray,
+                  n_groups: int) -> np.ndarray:
+    """
+    Median per group id in ``groups`` of the values ``unique_values[ranks]``
+    (NaN for empty groups), from one integer sort of (group, rank) keys
+    instead of a median call per group.
+    """
+    medians = np.full(n_groups, np.nan)
+    if not len(ranks):
+        return medians
+    keys = np.sort(groups.astype(np.int64) * len(unique_values) + ranks)
+    ordered = unique_values[keys % len(unique_values)]
+    lengths = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(lengths) - lengths
+    nonempty = lengths > 0
+    lo = (starts + (lengths - 1) // 2)[nonempty]
+    hi = (starts + lengths // 2)[nonempty]
+    medians[nonempty] = (ordered[lo] + ordered[hi]) / 2
+    return medians
+
+
+def radius_features(xy: np.ndarray, price: np.ndarray, radius_m: float):
+    """Count and median price of the other listings within ``radius_m`` of each one."""
+    # each pair (i < j) within the radius once, as an array (no per-listing lists)
+    pairs = cKDTree(xy).query_pairs(radius_m, output_type="ndarray")
+    owners = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    others = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    counts = np.bincount(owners, minlength=len(xy))
+    unique_prices, price_ranks = np.unique(price, return_inverse=True)
+    return counts, group_medians(owners, price_ranks[others], unique_prices, len(xy))
+
+
+def knn_features(xy: np.ndarray, price: np.ndarray, room_type: np.ndarray, k: int):
+    """Median price and mean distance of the ``k`` nearest listings of the same room type."""
+    median_price = np.full(len(xy), np.nan)
+    mean_distance = np.full(len(xy), np.nan)
+    for room in pd.unique(room_type):
+        members = np.flatnonzero(room_type == room)
+        kk = min(k, len(members) - 1)
+        if kk < 1:
+            continue
+        # the nearest hit is the listing itself (or a co-located one: same effect)
+        distance, index = cKDTree(xy[members]).query(xy[members], k=kk + 1)
+        distance, index = distance[:, 1:], members[index[:, 1:]]
+        median_price[members] = np.median(price[index], axis=1)
+        mean_distance[members] = distance.mean(axis=1)
+    return median_price, mean_distance
+
+
+def competitor_features(df: pd.DataFrame, radius_m: float = COMPETITOR_RADIUS_M,
+                        k: int = K_NEAREST, reference_latitude: float = None) -> pd.DataFrame:
+    """
+    Competitor features of the listings of one snapshot, aligned with ``df``'s
+    index. Listings without finite coordinates are left out of the index
+    (they compete with no one) and get NaN features.
+    """
+    xy = project(df["latitude"], df["longitude"], reference_latitude)
+    located = np.isfinite(xy).all(axis=1)
+    xy = xy[located]
+    price = df["price"].to_numpy(dtype=np.float64)[located]
+    count, median = radius_features(xy, price, radius_m)
+    knn_price, knn_distance = knn_features(xy, price, df["room_type"].to_numpy()[located], k)
+    features = pd.DataFrame(np.nan, index=df.index, columns=COMPETITOR_COLUMNS)
+    features.loc[located] = np.column_stack([count, median, knn_price, knn_distance])
+    return features
+
+
+def _snapshot_job(job):
+    snapshot, radius_m, k, reference_latitude = job
+    return competitor_features(snapshot, radius_m, k, reference_latitude)
+
+
+@profiling.profiled
+def add_competitor_features(df: pd.DataFrame, radius_m: float = COMPETITOR_RADIUS_M,
+                            k: int = K_NEAREST, by: str = "quarter", workers: int = None,
+                            reference_latitude: float = None) -> pd.DataFrame:
+    """
+    Add ``COMPETITOR_COLUMNS`` to a multi-snapshot DataFrame. Competition is
+    measured within each ``by`` snapshot; snapshots run on ``workers`` processes.
+    The projection is centred on ``reference_latitude`` (default: the mean).
+    """
+    # one projection for the whole panel, so distances agree across quarters
+    if reference_latitude is None:
+        reference_latitude = float(df["latitude"].mean())
+    columns = ["latitude", "longitude", "price", "room_type"]
+    positions = list(df.groupby(by, observed=True, sort=False).indices.values())
+    jobs = [(df[columns].iloc[rows], radius_m, k, reference_latitude) for rows in positions]
+
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_snapshot_job, jobs))
+    else:
+        parts = [_snapshot_job(job) for job in jobs]
+
+    df = df.copy(deep=False)
+    for column in COMPETITOR_COLUMNS:
+        values = np.full(len(df), np.nan)
+        for rows, part in zip(positions, parts):
+            values[rows] = part[column].to_numpy()
+        df[column] = values
+    return df
@@ -0,0 +1,217 @@
+"""
+Typed columnar storage for the processed datasets.
+
+Every stage reads and writes processed data through this module instead of
+calling ``to_csv``/``read_csv`` directly. Files are Parquet with an explicit
+Arrow schema, so dtypes (dates, categories, boolean flags) survive the round
+trip, readers can project columns, and row-group statistics let filters skip
+data that cannot match.
+"""
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.schema import (  # noqa: F401  (schemas re-exported for writers)
+    CLEAN_LISTINGS_SCHEMA, JOINT_SCHEMA, RAW_READ_DTYPES, apply_schema, natural_key,
+)
+
+EXTENSION = ".parquet"
+ROW_GROUP_SIZE = 50_000
+
+# Parquet schemas are built from the column registry in pipeline/schema.py
+
+
+def dataset_path(directory: str, name: str) -> str:
+    """Path of the stored dataset ``name`` inside ``directory``."""
+    return os.path.join(directory, name + EXTENSION)
+
+
+def list_datasets(directory: str, prefix: str) -> list:
+    """Paths of the stored datasets in ``directory`` starting with ``prefix``, in natural order."""
+    names = [f for f in os.listdir(directory) if f.startswith(prefix) and f.endswith(EXTENSION)]
+    # natural order: "listings_quarter10" sorts after "listings_quarter9"
+    return [os.path.join(directory, f) for f in sorted(names, key=natural_key)]
+
+
+def _resolve_schema(table: pa.Table, schema: pa.Schema, unregistered_type: pa.DataType = None) -> pa.Schema:
+    """
+    Declared types for the columns the table actually has, in table order.
+    Columns the schema does not know keep their inferred type, or get
+    ``unregistered_type`` when one is given.
+    """
+    fields = []
+    for field in table.schema:
+        index = schema.get_field_index(field.name)
+        if index != -1:
+            fields.append(schema.field(index))
+        else:
+            fields.append(field if unregistered_type is None else field.with_type(unregistered_type))
+    return pa.schema(fields)
+
+
+def to_table(df: pd.DataFrame, schema: pa.Schema = None) -> pa.Table:
+    """Convert a DataFrame to an Arrow table cast to the declared schema."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is not None:
+        table = table.cast(_resolve_schema(table, schema))
+    return table.replace_schema_metadata(None)
+
+
+def write_dataset(df: pd.DataFrame, path: str, schema: pa.Schema = None,
+                  row_group_size: int = ROW_GROUP_SIZE):
+    """Write a DataFrame as Parquet with an explicit schema and column statistics."""
+    write_table(to_table(df, schema), path, row_group_size)
+
+
+def write_table(table: pa.Table, path: str, row_group_size: int = ROW_GROUP_SIZE):
+    """Write an Arrow table (from ``to_table``) as a stored dataset."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    pq.write_table(table, path, row_group_size=row_group_size,
+                   write_statistics=True, compression="snappy")
+
+
+def _pandas_type(arrow_type):
+    # strings stay Arrow-backed instead of becoming Python objects
+    if arrow_type in (pa.string(), pa.large_string()):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def read_dataset(path: str, columns: list = None, filters: list = None) -> pd.DataFrame:
+    """
+    Read a stored dataset with the compact dtypes of the column registry.
+
+    Args:
+        path (str): File written by ``write_dataset``.
+        columns (list): Only read these columns (None reads all).
+        filters (list): pyarrow filters, e.g. ``[("quarter", "==", "Q1")]``;
+            row groups whose statistics rule out a match are skipped.
+    """
+    return from_table(pq.read_table(path, columns=columns, filters=filters))
+
+
+def from_table(table: pa.Table) -> pd.DataFrame:
+    """The DataFrame ``read_dataset`` returns for a stored ``table``."""
+    df = table.to_pandas(date_as_object=False, types_mapper=_pandas_type)
+    return apply_schema(df)
+
+
+def iter_dataset(path: str, columns: list = None, batch_size: int = ROW_GROUP_SIZE,
+                 row_groups: list = None):
+    """
+    Yield a stored dataset as DataFrames of at most ``batch_size`` rows, so
+    consumers can process files larger than memory. ``row_groups`` restricts
+    reading to those row groups (e.g. one partition per worker).
+    """
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns,
+                                           row_groups=row_groups):
+        df = batch.to_pandas(date_as_object=False, types_mapper=_pandas_type)
+        yield apply_schema(df)
+
+
+def num_row_groups(path: str) -> int:
+    return pq.ParquetFile(path).metadata.num_row_groups
+
+
+def dataset_nbytes(path: str) -> int:
+    """Uncompressed size of a stored dataset, from its footer (no rows are read)."""
+    metadata = pq.ParquetFile(path).metadata
+    return sum(metadata.row_group(rg).total_byte_size for rg in range(metadata.num_row_groups))
+
+
+def read_schema(path: str) -> pa.Schema:
+    """Schema of a stored dataset without reading any rows."""
+    return pq.read_schema(path)
+
+
+def row_group_statistics(path: str) -> pd.DataFrame:
+    """Per row group and column: row count, null count, min and max."""
+    metadata = pq.ParquetFile(path).metadata
+    records = []
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for c in range(row_group.num_columns):
+            column = row_group.column(c)
+            stats = column.statistics
+            has_min_max = stats is not None and stats.has_min_max
+            records.append({
+                "row_group": rg,
+                "column": column.path_in_schema,
+                "num_rows": row_group.num_rows,
+                "null_count": stats.null_count if stats is not None else None,
+                "min": stats.min if has_min_max else None,
+                "max": stats.max if has_min_max else None,
+            })
+    return pd.DataFrame(records)
+
+
+def read_raw_listings(path: str, **kwargs) -> pd.DataFrame:
+    """
+    Read a raw Inside Airbnb CSV snapshot (the only CSV input of the pipeline).
+    Label columns are parsed straight into categories / Arrow strings.
+    """
+    kwargs.setdefault("dtype", RAW_READ_DTYPES)
+    return pd.read_csv(path, **kwargs)
+
+
+class DatasetWriter:
+    """
+    Append DataFrames to one stored dataset chunk by chunk, so a large input can
+    be written without ever holding it in memory. The file is written under a
+    temporary name and only appears at ``path`` once the writer is closed.
+
+    The schema is fixed by the first chunk and every later chunk is cast to it.
+    Declared columns get their types from ``schema``; columns it does not
+    declare are stored as strings, because their inferred type can differ
+    between chunks (all-null in one, text in the next). Without a ``schema``
+    the first chunk's inferred types are kept.
+    """
+
+    def __init__(self, path: str, schema: pa.Schema = None, row_group_size: int = ROW_GROUP_SIZE):
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._tmp_path = path + ".tmp"
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        table = to_table(df)
+        if self.schema is not None:
+            table = table.cast(_resolve_schema(table, self.schema, pa.string()))
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._writer = pq.ParquetWriter(self._tmp_path, table.schema,
+                                            write_statistics=True, compression="snappy")
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += table.num_rows
+
+    def close(self):
+        if self._writer is None:
+            # nothing was written: still leave a valid, empty dataset behind
+            empty = (self.schema or pa.schema([])).empty_table()
+            pq.write_table(empty, self._tmp_path)
+        else:
+            self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
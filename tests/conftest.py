@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Pipeline modules import each other as top-level packages (``pipeline.*``,
+# ``analysis.*``), the same way run_analysis.py does, so put src/ on the path.
+# Tests import them by those names as well: a ``src.pipeline`` import would
+# load a second copy of each module (and of artifacts.STORE).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.generate_summary_stats import calculate_summary_stats, run_anova
+from pipeline.aggregate_cube import build_cube, load_cube, save_cube
+
+
+@pytest.fixture
+def listings():
+    """Row-level listings spread over quarters, neighbourhoods and room types."""
+    rng = np.random.default_rng(0)
+    n = 400
+    return pd.DataFrame({
+        "quarter": rng.choice(["Q1", "Q2", "Q3"], n),
+        "neighbourhood": rng.choice(["A", "B", "C", "D"], n),
+        "room_type": rng.choice(["Entire home/apt", "Private room"], n),
+        "price": np.round(rng.lognormal(5, 0.6, n)),
+        "availability_365": rng.integers(0, 366, n),
+        "number_of_reviews": rng.integers(0, 200, n),
+    })
+
+
+def test_cube_answers_match_row_level_results(listings):
+    """Summary table and ANOVA from the cube equal the row-level computations."""
+    cube = build_cube(listings)
+
+    pd.testing.assert_frame_equal(calculate_summary_stats(cube), calculate_summary_stats(listings),
+                                  check_index_type=False, check_dtype=False)
+    from_cube, from_rows = run_anova(cube), run_anova(listings)
+    assert from_cube["f_statistic"].iloc[0] == pytest.approx(from_rows["f_statistic"].iloc[0])
+    assert from_cube["p_value"].iloc[0] == pytest.approx(from_rows["p_value"].iloc[0])
+
+
+def test_merged_partial_cubes_equal_the_whole(listings, tmp_path):
+    """Cubes built on separate batches merge into the cube of all rows (and persist)."""
+    whole = build_cube(listings)
+    merged = build_cube(listings.iloc[:150]).merge(build_cube(listings.iloc[150:]))
+    save_cube(merged, str(tmp_path))
+    # the descriptor only appears once the tables it describes are on disk
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "aggregate_cube.json", "aggregate_cube_moments.parquet", "aggregate_cube_sketch.parquet"]
+    loaded = load_cube(str(tmp_path))
+
+    expected = whole.stats(["neighbourhood"], "price", ["count", "mean", "median", "max"])
+    actual = loaded.stats(["neighbourhood"], "price", ["count", "mean", "median", "max"])
+    pd.testing.assert_frame_equal(actual, expected, check_index_type=False, check_categorical=False)
+
+
+def test_approximate_sketch_stays_within_relative_accuracy(listings):
+    cube = build_cube(listings, relative_accuracy=0.01)
+
+    approx = cube.stats(["quarter"], "price", ["q0.9"])["q0.9"]
+    exact = listings.groupby("quarter")["price"].quantile(0.9)
+
+    assert ((approx - exact).abs() / exact).max() < 0.02
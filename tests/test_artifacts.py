@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.artifacts import ArtifactStore
+from pipeline.storage import CLEAN_LISTINGS_SCHEMA, read_dataset, write_dataset
+
+
+@pytest.fixture
+def cleaned_df():
+    return pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "neighbourhood": ["A", "B", "A", "C"],
+        "price": [100.0, 150.0, 80.0, 300.0],
+        "minimum_nights": [1.0, 2.0, 3.0, 1.0],
+        "date": pd.Timestamp("2024-09-18"),
+    })
+
+
+def test_published_dataset_is_consumed_from_memory(tmp_path, cleaned_df):
+    """Consumers see the stored dtypes without parsing the file; flush writes it."""
+    path = str(tmp_path / "listings_quarter1.parquet")
+    store = ArtifactStore()
+
+    store.publish(cleaned_df, path, CLEAN_LISTINGS_SCHEMA)
+    consumed = store.consume(path, columns=["id", "price"], filters=[("price", ">", 120)])
+    store.flush()
+
+    assert store.loads == {}
+    assert consumed["id"].tolist() == [2, 4]
+    pd.testing.assert_frame_equal(store.consume(path), read_dataset(path))
+    assert store.pending() == []
+
+
+def test_loaded_dataset_is_parsed_once_and_matches_read_dataset(tmp_path, cleaned_df):
+    path = str(tmp_path / "listings_quarter1.parquet")
+    write_dataset(cleaned_df, path, CLEAN_LISTINGS_SCHEMA)
+    store = ArtifactStore()
+
+    for columns, filters in [(None, None), (["id"], [("neighbourhood", "==", "A")]),
+                             (["price", "id"], [("minimum_nights", ">=", 2)])]:
+        pd.testing.assert_frame_equal(store.consume(path, columns, filters),
+                                      read_dataset(path, columns=columns, filters=filters))
+    assert list(store.loads.values()) == [1]
+
+    # a rewritten file is read again
+    write_dataset(cleaned_df.head(2), path, CLEAN_LISTINGS_SCHEMA)
+    assert len(store.consume(path)) == 2
+
+
+def test_least_recently_used_frames_are_evicted(tmp_path, cleaned_df):
+    store = ArtifactStore()
+    store.publish(cleaned_df, str(tmp_path / "a.parquet"))
+    store.max_bytes = store.nbytes * 2   # room for two frames
+    store.publish(cleaned_df, str(tmp_path / "b.parquet"))
+    store.consume(str(tmp_path / "a.parquet"))
+    store.publish(cleaned_df, str(tmp_path / "c.parquet"))
+    store.flush()
+
+    assert str(tmp_path / "b.parquet") not in store
+    assert str(tmp_path / "a.parquet") in store and str(tmp_path / "c.parquet") in store
+    assert store.nbytes <= store.max_bytes
+    assert len(store.consume(str(tmp_path / "b.parquet"))) == 4   # back from disk
+
+
+def test_projected_consumers_read_only_their_columns(tmp_path, cleaned_df):
+    """Columns are read from disk as consumers ask for them; one full read serves everyone after."""
+    path = str(tmp_path / "listings_quarter1.parquet")
+    write_dataset(cleaned_df, path, CLEAN_LISTINGS_SCHEMA)
+    store = ArtifactStore()
+
+    assert store.consume(path, columns=["id"])["id"].tolist() == [1, 2, 3, 4]
+    assert store.consume(path, columns=["id"]).columns.tolist() == ["id"]
+    prices = store.consume(path, columns=["price"], filters=[("minimum_nights", ">=", 2)])
+    assert prices["price"].tolist() == [150.0, 80.0]
+    assert store.loads[path] == 2
+    projected_bytes = store.nbytes
+
+    pd.testing.assert_frame_equal(store.consume(path), read_dataset(path))
+    store.consume(path, columns=["neighbourhood"])
+    assert store.loads[path] == 3 and store.nbytes > projected_bytes
+
+
+def test_failed_write_is_raised_by_flush_and_leaves_no_partial_file(tmp_path, cleaned_df):
+    path = tmp_path / "listings_quarter1.parquet"
+    path.mkdir()   # the finished file cannot replace a directory
+    store = ArtifactStore()
+
+    store.publish(cleaned_df, str(path))
+    with pytest.raises(OSError):
+        store.flush()
+
+    assert not (tmp_path / "listings_quarter1.parquet.tmp").exists()
+    assert store.pending() == []
+    store.flush()   # the error is reported once
+
+
+def _bytes_read():
+    with open("/proc/self/io") as f:
+        return int(dict(line.split(": ") for line in f.read().splitlines())["rchar"])
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/io"), reason="needs per-process I/O counters")
+def test_filtered_consumer_skips_row_groups_that_cannot_match(tmp_path):
+    """A filter is pushed down to the Parquet reader: only the matching row group is read."""
+    path = str(tmp_path / "listings_quarter1.parquet")
+    n = 400_000
+    write_dataset(pd.DataFrame({"id": np.arange(n), "price": np.random.default_rng(0).random(n)}),
+                  path, row_group_size=n // 4)
+    store = ArtifactStore()
+
+    before = _bytes_read()
+    matches = store.consume(path, columns=["id", "price"], filters=[("id", "in", [5, 7])])
+
+    assert matches["id"].tolist() == [5, 7]
+    assert _bytes_read() - before < os.path.getsize(path) / 2
+    assert path not in store  # a filtered frame is not the dataset
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from pipeline.create_aggregate_data import (
+    balanced_panel_ids, clean_joint_dataset, load_quarterly_data, merge_quarterly_data,
+)
+from pipeline.storage import CLEAN_LISTINGS_SCHEMA, list_datasets, write_dataset
+
+
+def quarter_frame(ids):
+    return pd.DataFrame({
+        "id": ids,
+        "price": [100.0 + i for i in ids],
+        "availability_365": [200] * len(ids),
+        "neighbourhood": ["A" if i % 2 else "B" for i in ids],
+        "room_type": ["Entire home/apt"] * len(ids),
+    })
+
+
+def test_balanced_panel_is_pushed_down_into_the_reads(tmp_path):
+    """Reading only the panel gives the same joint dataset as filtering after the merge."""
+    for quarter, ids in enumerate([[1, 2, 3, 4, 5], [5, 4, 2, 9], [2, 4, 5, 7]], start=1):
+        write_dataset(quarter_frame(ids), str(tmp_path / f"listings_quarter{quarter}.parquet"),
+                      CLEAN_LISTINGS_SCHEMA, row_group_size=2)
+
+    assert list(balanced_panel_ids(list_datasets(str(tmp_path), "listings_quarter"))) == [2, 4, 5]
+
+    pushed = merge_quarterly_data(load_quarterly_data(str(tmp_path), balanced=True))
+    assert len(pushed) == 9
+    expected = clean_joint_dataset(merge_quarterly_data(load_quarterly_data(str(tmp_path))))
+    pd.testing.assert_frame_equal(clean_joint_dataset(pushed, balanced=True).reset_index(drop=True),
+                                  expected.reset_index(drop=True))
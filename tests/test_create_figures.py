@@ -0,0 +1,67 @@
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.create_figures import FIGURES, box_stats, generate_exploratory_figures
+
+
+@pytest.fixture
+def joint_df():
+    """Tiny joint dataset with the engineered columns the figures use."""
+    return pd.DataFrame({
+        "quarter": ["Q1", "Q1", "Q2", "Q2"],
+        "neighbourhood": ["A", "B", "A", "B"],
+        "room_type": ["Entire home/apt", "Private room"] * 2,
+        "price": [100.0, 80.0, 120.0, 90.0],
+        "availability_365": [100, 200, 150, 250],
+        "is_highly_available": [False, True, False, True],
+        "price_premium_pct": [5.0, -5.0, 10.0, -10.0],
+        "reviews_per_month": [1.0, 2.0, 1.5, 2.5],
+        "number_of_reviews": [10, 20, 15, 25],
+        "neighborhood_avg_price": [110.0, 85.0, 110.0, 85.0],
+        "price_category": pd.Categorical(["Moderate", "Budget", "Comfort", "Budget"]),
+        "is_peak_season": [False, False, True, True],
+    })
+
+
+def test_renders_only_the_requested_figures(tmp_path, joint_df):
+    """A subset of registered figures can be rendered by name."""
+    paths = generate_exploratory_figures(joint_df, str(tmp_path),
+                                         names=["time_trends", "seasonal_pricing"])
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["seasonal_pricing.png", "time_trends.png"]
+    assert len(paths) == 2
+    assert len(FIGURES) == 12
+
+
+def test_unknown_figure_name_is_rejected(tmp_path, joint_df):
+    with pytest.raises(ValueError, match="Unknown figures"):
+        generate_exploratory_figures(joint_df, str(tmp_path), names=["nope"])
+
+
+def test_box_stats_match_matplotlib_with_capped_outliers():
+    """One-sort box statistics equal matplotlib's; outliers are thinned but keep the extremes."""
+    rng = np.random.default_rng(1)
+    prices = rng.lognormal(5, 0.9, 3000)
+    quarters = rng.choice(["Q1", "Q2", "Q3"], 3000)
+
+    boxes = box_stats(prices, quarters, max_fliers=10)
+    expected = matplotlib.cbook.boxplot_stats([prices[quarters == q] for q in ["Q1", "Q2", "Q3"]])
+
+    assert [b["label"] for b in boxes] == ["Q1", "Q2", "Q3"]
+    for box, reference in zip(boxes, expected):
+        for stat in ["med", "q1", "q3", "whislo", "whishi"]:
+            assert box[stat] == pytest.approx(reference[stat])
+        assert len(box["fliers"]) == min(10, len(reference["fliers"]))
+        assert box["fliers"].max() == reference["fliers"].max()
+
+
+def test_figures_load_only_the_columns_they_use():
+    from analysis.create_figures import CORRELATION_FEATURES, figure_columns
+
+    with_cube = figure_columns(["time_trends", "seasonal_pricing"], cube=True)
+    assert "room_type" not in with_cube and "minimum_nights" not in with_cube
+    assert "room_type" in figure_columns(["time_trends"])
+    assert set(CORRELATION_FEATURES) <= set(figure_columns(["correlation_matrix_enhanced"], cube=True))
+    assert not {"name", "host_name", "latitude"} & set(figure_columns())
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from pipeline.dag import Pipeline, Stage, topological_order
+
+
+def write_pid(dst):
+    """Toy stage: record which process ran it."""
+    with open(dst, "w") as f:
+        f.write(str(os.getpid()))
+
+
+def copy_upper(src, dst):
+    """Toy stage: upper-case one file into another."""
+    with open(src) as f:
+        text = f.read()
+    with open(dst, "w") as f:
+        f.write(text.upper())
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Temporary project with one input file and a two-stage pipeline."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "raw.txt").write_text("hello")
+    stages = [
+        Stage(name="second", target="test_dag:copy_upper", inputs=["mid.txt"],
+              outputs=["out.txt"], deps=["first"], params={"src": "mid.txt", "dst": "out.txt"}),
+        Stage(name="first", target="test_dag:copy_upper", inputs=["raw.txt"],
+              outputs=["mid.txt"], params={"src": "raw.txt", "dst": "mid.txt"}),
+    ]
+    return tmp_path, stages
+
+
+def test_unchanged_stages_are_skipped(project):
+    """A rerun with identical inputs, code and params does no work."""
+    root, stages = project
+
+    first = Pipeline(stages, str(root)).run()
+    second = Pipeline(stages, str(root)).run()
+
+    assert first == {"first": "ran", "second": "ran"}
+    assert second == {"first": "skipped", "second": "skipped"}
+    assert (root / "out.txt").read_text() == "HELLO"
+
+
+def test_changed_input_reruns_downstream_only_when_needed(project):
+    """Changing the raw input reruns both stages; deleting an output reruns its stage."""
+    root, stages = project
+    Pipeline(stages, str(root)).run()
+
+    (root / "raw.txt").write_text("bye")
+    assert Pipeline(stages, str(root)).run() == {"first": "ran", "second": "ran"}
+    assert (root / "out.txt").read_text() == "BYE"
+
+    os.remove(root / "out.txt")
+    assert Pipeline(stages, str(root)).run() == {"first": "skipped", "second": "ran"}
+
+
+def test_single_stage_left_after_skips_runs_in_process(project):
+    """With one of two parallel stages up to date, the other is not sent to a worker."""
+    root, _ = project
+    stages = [Stage(name=name, target="test_dag:write_pid", outputs=[f"{name}.pid"],
+                    params={"dst": f"{name}.pid"}) for name in ("a", "b")]
+    Pipeline(stages, str(root)).run(jobs=2)
+
+    os.remove(root / "b.pid")
+    assert Pipeline(stages, str(root)).run(jobs=2) == {"a": "skipped", "b": "ran"}
+    assert (root / "b.pid").read_text() == str(os.getpid())
+
+
+def test_cycles_are_rejected():
+    stages = [Stage(name="a", target="m:f", deps=["b"]), Stage(name="b", target="m:f", deps=["a"])]
+    with pytest.raises(ValueError, match="Cycle"):
+        topological_order(stages)
@@ -1,7 +1,7 @@
 import pandas as pd
 import pytest
 
-from src.pipeline.clean_raw_data import clean_airbnb_data
+from pipeline.clean_raw_data import clean_airbnb_data
 
 
 @pytest.fixture
@@ -35,3 +35,70 @@ def test_cleaned_data_has_correct_columns_and_removes_invalid_rows(sample_data):
     assert (cleaned["price"] > 0).all()
     assert (cleaned["minimum_nights"].between(1, 365)).all()
     assert (cleaned["availability_365"].between(0, 365)).all()
+
+
+def test_streaming_clean_matches_in_memory(tmp_path, sample_data):
+    """Chunked cleaning of a compressed raw file stores exactly the in-memory result."""
+    from pipeline.clean_raw_data import clean_snapshot
+    from pipeline.storage import read_dataset
+
+    raw = pd.concat([sample_data] * 4, ignore_index=True)
+    raw["id"] = range(len(raw))
+    raw_file = tmp_path / "listings.csv.gz"
+    raw.to_csv(raw_file, index=False)
+
+    whole = tmp_path / "whole.parquet"
+    chunked = tmp_path / "chunked.parquet"
+    assert clean_snapshot(str(raw_file), str(whole), "2024-09-18")[:2] == (12, 8)
+    assert clean_snapshot(str(raw_file), str(chunked), "2024-09-18", chunksize=5)[:2] == (12, 8)
+
+    pd.testing.assert_frame_equal(read_dataset(str(chunked)), read_dataset(str(whole)))
+
+
+def test_parallel_clean_labels_quarters_by_date(tmp_path, monkeypatch, sample_data):
+    """Worker results come back in date order, each labelled with its own date."""
+    from pipeline.clean_raw_data import main
+    from pipeline.storage import read_dataset
+
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    for date in ["2025-03-15", "2024-09-18", "2024-12-20"]:
+        sample_data.to_csv(tmp_path / "data" / "raw" / f"listings_{date}.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+
+    results = main(dates=None, workers=2)
+
+    assert [r["date"] for r in results] == ["2024-09-18", "2024-12-20", "2025-03-15"]
+    assert all(r["rows_in"] == 3 and r["rows_out"] == 2 for r in results)
+    q3 = read_dataset(str(tmp_path / "data" / "processed" / "listings_quarter3.parquet"))
+    assert (q3["date"] == pd.Timestamp("2025-03-15")).all()
+
+
+def test_rule_violations_and_rejected_rows(tmp_path, sample_data):
+    """One pass yields per-rule counts; rejected rows name every rule they broke."""
+    from pipeline.clean_raw_data import clean_snapshot
+
+    raw = pd.concat([sample_data] * 3, ignore_index=True)
+    raw.loc[1, "price"] = None
+    raw_file = tmp_path / "listings.csv"
+    raw.to_csv(raw_file, index=False)
+
+    for chunksize in (None, 4):
+        rejected_file = tmp_path / f"rejected_{chunksize}.csv"
+        rows_in, rows_out, violations = clean_snapshot(
+            str(raw_file), str(tmp_path / "clean.parquet"), "2024-09-18",
+            chunksize=chunksize, rejected_file=str(rejected_file))
+
+        assert (rows_in, rows_out) == (9, 5)
+        assert violations == {
+            "price_missing": 1, "price_negative": 3,
+            "minimum_nights_missing": 0, "minimum_nights_out_of_range": 3,
+            "availability_missing": 0, "availability_out_of_range": 3,
+        }
+        rejected = pd.read_csv(rejected_file)
+        assert list(rejected["rejected_by"]) == ["price_missing"] + [
+            "price_negative;minimum_nights_out_of_range;availability_out_of_range"] * 3
+
+
+def test_missing_required_column_fails(sample_data):
+    with pytest.raises(ValueError, match="price"):
+        clean_airbnb_data(sample_data.drop(columns=["price"]))
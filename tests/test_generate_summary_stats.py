@@ -2,7 +2,7 @@ import os
 import pandas as pd
 import pytest
 
-from src.analysis.generate_summary_stats import (
+from analysis.generate_summary_stats import (
     calculate_summary_stats,
     run_anova,
     perform_statistical_analysis,
@@ -66,3 +66,22 @@ def test_perform_analysis_creates_files(tmp_path, sample_df): #fake path from py
     # Validate stats results contents
     df_stats = pd.read_csv(stats_file)
     assert "p_value" in df_stats.columns
+
+
+def test_consumers_see_only_their_declared_columns(sample_df):
+    """Stages load the union of the declared columns; reading an undeclared one fails at once."""
+    from pipeline.schema import required_columns, uses
+
+    @uses("quarter")
+    def reads_price(df):
+        return df["price"]
+
+    wide = sample_df.assign(name="Cozy loft", host_name="Ann")
+
+    assert required_columns(calculate_summary_stats, run_anova) == [
+        "quarter", "price", "availability_365", "number_of_reviews"]
+    pd.testing.assert_frame_equal(calculate_summary_stats(wide), calculate_summary_stats(sample_df))
+    with pytest.raises(KeyError, match="price"):
+        reads_price(sample_df)
+    with pytest.raises(ValueError, match="do not declare"):
+        required_columns(run_anova, perform_statistical_analysis)
@@ -0,0 +1,157 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+import requests
+
+from pipeline.get_raw_data import download_file, download_snapshots, main, DownloadManifest
+from pipeline.raw_store import RawStore, discover_snapshots
+from pipeline.storage import read_raw_listings
+
+FILES = {
+    "/2024-09-18/listings.csv": b"id,price\n" + b"1,100\n" * 5000,
+    "/2024-12-20/listings.csv": b"id,price\n" + b"2,150\n" * 5000,
+}
+# snapshot URLs as ``main`` builds them; the second is an unchanged snapshot
+SNAPSHOT_FILES = {
+    "/2024-09-18/visualisations/listings.csv": FILES["/2024-09-18/listings.csv"],
+    "/2025-03-15/visualisations/listings.csv": FILES["/2024-09-18/listings.csv"],
+}
+ETAG = '"v1"'
+
+
+class SnapshotHandler(BaseHTTPRequestHandler):
+    """Tiny stand-in for the Inside Airbnb file server."""
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, dict(self.headers)))
+        body = FILES.get(self.path, SNAPSHOT_FILES.get(self.path))
+        if body is None:
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        status, payload = 200, body
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == ETAG:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(body):
+                self.send_error(416)
+                return
+            status, payload = 206, body[start:]
+
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    SnapshotHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SnapshotHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_concurrent_download_then_rerun_is_not_modified(server, tmp_path):
+    """Snapshots are fetched in parallel and skipped on an unchanged rerun."""
+    jobs = [(f"{server}{path}", f"listings_{path.split('/')[1]}.csv") for path in FILES]
+
+    first = download_snapshots(jobs, str(tmp_path), max_workers=2)
+    assert [r["status"] for r in first] == ["downloaded", "downloaded"]
+    for (url, filename), path in zip(jobs, FILES):
+        assert (tmp_path / filename).read_bytes() == FILES[path]
+
+    second = download_snapshots(jobs, str(tmp_path), max_workers=2)
+    assert [r["status"] for r in second] == ["not_modified", "not_modified"]
+
+
+def test_partial_download_is_resumed_with_range(server, tmp_path):
+    """An interrupted download continues from the bytes already on disk."""
+    path = "/2024-09-18/listings.csv"
+    save_path = tmp_path / "listings_2024-09-18.csv"
+    manifest = DownloadManifest(str(tmp_path / "download_manifest.json"))
+    manifest.update(save_path.name, partial_validator=ETAG)
+    (tmp_path / f".{save_path.name}.part").write_bytes(FILES[path][:1000])
+
+    result = download_file(f"{server}{path}", str(save_path), manifest=manifest)
+
+    assert result["status"] == "resumed"
+    assert result["bytes"] == len(FILES[path]) - 1000
+    assert save_path.read_bytes() == FILES[path]
+    assert SnapshotHandler.requests_seen[-1][1]["Range"] == "bytes=1000-"
+
+
+@pytest.mark.parametrize("part_removed", [False, True])
+def test_unsatisfiable_range_restarts_from_scratch(server, tmp_path, part_removed):
+    """A 416 for a stale partial file refetches the whole file, even if the partial file is gone."""
+    path = "/2024-09-18/listings.csv"
+    save_path = tmp_path / "listings_2024-09-18.csv"
+    part_path = tmp_path / f".{save_path.name}.part"
+    manifest = DownloadManifest(str(tmp_path / "download_manifest.json"))
+    manifest.update(save_path.name, partial_validator=ETAG)
+    part_path.write_bytes(FILES[path] + b"stale tail")
+
+    session = requests.Session()
+    if part_removed:
+        get = session.get
+
+        def get_after_cleanup(*args, **kwargs):
+            part_path.unlink(missing_ok=True)  # e.g. another run cleaned up meanwhile
+            return get(*args, **kwargs)
+
+        session.get = get_after_cleanup
+
+    result = download_file(f"{server}{path}", str(save_path), session=session, manifest=manifest)
+
+    assert result["status"] == "downloaded"
+    assert save_path.read_bytes() == FILES[path] and not part_path.exists()
+    assert [("Range" in headers) for _, headers in SnapshotHandler.requests_seen] == [True, False]
+
+
+def test_missing_file_is_reported_not_raised(server, tmp_path):
+    """A missing snapshot is reported as failed and leaves no file behind."""
+    result = download_file(f"{server}/missing/listings.csv", str(tmp_path / "listings_x.csv"))
+
+    assert result["status"] == "failed"
+    assert not os.path.exists(tmp_path / "listings_x.csv")
+
+
+def test_downloads_are_stored_compressed_and_deduplicated(server, tmp_path, monkeypatch):
+    """Snapshots land in the raw store once per content and read back unchanged."""
+    monkeypatch.chdir(tmp_path)
+    raw_dir = tmp_path / "data" / "raw"
+    dates = ["2024-09-18", "2025-03-15"]
+
+    results = main(dates=dates, base_url=f"{server}/")
+
+    assert not list(raw_dir.glob("listings_*.csv"))
+    assert [r["stored"]["deduplicated"] for r in results] == [False, True]
+    store = RawStore(str(raw_dir))
+    first, second = (store.entry(date) for date in dates)
+    assert first["blob"] == second["blob"] and len(list(raw_dir.glob("blobs/*/*"))) == 1
+    assert first["stored_bytes"] < first["bytes"] / 10
+    with store.open(dates[1]) as f:
+        assert f.read() == SNAPSHOT_FILES["/2025-03-15/visualisations/listings.csv"]
+
+    plain = tmp_path / "listings.csv"
+    plain.write_bytes(SNAPSHOT_FILES["/2024-09-18/visualisations/listings.csv"])
+    assert [date for date, _ in discover_snapshots(str(raw_dir))] == dates
+    pd.testing.assert_frame_equal(read_raw_listings(store.path(dates[0])), read_raw_listings(str(plain)))
+
+    # stored snapshots are still revalidated, not fetched again
+    assert [r["status"] for r in main(dates=dates, base_url=f"{server}/")] == ["not_modified"] * 2
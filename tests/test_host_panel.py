@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.generate_summary_stats import calculate_host_summary
+from pipeline.host_panel import build_host_panel
+
+
+@pytest.fixture
+def snapshots():
+    """Two quarters: listing 2 leaves, 5 enters, 4 moves from host 30 to host 40."""
+    q1 = pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "host_id": [10, 10, 20, 30],
+        "room_type": ["Entire home/apt", "Private room", "Entire home/apt", "Private room"],
+        "price": [100.0, 50.0, 200.0, 80.0],
+        "minimum_nights": [2, 1, 5, 1],
+        "number_of_reviews_ltm": [10, 0, 4, None],
+    })
+    q2 = pd.DataFrame({
+        "id": [5, 1, 3, 4],
+        "host_id": [20, 10, 20, 40],
+        "room_type": ["Shared room", "Entire home/apt", "Entire home/apt", "Private room"],
+        "price": [30.0, 110.0, 200.0, 80.0],
+        "minimum_nights": [1, 2, 5, 1],
+        "number_of_reviews_ltm": [1, 10, 200, 2],
+    })
+    return [q1, q2]
+
+
+def test_host_portfolios_and_flows(snapshots):
+    portfolios, room_mix = build_host_panel(snapshots)
+    q2 = portfolios[portfolios["quarter"] == "Q2"].set_index("host_id")
+
+    assert list(q2.index) == [10, 20, 30, 40]          # host 30 exited: a row with no listings
+    assert list(q2["listings"]) == [1, 2, 0, 1]
+    assert list(q2["listings_entered"]) == [0, 1, 0, 0]
+    assert list(q2["listings_exited"]) == [1, 0, 0, 0]
+    assert list(q2["listings_switched_in"]) == [0, 0, 0, 1]
+    assert list(q2["listings_switched_out"]) == [0, 0, 1, 0]
+    assert list(q2["host_entered"]) == [False, False, False, True]
+    assert list(q2["host_exited"]) == [False, False, True, False]
+    assert q2.loc[20, "entire_home_share"] == pytest.approx(0.5)
+    # occupancy capped at 70% of the year: 200 reviews -> 255.5 nights
+    assert q2.loc[20, "revenue_proxy"] == pytest.approx(30 * 6 + 200 * 255.5)
+    assert portfolios.loc[portfolios["quarter"] == "Q1", "listings_entered"].isna().all()
+
+    q1_mix = room_mix[(room_mix["quarter"] == "Q1") & (room_mix["host_id"] == 10)]
+    assert dict(zip(q1_mix["room_type"], q1_mix["listings"])) == {"Entire home/apt": 1, "Private room": 1}
+
+
+def test_host_panel_matches_groupby():
+    """Bincount cells agree with a plain groupby on a larger random panel."""
+    rng = np.random.default_rng(3)
+    frames = []
+    for _ in range(3):
+        n = 500
+        frames.append(pd.DataFrame({
+            "id": rng.choice(800, n, replace=False),
+            "host_id": rng.integers(0, 60, n),
+            "room_type": rng.choice(["Entire home/apt", "Private room"], n),
+            "price": rng.lognormal(5, 0.5, n).round(),
+            "minimum_nights": rng.integers(1, 30, n),
+            "number_of_reviews_ltm": rng.integers(0, 40, n),
+        }))
+    portfolios, _ = build_host_panel(frames)
+    active = portfolios[portfolios["listings"] > 0].set_index(["quarter", "host_id"])
+
+    expected = pd.concat(frames, keys=["Q1", "Q2", "Q3"], names=["quarter"]) \
+        .groupby(["quarter", "host_id"])["price"].agg(["size", "mean"])
+    np.testing.assert_array_equal(active["listings"], expected["size"])
+    np.testing.assert_allclose(active["mean_price"], expected["mean"], rtol=1e-6)
+
+    summary = calculate_host_summary(portfolios)
+    assert list(summary["hosts"]) == list(expected.groupby("quarter").size())
+    assert pd.isna(summary.loc["Q1", "listings_entered"])
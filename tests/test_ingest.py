@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import artifacts
+from pipeline.panel_store import PanelStore
+from pipeline.spatial import COMPETITOR_COLUMNS
+from pipeline.storage import read_dataset
+
+DATES = ["2024-09-18", "2024-12-20", "2025-03-15", "2025-06-19"]
+
+
+def raw_snapshot(ids, seed):
+    """Raw listings.csv rows for ``ids``; ids divisible by 7 have no price (cleaned away)."""
+    rng = np.random.default_rng(seed)
+    ids = np.asarray(ids)
+    location = np.random.default_rng(0).normal([42.33, -71.08], [0.01, 0.01], (100, 2))[ids % 100]
+    return pd.DataFrame({
+        "id": ids,
+        "host_id": ids % 13,
+        "neighbourhood_group": None,
+        "neighbourhood": np.array(["Back Bay", "Fenway", "South End"])[ids % 3],
+        "latitude": location[:, 0],
+        "longitude": location[:, 1],
+        "room_type": np.array(["Entire home/apt", "Private room"])[ids % 2],
+        "price": np.where(ids % 7 == 0, np.nan, rng.integers(50, 400, len(ids))),
+        "minimum_nights": rng.integers(1, 5, len(ids)),
+        "number_of_reviews": rng.integers(0, 50, len(ids)),
+        "last_review": "2024-08-01",
+        "reviews_per_month": rng.random(len(ids)).round(2),
+        "calculated_host_listings_count": 1,
+        "availability_365": rng.integers(0, 366, len(ids)),
+        "number_of_reviews_ltm": rng.integers(0, 10, len(ids)),
+        "license": None,
+    })
+
+
+def build(root, monkeypatch, dates):
+    """Raw files for ``dates`` in ``root`` and a full clean + aggregate run over them."""
+    from pipeline import clean_raw_data, create_aggregate_data
+
+    (root / "data" / "raw").mkdir(parents=True, exist_ok=True)
+    ids = [range(1, 90), range(5, 95), range(1, 80), range(10, 100)]
+    for i, date in enumerate(dates):
+        raw_snapshot(list(ids[i]), seed=i).to_csv(root / "data" / "raw" / f"listings_{date}.csv", index=False)
+    monkeypatch.chdir(root)
+    clean_raw_data.main(dates=None, workers=1)
+    create_aggregate_data.main(workers=1)
+    artifacts.flush()
+
+
+def test_ingested_snapshot_matches_full_rebuild(tmp_path, monkeypatch):
+    from pipeline import ingest
+
+    build(tmp_path / "full", monkeypatch, DATES)
+    build(tmp_path / "incremental", monkeypatch, DATES[:3])
+    raw_snapshot(list(range(10, 100)), seed=3).to_csv(
+        tmp_path / "incremental" / "data" / "raw" / f"listings_{DATES[3]}.csv", index=False)
+
+    results = ingest.main(workers=1)
+    artifacts.flush()
+
+    assert [(r["quarter"], r["date"]) for r in results] == [(4, DATES[3])]
+    assert results[0]["panel_after"] < results[0]["panel_before"]
+    full, incremental = (read_dataset(str(tmp_path / d / "data" / "processed" / "boston_listings_joint.parquet"))
+                         for d in ("full", "incremental"))
+    pd.testing.assert_frame_equal(incremental.drop(columns=COMPETITOR_COLUMNS + ["price_premium_pct"]),
+                                  full.drop(columns=COMPETITOR_COLUMNS + ["price_premium_pct"]))
+    # competitor distances keep the projection of the first build
+    pd.testing.assert_frame_equal(incremental[COMPETITOR_COLUMNS + ["price_premium_pct"]],
+                                  full[COMPETITOR_COLUMNS + ["price_premium_pct"]], rtol=1e-4)
+
+    full_panel, panel = (PanelStore.open(str(tmp_path / d / "data" / "processed" / "panel"))
+                         for d in ("full", "incremental"))
+    assert panel.snapshots == ["Q1", "Q2", "Q3", "Q4"]
+    np.testing.assert_array_equal(panel.ids, full_panel.ids)
+    np.testing.assert_array_equal(panel.fields["price"], full_panel.fields["price"])
+
+
+def test_only_later_snapshots_can_be_ingested(tmp_path, monkeypatch):
+    from pipeline import ingest
+
+    build(tmp_path, monkeypatch, DATES[1:])
+    raw_snapshot(list(range(1, 50)), seed=9).to_csv(
+        tmp_path / "data" / "raw" / f"listings_{DATES[0]}.csv", index=False)
+
+    assert ingest.main() == []   # nothing newer than the joint dataset
+    with pytest.raises(ValueError, match="not after the latest"):
+        ingest.main(dates=[DATES[0]])
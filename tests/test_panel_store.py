@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.panel_store import PanelStore, build_panel
+
+
+@pytest.fixture
+def joint():
+    """Long-format listings: 30 and 10 are in every quarter, 20 misses Q2."""
+    return pd.DataFrame({
+        "id": [30, 10, 20, 10, 30, 30, 10, 20],
+        "host_id": [7, 5, 7, 5, 7, 7, 5, 7],
+        "quarter": ["Q1", "Q1", "Q1", "Q2", "Q2", "Q10", "Q10", "Q10"],
+        "price": [300.0, 100.0, 200.0, 110.0, 330.0, 360.0, 121.0, 220.0],
+        "availability_365": [10, 20, 30, 40, 50, 60, 70, 80],
+    })
+
+
+def test_open_maps_arrays_and_looks_up_many_ids(joint, tmp_path):
+    """The saved store opens memory-mapped and answers vectorized id lookups."""
+    build_panel(joint).save(str(tmp_path))
+    panel = PanelStore.open(str(tmp_path))
+
+    assert isinstance(panel.fields["price"], np.memmap)
+    assert panel.snapshots == ["Q1", "Q2", "Q10"]
+    np.testing.assert_array_equal(panel.get("price", [20, 99, 10]), [
+        [200.0, np.nan, 220.0],
+        [np.nan, np.nan, np.nan],
+        [100.0, 110.0, 121.0],
+    ])
+    assert panel.series(30)["availability_365"].tolist() == [10, 50, 60]
+
+
+def test_whole_panel_changes_and_host_lookup(joint):
+    panel = build_panel(joint)
+
+    pct = panel.changes("price", pct=True)
+    np.testing.assert_allclose(pct[panel.rows([10])[0]], [0.1, 0.1])
+    assert np.isnan(pct[panel.rows([20])[0]]).all()
+
+    assert panel.host_listings(7).tolist() == [20, 30]
+    assert panel.host_listings(99).tolist() == []
+    assert panel.host_panel("price", 5).loc[10].tolist() == [100.0, 110.0, 121.0]
@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pipeline import artifacts, profiling
+from pipeline.storage import dataset_path
+
+
+@profiling.profiled
+def keep_even(df):
+    return df[df["x"] % 2 == 0]
+
+
+def keep_even_in_worker(n):
+    return len(keep_even(pd.DataFrame({"x": range(n)})))
+
+
+def test_disabled_profiling_records_nothing(tmp_path, monkeypatch):
+    monkeypatch.delenv(profiling.PROFILE_DIR_ENV, raising=False)
+    with profiling.stage("clean") as measurement:
+        assert measurement is None
+        assert len(keep_even(pd.DataFrame({"x": range(4)}))) == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_stage_report_nests_steps_from_worker_processes(tmp_path, monkeypatch):
+    """Steps run in a stage's worker processes end up under that stage in the report."""
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+
+    with profiling.stage("clean"):
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            assert list(pool.map(keep_even_in_worker, [10, 6])) == [5, 3]
+        profiling.count_rows(rows_in=16, rows_out=8)
+
+    report = profiling.build_report(str(tmp_path), {"clean": "ran"}, wall_s=1.0)
+    (stage,) = report["stages"]
+    assert (stage["name"], stage["rows_in"], stage["rows_out"]) == ("clean", 16, 8)
+    assert stage["wall_s"] >= 0 and stage["peak_rss_mb"] > 0
+    assert sorted((s["rows_in"], s["rows_out"]) for s in stage["steps"]) == [(6, 3), (10, 5)]
+
+    previous = {"stages": [dict(stage, wall_s=stage["wall_s"] / 2 or 1.0)]}
+    assert profiling.compare(report, previous)["clean"]["wall_s"]["current"] == stage["wall_s"]
+
+    # a metric one of the runs could not measure has no change
+    unmeasured = {"stages": [dict(stage, peak_rss_mb=None)]}
+    assert profiling.compare(unmeasured, report)["clean"]["peak_rss_mb"]["change_pct"] is None
+    assert profiling.compare(report, unmeasured)["clean"]["peak_rss_mb"]["change_pct"] is None
+
+
+def test_stages_in_one_process_report_their_own_peak_rss_and_writes(tmp_path, monkeypatch):
+    """A small stage after a large one is not charged the large one's memory or pending writes."""
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path / "profile"))
+    path = dataset_path(str(tmp_path), "listings")
+
+    with profiling.stage("large"):
+        block = np.ones(64 << 20, dtype=np.uint8)  # 64 MiB, touched
+        del block
+        artifacts.publish(pd.DataFrame({"x": np.arange(100_000)}), path)
+    with profiling.stage("small"):
+        pass
+
+    large, small = profiling.build_report(str(tmp_path / "profile"), {}, wall_s=1.0)["stages"]
+    assert large["peak_rss_mb"] - small["peak_rss_mb"] > 32
+    assert large["bytes_written"] >= os.path.getsize(path) and small["bytes_written"] < 4096
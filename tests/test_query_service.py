@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import query_service
+from analysis.query_load_test import fetch, run_load
+from analysis.query_service import QueryService
+from pipeline import artifacts
+from pipeline.aggregate_cube import CUBE_NAME, build_cube, save_cube
+from pipeline.storage import dataset_path
+
+
+@pytest.fixture
+def cube():
+    rng = np.random.default_rng(0)
+    n = 300
+    return build_cube(pd.DataFrame({
+        "quarter": rng.choice(["Q1", "Q2"], n),
+        "neighbourhood": rng.choice(["Back Bay", "Fenway", "South End"], n),
+        "room_type": rng.choice(["Entire home/apt", "Private room"], n),
+        "price": np.round(rng.lognormal(5, 0.6, n)),
+        "availability_365": rng.integers(0, 366, n),
+        "number_of_reviews": rng.integers(0, 200, n),
+    }))
+
+
+def serve(service, requests):
+    """Responses of ``requests`` (paths) sent to ``service`` over one connection."""
+    async def run():
+        server = await service.start("127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            responses = [await fetch(reader, writer, path) for path in requests]
+            writer.close()
+            await writer.wait_closed()
+            return responses
+
+    return asyncio.run(run())
+
+
+def test_queries_match_the_cube_and_repeats_are_cached(cube):
+    service = QueryService(cube, cache_size=1)
+    query = "/query?by=quarter,room_type&metric=price&stats=mean,median&neighbourhood=Fenway&neighbourhood=Back%20Bay"
+    other = "/query?by=neighbourhood&metric=availability_365"
+
+    (status, body), (_, again), _, (_, after_eviction), (_, bad), (_, metrics) = serve(
+        service, [query, query, other, query, "/query?by=host_id", "/metrics"])
+
+    expected = (cube.where({"neighbourhood": ["Back Bay", "Fenway"]})
+                .stats(["quarter", "room_type"], "price", ["mean", "median"]).reset_index())
+    assert status == 200 and body == again == after_eviction
+    pd.testing.assert_frame_equal(pd.DataFrame(body["rows"]), expected, check_categorical=False,
+                                  check_dtype=False)
+    assert "host_id" in bad["error"]
+    assert metrics["cache"] == {"entries": 1, "max_entries": 1, "hits": 1, "misses": 3,
+                                "evictions": 2, "hit_ratio": 0.25}
+    assert metrics["status"] == {"200": 4, "400": 1}
+    assert metrics["latency_ms"]["query_hit"]["count"] == 1
+
+
+@pytest.mark.parametrize("stat", ["q1.5", "q-0.2"])
+def test_out_of_range_quantiles_are_rejected(cube, stat):
+    status, body = QueryService(cube).handle("GET", f"/query?by=quarter&metric=price&stats={stat}")
+
+    assert status == 400 and stat in json.loads(body)["error"]
+
+
+def test_load_test_reports_throughput_and_latency(cube):
+    service = QueryService(cube)
+
+    async def run():
+        server = await service.start("127.0.0.1", 0)
+        async with server:
+            return await run_load("127.0.0.1", server.sockets[0].getsockname()[1],
+                                  requests=200, connections=4, distinct=10)
+
+    report = asyncio.run(run())
+
+    assert report["errors"] == 0
+    assert report["latency_ms"]["first"]["count"] == 10 and report["latency_ms"]["repeated"]["count"] == 190
+    assert report["server"]["cache"]["misses"] == 10
+
+
+def test_service_reloads_when_a_cube_table_is_rewritten(cube, tmp_path, monkeypatch):
+    """A rewritten moments table is picked up even if the descriptor did not change."""
+    monkeypatch.setattr(query_service, "RELOAD_CHECK_S", 0)
+    save_cube(cube, str(tmp_path))
+    service = QueryService.from_directory(str(tmp_path))
+    query = "/query?by=quarter&metric=price&stats=count"
+    _, before = service.handle("GET", query)
+
+    artifacts.publish(cube.moments.assign(count=cube.moments["count"] * 2),
+                      dataset_path(str(tmp_path), f"{CUBE_NAME}_moments"))
+    artifacts.flush()
+    _, after = service.handle("GET", query)
+
+    counts = [[row["count"] for row in json.loads(body)["rows"]] for body in (before, after)]
+    assert counts[1] == [2 * n for n in counts[0]]
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from analysis.resampling import bootstrap_intervals, permutation_test, run_resampling_tests
+
+
+@pytest.fixture
+def listings():
+    """Skewed prices; Q3 is clearly more expensive than Q1 and Q2."""
+    rng = np.random.default_rng(5)
+    n = 300
+    quarter = rng.choice(["Q1", "Q2", "Q3"], n)
+    return pd.DataFrame({
+        "quarter": quarter,
+        "room_type": rng.choice(["Entire home/apt", "Private room"], n),
+        "price": np.round(rng.lognormal(5, 0.8, n) * np.where(quarter == "Q3", 1.6, 1.0)),
+    })
+
+
+def test_permutation_test_is_reproducible_across_worker_counts(listings):
+    """Batched relabellings give the classical F and a seed-determined p-value."""
+    one = permutation_test(listings["price"], listings["quarter"], n_resamples=600, seed=1,
+                           workers=1, batch_size=128)
+    two = permutation_test(listings["price"], listings["quarter"], n_resamples=600, seed=1,
+                           workers=2, batch_size=128)
+
+    by_quarter = [g.to_numpy() for _, g in listings.groupby("quarter")["price"]]
+    assert one["f_statistic"] == pytest.approx(stats.f_oneway(*by_quarter).statistic)
+    assert one == two
+    assert one["p_value"] < 0.01
+
+    unrelated = permutation_test(listings["price"], listings["room_type"], n_resamples=600, seed=1)
+    assert unrelated["p_value"] > 0.05
+
+
+def test_bootstrap_intervals_bracket_the_estimates(listings):
+    intervals = bootstrap_intervals(listings["price"], listings["quarter"], n_resamples=500,
+                                    seed=2, workers=2, batch_size=100)
+
+    assert list(intervals["group"]) == ["Q1", "Q2", "Q3"] * 2
+    assert (intervals["ci_lower"] <= intervals["estimate"]).all()
+    assert (intervals["estimate"] <= intervals["ci_upper"]).all()
+    medians = listings.groupby("quarter")["price"].median().to_numpy()
+    np.testing.assert_allclose(intervals.loc[intervals["statistic"] == "median", "estimate"], medians)
+
+
+def test_run_resampling_tests_writes_tables(listings, tmp_path):
+    tests, intervals = run_resampling_tests(listings, str(tmp_path), dimensions=["quarter", "room_type"],
+                                            n_resamples=200, workers=1)
+
+    assert len(tests) == 2 and len(intervals) == 2 * (3 + 2)
+    assert os.path.exists(tmp_path / "permutation_tests.csv")
+    assert os.path.exists(tmp_path / "bootstrap_intervals.csv")
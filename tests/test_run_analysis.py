@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code):
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                          text=True, check=True).stdout.split()
+
+
+def test_cli_startup_imports_no_heavy_libraries():
+    loaded = _run("import sys, run_analysis; run_analysis.parse_args(['stats']); "
+                  "print(*[m for m in run_analysis.HEAVY_MODULES if m in sys.modules])")
+    assert loaded == []
+
+
+def test_old_style_arguments_run_everything():
+    parsed = _run("import run_analysis as r; a = r.parse_args(['--offline', '--skip-tests']); "
+                  "b = r.parse_args(['figures', '--force']); "
+                  "print(a.command, a.offline, a.skip_tests, b.command, b.force)")
+    assert parsed == ["all", "True", "True", "figures", "True"]
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.spatial import COMPETITOR_COLUMNS, add_competitor_features, project
+
+
+@pytest.fixture
+def listings():
+    """Two quarters of listings scattered over a few km of Boston."""
+    rng = np.random.default_rng(3)
+    n = 150
+    return pd.DataFrame({
+        "quarter": np.repeat(["Q1", "Q2"], n),
+        "latitude": 42.35 + rng.normal(0, 0.01, 2 * n),
+        "longitude": -71.06 + rng.normal(0, 0.01, 2 * n),
+        "price": np.round(rng.lognormal(5, 0.5, 2 * n)),
+        "room_type": rng.choice(["Entire home/apt", "Private room"], 2 * n),
+    }, index=np.arange(2 * n)[::-1])
+
+
+def brute_force(snapshot, reference_latitude, radius_m, k):
+    """O(n^2) reference: full pairwise distance matrix."""
+    xy = project(snapshot["latitude"], snapshot["longitude"], reference_latitude)
+    distance = np.sqrt(((xy[:, None, :] - xy[None, :, :]) ** 2).sum(axis=2))
+    np.fill_diagonal(distance, np.inf)
+    price, room = snapshot["price"].to_numpy(), snapshot["room_type"].to_numpy()
+    rows = []
+    for i in range(len(snapshot)):
+        near = distance[i] <= radius_m
+        same = np.flatnonzero(room == room[i])
+        nearest = same[np.argsort(distance[i, same])][:k]
+        rows.append([near.sum(), np.median(price[near]) if near.any() else np.nan,
+                     np.median(price[nearest]), distance[i, nearest].mean()])
+    return np.array(rows)
+
+
+def test_kd_tree_features_match_pairwise_distances(listings):
+    """Per-quarter features equal the brute-force answer, whichever worker computed them."""
+    result = add_competitor_features(listings, radius_m=400, k=3, workers=2)
+
+    reference_latitude = listings["latitude"].mean()
+    for _, snapshot in listings.groupby("quarter"):
+        expected = brute_force(snapshot, reference_latitude, 400, 3)
+        got = result.loc[snapshot.index, ["competitor_count", "competitor_median_price",
+                                          "knn_room_median_price", "knn_room_distance_m"]]
+        np.testing.assert_allclose(got.to_numpy(dtype=float), expected, rtol=1e-9)
+
+
+def test_listing_without_coordinates_gets_no_competitor_features(listings):
+    """A missing coordinate leaves that listing's features NaN; the others ignore it."""
+    missing = listings.index[0]
+    listings.loc[missing, "latitude"] = np.nan
+
+    result = add_competitor_features(listings, radius_m=400, k=3, workers=1)
+
+    assert result.loc[missing, COMPETITOR_COLUMNS].isna().all()
+    located = listings.drop(index=missing)
+    snapshot = located[located["quarter"] == listings.loc[missing, "quarter"]]
+    expected = brute_force(snapshot, located["latitude"].mean(), 400, 3)
+    np.testing.assert_allclose(result.loc[snapshot.index, COMPETITOR_COLUMNS].to_numpy(dtype=float),
+                               expected, rtol=1e-9)
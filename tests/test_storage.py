@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from pipeline.storage import (
+    CLEAN_LISTINGS_SCHEMA, DatasetWriter, read_dataset, row_group_statistics, write_dataset,
+)
+
+
+@pytest.fixture
+def cleaned_df():
+    """Small cleaned snapshot with the dtypes CSV used to lose."""
+    return pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "neighbourhood": ["A", "B", "A", "C"],
+        "room_type": ["Entire home/apt", "Private room", "Private room", "Hotel room"],
+        "price": [100.0, 150.0, 80.0, 300.0],
+        "minimum_nights": [1.0, 2.0, 3.0, 1.0],  # float after to_numeric coercion
+        "last_review": pd.to_datetime(["2024-08-09", None, "2024-07-01", "2024-06-30"]),
+        "date": pd.Timestamp("2024-09-18"),
+    })
+
+
+def test_round_trip_keeps_declared_types(tmp_path, cleaned_df):
+    """Categories, integers and dates come back typed, not re-inferred."""
+    path = str(tmp_path / "listings_quarter1.parquet")
+    write_dataset(cleaned_df, path, CLEAN_LISTINGS_SCHEMA)
+
+    loaded = read_dataset(path)
+
+    assert list(loaded.columns) == list(cleaned_df.columns)
+    assert isinstance(loaded["neighbourhood"].dtype, pd.CategoricalDtype)
+    assert loaded["minimum_nights"].dtype == "int32"
+    assert pd.api.types.is_datetime64_any_dtype(loaded["last_review"])
+    assert loaded["last_review"].isna().sum() == 1
+
+
+def test_projection_and_filter_pushdown(tmp_path, cleaned_df):
+    """Only requested columns and matching rows are returned."""
+    path = str(tmp_path / "listings_quarter1.parquet")
+    write_dataset(cleaned_df, path, CLEAN_LISTINGS_SCHEMA, row_group_size=2)
+
+    loaded = read_dataset(path, columns=["id", "price"], filters=[("price", ">", 120)])
+
+    assert list(loaded.columns) == ["id", "price"]
+    assert loaded["id"].tolist() == [2, 4]
+
+    stats = row_group_statistics(path)
+    price_stats = stats[stats["column"] == "price"]
+    assert price_stats["row_group"].tolist() == [0, 1]
+    assert price_stats["max"].tolist() == [150.0, 300.0]
+
+
+def test_chunked_writer_stores_undeclared_columns_as_strings(tmp_path, cleaned_df):
+    """An undeclared column that is all-null in the first chunk still takes text later."""
+    path = str(tmp_path / "listings_quarter1.parquet")
+    with DatasetWriter(path, CLEAN_LISTINGS_SCHEMA) as writer:
+        writer.write(cleaned_df.iloc[:2].assign(license=None))
+        writer.write(cleaned_df.iloc[2:].assign(license=["STR-1", None]))
+
+    loaded = read_dataset(path)
+
+    assert loaded["minimum_nights"].dtype == "int32"
+    assert loaded["license"].iloc[2] == "STR-1"
+    assert loaded["license"].isna().sum() == 3
+
+
+def test_concat_keeps_categories_and_orders_quarters():
+    """Quarters with different category sets still concatenate to a category."""
+    from pipeline.schema import apply_schema, concat_frames
+
+    q1 = pd.DataFrame({"neighbourhood": pd.Categorical(["A", "B"]), "quarter": "Q10"})
+    q2 = pd.DataFrame({"neighbourhood": pd.Categorical(["C"]), "quarter": "Q2"})
+
+    joint = apply_schema(concat_frames([q1, q2]))
+
+    assert isinstance(joint["neighbourhood"].dtype, pd.CategoricalDtype)
+    assert joint["neighbourhood"].tolist() == ["A", "B", "C"]
+    assert list(joint["quarter"].cat.categories) == ["Q2", "Q10"]
+
+
+def test_apply_schema_leaves_columns_already_in_their_dtype():
+    """Columns already in their registered dtype are not cast (copied) again."""
+    from pipeline.schema import apply_schema
+
+    df = pd.DataFrame({"name": pd.array(["Loft", "Flat"], dtype="string[pyarrow]"),
+                       "host_name": pd.array(["Ann", "Bo"], dtype="string[python]")})
+    name = df["name"].array
+
+    apply_schema(df)
+
+    assert df["name"].array is name
+    assert df["host_name"].dtype == "string[pyarrow]"
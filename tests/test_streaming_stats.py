@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.generate_summary_stats import calculate_summary_stats, run_anova
+from analysis.streaming_stats import StreamingStats, consume, stats_from_datasets
+from pipeline.storage import write_dataset
+
+
+@pytest.fixture
+def listings():
+    """Row-level listings over quarters, with a few missing prices."""
+    rng = np.random.default_rng(1)
+    n = 500
+    df = pd.DataFrame({
+        "quarter": rng.choice(["Q1", "Q2", "Q3", "Q4"], n),
+        "price": np.round(rng.lognormal(5, 0.6, n)),
+        "availability_365": rng.integers(0, 366, n),
+        "number_of_reviews": rng.integers(0, 200, n),
+    })
+    df.loc[::37, "price"] = np.nan
+    return df
+
+
+def test_chunked_and_merged_state_matches_row_level(listings):
+    """Chunks folded into two separate states and merged give the in-memory results."""
+    left = consume([listings.iloc[:120], listings.iloc[120:250]])
+    right = consume([listings.iloc[250:]])
+    state = left.merge(right)
+
+    pd.testing.assert_frame_equal(calculate_summary_stats(state), calculate_summary_stats(listings),
+                                  check_index_type=False, check_dtype=False)
+    streamed, rows = run_anova(state), run_anova(listings)
+    assert streamed["f_statistic"].iloc[0] == pytest.approx(rows["f_statistic"].iloc[0])
+    assert streamed["p_value"].iloc[0] == pytest.approx(rows["p_value"].iloc[0])
+
+
+def test_stats_from_stored_datasets(listings, tmp_path):
+    """Row groups of stored datasets are streamed (and partitioned) into one state."""
+    paths = [str(tmp_path / "a.parquet"), str(tmp_path / "b.parquet")]
+    write_dataset(listings.iloc[:300], paths[0], row_group_size=100)
+    write_dataset(listings.iloc[300:], paths[1], row_group_size=100)
+
+    state = stats_from_datasets(paths, workers=2, batch_size=50)
+
+    assert isinstance(state, StreamingStats)
+    pd.testing.assert_frame_equal(state.summary_table(), calculate_summary_stats(listings),
+                                  check_index_type=False, check_dtype=False)